@@ -0,0 +1,238 @@
+"""
+Admission control: a bounded number of evaluation requests in flight.
+
+Without it every request a burst brings is accepted and holds its socket,
+body and task while it waits up to the provider read timeout (60 s), so
+memory and connections grow with the burst. AdmissionMiddleware lets at
+most ADMISSION_MAX_INFLIGHT evaluation requests run; the rest wait in a
+bounded queue per lane, before their body is read, or are turned away with
+503 and Retry-After:
+
+- the lane's queue already holds ADMISSION_MAX_QUEUE requests;
+- the estimated queue wait plus the lane's typical service time (both
+  from recent requests) would exceed the request's deadline, so it would
+  fail anyway after holding resources;
+- it waited in the queue until only the typical service time was left.
+
+Two lanes, chosen by the X-Priority header ("interactive" or "bulk"):
+candidate-facing calls default to interactive, /evaluate/batch to bulk. A
+freed slot always goes to an interactive request first, and bulk requests
+never hold more than ADMISSION_BULK_MAX_INFLIGHT slots, so a recruiter's
+re-scoring run cannot take the capacity interactive requests need. The
+deadline is X-Deadline-Ms when the client sends it, else the lane's
+ADMISSION_*_DEADLINE_MS.
+
+Queueing delay is exported as admission_queue_seconds{lane}, rejections as
+admission_rejections_total{lane,reason}, and both lanes' state under
+"admission" in /stats. Limits are per worker process.
+"""
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from app import metrics
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION", "1").lower() not in ("0", "false", "no")
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "64"))
+# Waiting requests per lane
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))
+ADMISSION_BULK_MAX_INFLIGHT = int(os.getenv("ADMISSION_BULK_MAX_INFLIGHT", str(max(1, ADMISSION_MAX_INFLIGHT // 2))))
+DEADLINES_MS = {
+    INTERACTIVE: float(os.getenv("ADMISSION_INTERACTIVE_DEADLINE_MS", "15000")),
+    BULK: float(os.getenv("ADMISSION_BULK_DEADLINE_MS", "120000")),
+}
+# Weight of the latest request in the per-lane service time average
+SERVICE_EWMA_ALPHA = 0.1
+
+# POST routes that do provider work, and their default lane
+ADMITTED_ROUTES = (
+    (re.compile(r"^/evaluate/batch$"), BULK),
+    (re.compile(r"^/evaluate(/stream)?$"), INTERACTIVE),
+    (re.compile(r"^/sessions/[^/]+/answers$"), INTERACTIVE),
+)
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """In-flight slots shared by two priority lanes, each with a bounded FIFO queue"""
+
+    def __init__(self, max_inflight: int = ADMISSION_MAX_INFLIGHT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 bulk_max_inflight: int = ADMISSION_BULK_MAX_INFLIGHT):
+        if max_inflight < 1 or bulk_max_inflight < 1:
+            raise ValueError("ADMISSION_MAX_INFLIGHT and ADMISSION_BULK_MAX_INFLIGHT must be at least 1 "
+                             "(set ADMISSION=0 to turn admission control off)")
+        self.max_inflight = max_inflight
+        self.max_queue = max(0, max_queue)
+        self.bulk_max_inflight = min(bulk_max_inflight, max_inflight)
+        self.inflight = dict.fromkeys(LANES, 0)
+        self.queues: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        self.service_s = dict.fromkeys(LANES, 0.0)  # EWMA of time in flight
+        self.admitted = dict.fromkeys(LANES, 0)
+        self.queued = dict.fromkeys(LANES, 0)
+        self.rejected: Dict[str, Dict[str, int]] = {lane: {} for lane in LANES}
+
+    def _can_start(self, lane: str) -> bool:
+        if sum(self.inflight.values()) >= self.max_inflight:
+            return False
+        return lane == INTERACTIVE or self.inflight[BULK] < self.bulk_max_inflight
+
+    def estimate_wait(self, lane: str) -> float:
+        """Seconds a request joining `lane` now would likely wait for a slot"""
+        # Interactive waiters go first; each slot turns over once per service time
+        wait = (len(self.queues[INTERACTIVE]) + (lane == INTERACTIVE)) * self.service_s[INTERACTIVE] / self.max_inflight
+        if lane == BULK:
+            wait += (len(self.queues[BULK]) + 1) * self.service_s[BULK] / self.bulk_max_inflight
+        return wait
+
+    def _reject(self, lane: str, reason: str, retry_after: float) -> Rejected:
+        self.rejected[lane][reason] = self.rejected[lane].get(reason, 0) + 1
+        metrics.ADMISSION_REJECTIONS.inc(lane, reason)
+        return Rejected(reason, retry_after)
+
+    async def acquire(self, lane: str, deadline_s: float) -> float:
+        """Wait for a slot in `lane`; returns the seconds waited. Raises Rejected."""
+        if not self.queues[lane] and self._can_start(lane):
+            self.inflight[lane] += 1
+            self.admitted[lane] += 1
+            return 0.0
+        if len(self.queues[lane]) >= self.max_queue:
+            raise self._reject(lane, "queue_full", self.estimate_wait(lane))
+        wait = self.estimate_wait(lane)
+        budget = deadline_s - self.service_s[lane]
+        if wait > budget:
+            raise self._reject(lane, "deadline", wait)
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self.queues[lane].append(waiter)
+        self.queued[lane] += 1
+        try:
+            await asyncio.wait_for(waiter, timeout=max(budget, 0.0))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                self.release(lane, 0.0, observe=False)  # granted just as it gave up
+            else:
+                try:
+                    self.queues[lane].remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(lane, "timeout", self.estimate_wait(lane))
+            raise
+        self.admitted[lane] += 1
+        return time.perf_counter() - start
+
+    def release(self, lane: str, seconds: float, observe: bool = True):
+        self.inflight[lane] -= 1
+        if observe:
+            previous = self.service_s[lane]
+            self.service_s[lane] = seconds if not previous else previous + SERVICE_EWMA_ALPHA * (seconds - previous)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand freed slots to waiters, interactive first"""
+        for lane in LANES:
+            queue = self.queues[lane]
+            while queue and self._can_start(lane):
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self.inflight[lane] += 1
+                    waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        lanes = {}
+        for lane in LANES:
+            lanes[lane] = {
+                "inflight": self.inflight[lane],
+                "waiting": len(self.queues[lane]),
+                "admitted": self.admitted[lane],
+                "queued": self.queued[lane],
+                "rejected": dict(self.rejected[lane]),
+                "service_ms": round(self.service_s[lane] * 1000, 1),
+                "estimated_wait_ms": round(self.estimate_wait(lane) * 1000, 1),
+                "deadline_ms": DEADLINES_MS[lane],
+            }
+        return {
+            "enabled": True,
+            "max_inflight": self.max_inflight,
+            "bulk_max_inflight": self.bulk_max_inflight,
+            "max_queue": self.max_queue,
+            "lanes": lanes,
+        }
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1").strip()
+    return None
+
+
+def _lane_for(scope) -> Optional[str]:
+    """The request's lane, or None when the route is not admission controlled"""
+    if scope["type"] != "http" or scope["method"] != "POST":
+        return None
+    for pattern, default in ADMITTED_ROUTES:
+        if pattern.match(scope["path"]):
+            lane = (_header(scope, b"x-priority") or "").lower()
+            return lane if lane in LANES else default
+    return None
+
+
+def _deadline_s(scope, lane: str) -> float:
+    try:
+        return float(_header(scope, b"x-deadline-ms")) / 1000
+    except (TypeError, ValueError):
+        return DEADLINES_MS[lane] / 1000
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting evaluation requests through an AdmissionController"""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        lane = _lane_for(scope)
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            waited = await self.controller.acquire(lane, _deadline_s(scope, lane))
+        except Rejected as e:
+            await self._busy(send, lane, e)
+            return
+        metrics.ADMISSION_QUEUE_SECONDS.observe(waited, lane)
+        if waited:
+            metrics.report("X-Queue-Ms", f"{waited * 1000:.1f}")
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(lane, time.perf_counter() - start)
+
+    @staticmethod
+    async def _busy(send, lane: str, rejected: Rejected):
+        body = json.dumps({"detail": f"Server busy ({lane} lane: {rejected.reason}), retry later"}).encode()
+        await send({"type": "http.response.start", "status": 503, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(rejected.retry_after))).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
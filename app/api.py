@@ -0,0 +1,340 @@
+"""
+HTTP API over an evaluation engine (app.engine).
+
+create_app() builds the FastAPI app: the routes, the middleware (including
+admission control, app.admission), the job queue, the interview sessions
+and the startup/shutdown of the engine's backend. Every entry point
+(app.main, app.lambda_main) serves the same API.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from app import metrics, workerstats
+from app.admission import ADMISSION_ENABLED, AdmissionController, AdmissionMiddleware
+from app.cache import make_cache_key
+from app.engine import DEFAULT_MODEL, Engine, parse_output
+from app.jobs import JobRunner, JobStore
+from app.jsonstream import replay_events, stream_evaluation
+from app.metrics import MetricsMiddleware
+from app.prompts import PROMPT_VERSION
+from app.responses import JSONBytesResponse
+from app.schemas import (BatchEvaluationRequest, BatchEvaluationResponse, EvaluationRequest, EvaluationResponse,
+                         JobRequest, JobResults, JobStatus, SessionAnswer, SessionAnswerResult, SessionInfo,
+                         SessionRequest)
+from app.sessions import Session, SessionStore
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+JOB_MAX_ITEMS = int(os.getenv("JOB_MAX_ITEMS", "10000"))
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+GEMINI_MODELS = [
+    "gemini/gemini-2.5-flash",
+    "gemini/gemini-2.5-pro",
+    "gemini/gemini-2.0-flash",
+    "gemini/gemini-2.0-flash-lite",
+]
+CLAUDE_MODELS = [
+    "claude-sonnet-4-20250514",
+    "claude-3-5-sonnet-20241022",
+    "claude-3-haiku-20240307",
+]
+
+
+def create_app(engine: Engine) -> FastAPI:
+    async def evaluate_job_item(index: int, request: dict):
+        """Job runner callback: same limits and caching as a batch item"""
+        item = await engine.evaluate_batch_item(index, EvaluationRequest(**request))
+        return (item.result.model_dump() if item.result else None), item.error
+
+    job_runner = JobRunner(JobStore(), evaluate_job_item)
+    sessions = SessionStore()
+    # Fails at startup on limits below 1 (ADMISSION=0 turns it off instead)
+    admission = AdmissionController() if ADMISSION_ENABLED else None
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await engine.backend.startup()
+        # Multi-worker servers (app.server) merge per-worker stats from snapshots
+        publisher = None
+        if workerstats.STATS_DIR:
+            publisher = asyncio.ensure_future(workerstats.publish(stats, workerstats.STATS_DIR,
+                                                                  registry=metrics.REGISTRY))
+        if JOBS_ENABLED:
+            # Resumes jobs left unfinished by a previous run
+            await job_runner.start()
+        yield
+        if JOBS_ENABLED:
+            await job_runner.stop()
+        if publisher:
+            publisher.cancel()
+            await asyncio.gather(publisher, return_exceptions=True)
+        await engine.backend.shutdown()
+
+    app = FastAPI(title="Interview Answer Evaluation Agent", version="1.0.0", lifespan=lifespan)
+    app.state.engine = engine
+    app.state.job_runner = job_runner
+    app.state.sessions = sessions
+    app.state.admission = admission
+
+    # Innermost, so a 503 still gets CORS headers and counts in the request metrics
+    if admission is not None:
+        app.add_middleware(AdmissionMiddleware, controller=admission)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Server-Timing", "X-Cache", "X-Cache-Key", "X-Cache-Similarity",
+                        "X-Input-Tokens", "X-Input-Tokens-Saved", "X-Max-Tokens", "X-Model", "X-Prescore", "X-Queue-Ms",
+                        "Retry-After"],
+    )
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/")
+    async def root():
+        return {"message": "Interview Answer Evaluation Agent API", "status": "running"}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/models")
+    async def list_models():
+        """List available models"""
+        return {
+            "default_model": DEFAULT_MODEL,
+            "backend": engine.backend.name,
+            "gemini_models": GEMINI_MODELS,
+            "claude_models": CLAUDE_MODELS,
+            # Used by "routing": "hedged" for hedges and failover
+            "fallbacks": engine.router.fallbacks,
+            # "model": "auto": candidates, their recent latency / errors / cost and the latest decisions
+            "auto": engine.auto_router.stats(),
+        }
+
+    async def evaluate_observed(request: EvaluationRequest):
+        """engine.evaluate() with request metrics; returns the outcome and its response headers"""
+        start = time.perf_counter()
+        status = "error"
+        try:
+            outcome = await engine.evaluate(request)
+            status = "hit" if outcome.cache_hit else "coalesced" if outcome.coalesced else "miss"
+            if outcome.similarity is not None:
+                status = "semantic_hit"
+            if outcome.scored_locally:
+                status = "local"
+        except HTTPException as e:
+            status = str(e.status_code)
+            raise
+        finally:
+            metrics.observe_request(engine.resolve_model(request), status, start)
+        headers = {"X-Cache": "HIT" if outcome.cache_hit else "MISS"}
+        if outcome.cache_key:
+            headers["X-Cache-Key"] = outcome.cache_key
+        if outcome.scored_locally:
+            headers["X-Cache"] = "LOCAL"
+        if outcome.similarity is not None:
+            headers["X-Cache"] = "SEMANTIC"
+            headers["X-Cache-Similarity"] = f"{outcome.similarity:.4f}"
+        if outcome.coalesced:
+            headers["X-Coalesced"] = "1"
+        return outcome, headers
+
+    @app.post("/evaluate", response_model=EvaluationResponse)
+    async def evaluate_answer(request: EvaluationRequest):
+        outcome, headers = await evaluate_observed(request)
+        # Already validated when parsed: serialize once, skipping response_model
+        return JSONBytesResponse(outcome.evaluation, headers=headers)
+
+    @app.post("/evaluate/batch", response_model=BatchEvaluationResponse)
+    async def evaluate_batch(batch: BatchEvaluationRequest):
+        """Evaluate many answers concurrently; results keep input order"""
+        if len(batch.items) > BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Batch too large (max {BATCH_MAX_ITEMS} items)")
+
+        if batch.pack:
+            tasks = engine.evaluate_packed(batch.items)
+        else:
+            tasks = [asyncio.ensure_future(engine.evaluate_batch_item(i, item)) for i, item in enumerate(batch.items)]
+
+        if batch.stream:
+            return StreamingResponse(stream_batch_results(tasks), media_type="application/x-ndjson")
+
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return JSONBytesResponse(BatchEvaluationResponse(results=results))
+
+    async def stream_batch_results(tasks):
+        """Yield one NDJSON line per item in completion order"""
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                yield item.model_dump_json() + "\n"
+        finally:
+            # Client went away (or we finished): don't leave work running
+            for task in tasks:
+                task.cancel()
+
+    def require_jobs():
+        if not JOBS_ENABLED:
+            raise HTTPException(status_code=503, detail="Job queue is disabled (JOBS_ENABLED=0)")
+        if not job_runner.running:
+            # The runner starts with the app's lifespan, which the Lambda handler (Mangum,
+            # lifespan="off") never runs: accepted jobs would never be processed
+            raise HTTPException(status_code=503, detail="Job queue is not running in this process; "
+                                                        "use POST /evaluate/batch instead")
+
+    @app.post("/jobs", response_model=JobStatus, status_code=202)
+    async def submit_job(job: JobRequest):
+        """Queue a large evaluation workload; poll GET /jobs/{id} or wait for the webhook"""
+        require_jobs()
+        if not job.items:
+            raise HTTPException(status_code=400, detail="A job needs at least one item")
+        if len(job.items) > JOB_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Job too large (max {JOB_MAX_ITEMS} items)")
+        if job.webhook_url and not job.webhook_url.startswith(("http://", "https://")):
+            raise HTTPException(status_code=400, detail="webhook_url must be an http(s) URL")
+        return await job_runner.submit([item.model_dump() for item in job.items], job.webhook_url)
+
+    @app.get("/jobs/{job_id}", response_model=JobStatus)
+    async def get_job(job_id: str):
+        """Progress counters of a job"""
+        require_jobs()
+        job = await job_runner.store.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    @app.get("/jobs/{job_id}/results", response_model=JobResults)
+    async def get_job_results(job_id: str, offset: int = 0, limit: int = 100):
+        """Finished items so far, in input order; available while the job runs"""
+        require_jobs()
+        if await job_runner.store.get(job_id) is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        limit = min(max(limit, 1), 1000)
+        results = await job_runner.store.results(job_id, offset, limit)
+        next_offset = results[-1]["index"] + 1 if len(results) == limit else None
+        return JobResults(id=job_id, results=results, next_offset=next_offset)
+
+    @app.delete("/jobs/{job_id}", response_model=JobStatus)
+    async def cancel_job(job_id: str):
+        """Cancel the items that have not started; finished results are kept"""
+        require_jobs()
+        job = await job_runner.cancel(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    def get_session(session_id: str) -> Session:
+        session = sessions.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+        return session
+
+    @app.post("/sessions", response_model=SessionInfo)
+    async def create_session(settings: SessionRequest):
+        """Start an interview: the job description and settings every answer shares"""
+        model = settings.model or DEFAULT_MODEL
+        session = sessions.create(settings, model)
+        # "auto" picks per answer; warm the model it would pick for this job description
+        prepared = engine.resolve_model(EvaluationRequest(question="", answer="", model=model,
+                                                          job_description=session.job_description))
+        await engine.prepare(prepared, settings.api_key, session.job_description)
+        return JSONBytesResponse(session.info(sessions.idle_ttl))
+
+    @app.get("/sessions/{session_id}", response_model=SessionInfo)
+    async def get_session_info(session_id: str):
+        return JSONBytesResponse(get_session(session_id).info(sessions.idle_ttl))
+
+    @app.post("/sessions/{session_id}/answers", response_model=SessionAnswerResult)
+    async def evaluate_session_answer(session_id: str, answer: SessionAnswer):
+        """Evaluate one answer of the interview and fold it into the session summary"""
+        session = get_session(session_id)
+        index = session.reserve()
+        if index is None:
+            raise HTTPException(status_code=409, detail=f"Session is full ({session.max_answers} answers)")
+        try:
+            outcome, headers = await evaluate_observed(session.request_for(answer))
+        except Exception:
+            session.running.failed += 1
+            raise
+        session.running.add(index, answer.question, outcome.evaluation)
+        result = SessionAnswerResult(index=index, evaluation=outcome.evaluation, summary=session.running.summary())
+        return JSONBytesResponse(result, headers=headers)
+
+    @app.delete("/sessions/{session_id}")
+    async def close_session(session_id: str):
+        """End the interview; the final summary is returned"""
+        session = get_session(session_id)
+        sessions.delete(session_id)
+        return JSONBytesResponse(session.info(sessions.idle_ttl))
+
+    @app.post("/evaluate/stream")
+    async def evaluate_stream(request: EvaluationRequest):
+        """Stream the evaluation as server-sent events while the LLM generates it
+
+        Events: `field` (a complete top-level value), `item` (one entry of
+        strengths/weaknesses/improvement_suggestions), then `result` with the
+        validated EvaluationResponse, or `error`.
+        """
+        model = engine.resolve_model(request)
+        cache_key = make_cache_key(request.question, request.answer, request.job_description, model, PROMPT_VERSION)
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Cache-Key": cache_key}
+
+        cached = await engine.evaluation_cache.get(cache_key)
+        if cached is not None:
+            headers["X-Cache"] = "HIT"
+            return StreamingResponse(iter(replay_events(cached)), media_type="text/event-stream", headers=headers)
+
+        async def finalize(result_text: str) -> EvaluationResponse:
+            evaluation = parse_output(result_text, model)
+            await engine.evaluation_cache.set(cache_key, evaluation.model_dump())
+            return evaluation
+
+        headers["X-Cache"] = "MISS"
+        return StreamingResponse(stream_evaluation(engine.stream(request, model), finalize),
+                                 media_type="text/event-stream", headers=headers)
+
+    @app.delete("/cache/{cache_key}")
+    async def invalidate_cache_entry(cache_key: str):
+        """Drop one cached evaluation (key is returned in the X-Cache-Key header)"""
+        deleted = await engine.evaluation_cache.delete(cache_key)
+        return {"deleted": engine.semantic_cache.delete(cache_key) or deleted}
+
+    @app.delete("/cache")
+    async def clear_cache():
+        """Drop all cached evaluations"""
+        engine.semantic_cache.clear()
+        return {"cleared": await engine.evaluation_cache.clear()}
+
+    @app.get("/cache/stats")
+    async def cache_stats():
+        return engine.evaluation_cache.stats()
+
+    @app.get("/stats")
+    async def stats():
+        return {**engine.stats(), "jobs": job_runner.stats(), "sessions": sessions.stats(),
+                "admission": admission.stats() if admission else {"enabled": False}}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def prometheus_metrics():
+        """Prometheus text exposition of the metrics, summed over all server workers"""
+        return PlainTextResponse(workerstats.aggregate_metrics(metrics.REGISTRY),
+                                 media_type="text/plain; version=0.0.4")
+
+    @app.get("/stats/workers")
+    async def worker_stats():
+        """/stats merged across all server worker processes"""
+        return await workerstats.aggregate(stats)
+
+    return app
@@ -0,0 +1,229 @@
+"""
+"auto" model selection from live latency, error and cost measurements.
+
+With "model": "auto" (or MODEL=auto) the engine asks AutoRouter for a
+concrete model per request. Every provider call made by the engine, auto or
+not, is recorded per model into a time-bounded window (AUTO_WINDOW_SECONDS):
+latency, input and output tokens, and success.
+
+For a request of a given input size, each candidate (AUTO_MODELS) gets:
+
+- a predicted latency: the AUTO_SLO_PERCENTILE of its recent latencies,
+  each shifted to this request's input size along the model's fitted
+  seconds-per-input-token slope. A long job description therefore raises
+  the prediction most for the models that slow down most with input size,
+  and pushes the choice toward the faster ones;
+- a predicted cost: input tokens and the recent mean output tokens at the
+  model's price per million tokens (MODEL_PRICES over DEFAULT_PRICES). A
+  model without completed calls is costed at the mean output of the
+  candidates that have some, so it is compared like-for-like;
+- its recent error rate.
+
+The cheapest candidate whose prediction meets AUTO_LATENCY_SLO_MS and whose
+error rate is at most AUTO_MAX_ERROR_RATE wins; if none qualifies, the one
+with the lowest predicted latency among the healthy ones, then overall.
+A model with fewer than AUTO_MIN_SAMPLES recent calls is assumed to meet
+the SLO, so it gets traffic and measurements; as old samples age out,
+a model that was ruled out is retried the same way. The reason for each
+decision and the per-model figures are reported under "auto" in /models.
+"""
+import os
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+AUTO_MODEL = "auto"
+AUTO_MODELS = [model.strip() for model in os.getenv(
+    "AUTO_MODELS", "gemini/gemini-2.0-flash-lite,gemini/gemini-2.0-flash,gemini/gemini-2.5-flash").split(",")
+    if model.strip()]
+AUTO_LATENCY_SLO_MS = float(os.getenv("AUTO_LATENCY_SLO_MS", "4000"))
+AUTO_SLO_PERCENTILE = float(os.getenv("AUTO_SLO_PERCENTILE", "95"))
+AUTO_MAX_ERROR_RATE = float(os.getenv("AUTO_MAX_ERROR_RATE", "0.1"))
+AUTO_MIN_SAMPLES = int(os.getenv("AUTO_MIN_SAMPLES", "20"))
+AUTO_WINDOW_SECONDS = float(os.getenv("AUTO_WINDOW_SECONDS", "300"))
+AUTO_WINDOW_SIZE = 256
+# Fewer recent calls than this say nothing about a model's error rate
+MIN_ERROR_SAMPLES = 5
+DECISION_LOG_SIZE = 20
+# Used until any candidate has completed a call
+DEFAULT_OUTPUT_TOKENS = 400
+
+# USD per million (input, output) tokens, by model name without provider prefix
+DEFAULT_PRICES = {
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00),
+    "claude-sonnet-4-20250514": (3.00, 15.00),
+}
+
+
+def load_prices() -> Dict[str, Tuple[float, float]]:
+    """DEFAULT_PRICES overridden by MODEL_PRICES="model=input:output,..." """
+    prices = dict(DEFAULT_PRICES)
+    for pair in os.getenv("MODEL_PRICES", "").split(","):
+        if "=" in pair and ":" in pair:
+            model, rates = pair.split("=", 1)
+            input_price, output_price = rates.split(":", 1)
+            prices[model.strip().rpartition("/")[2]] = (float(input_price), float(output_price))
+    return prices
+
+
+class Sample(NamedTuple):
+    at: float
+    seconds: float
+    input_tokens: int
+    output_tokens: int
+    ok: bool
+
+
+class Decision(NamedTuple):
+    model: str
+    reason: str
+    predicted_ms: Optional[float]
+    predicted_cost: Optional[float]
+
+
+class ModelWindow:
+    """Recent calls of one model, dropped after AUTO_WINDOW_SECONDS"""
+
+    def __init__(self, size: int = AUTO_WINDOW_SIZE, seconds: float = AUTO_WINDOW_SECONDS):
+        self.samples: Deque[Sample] = deque(maxlen=size)
+        self.seconds = seconds
+
+    def recent(self, now: float) -> List[Sample]:
+        while self.samples and now - self.samples[0].at > self.seconds:
+            self.samples.popleft()
+        return list(self.samples)
+
+    @staticmethod
+    def slope(ok: List[Sample]) -> float:
+        """Least-squares seconds per input token (never negative)"""
+        if len(ok) < 2:
+            return 0.0
+        mean_x = sum(s.input_tokens for s in ok) / len(ok)
+        mean_y = sum(s.seconds for s in ok) / len(ok)
+        var = sum((s.input_tokens - mean_x) ** 2 for s in ok)
+        if not var:
+            return 0.0
+        cov = sum((s.input_tokens - mean_x) * (s.seconds - mean_y) for s in ok)
+        return max(0.0, cov / var)
+
+
+class AutoRouter:
+    def __init__(self, candidates: Optional[List[str]] = None, slo_ms: float = AUTO_LATENCY_SLO_MS,
+                 percentile: float = AUTO_SLO_PERCENTILE, max_error_rate: float = AUTO_MAX_ERROR_RATE,
+                 min_samples: int = AUTO_MIN_SAMPLES, window_seconds: float = AUTO_WINDOW_SECONDS,
+                 prices: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.candidates = list(AUTO_MODELS if candidates is None else candidates)
+        self.slo_ms = slo_ms
+        self.percentile = percentile
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.window_seconds = window_seconds
+        self.prices = load_prices() if prices is None else prices
+        self._windows: Dict[str, ModelWindow] = {}
+        self.decisions: Counter = Counter()
+        self.recent_decisions: Deque[Dict[str, Any]] = deque(maxlen=DECISION_LOG_SIZE)
+
+    def _window(self, model: str) -> ModelWindow:
+        window = self._windows.get(model)
+        if window is None:
+            window = self._windows[model] = ModelWindow(seconds=self.window_seconds)
+        return window
+
+    def observe(self, model: str, seconds: float, input_tokens: int, output_tokens: int, ok: bool = True):
+        self._window(model).samples.append(Sample(time.time(), seconds, input_tokens, output_tokens, ok))
+
+    def price(self, model: str) -> Optional[Tuple[float, float]]:
+        return self.prices.get(model.rpartition("/")[2])
+
+    def mean_output_tokens(self, now: Optional[float] = None) -> float:
+        """Mean output tokens of the candidates' recent successful calls"""
+        now = time.time() if now is None else now
+        ok = [s for model in self.candidates for s in self._window(model).recent(now) if s.ok]
+        return sum(s.output_tokens for s in ok) / len(ok) if ok else DEFAULT_OUTPUT_TOKENS
+
+    def assess(self, model: str, input_tokens: int, now: Optional[float] = None,
+               default_output_tokens: Optional[float] = None) -> Dict[str, Any]:
+        """Predicted latency / cost of `model` for a request of `input_tokens`, and its error rate"""
+        now = time.time() if now is None else now
+        samples = self._window(model).recent(now)
+        ok = [s for s in samples if s.ok]
+        error_rate = (len(samples) - len(ok)) / len(samples) if len(samples) >= MIN_ERROR_SAMPLES else 0.0
+        predicted_ms = None
+        if len(ok) >= self.min_samples:
+            slope = ModelWindow.slope(ok)
+            shifted = sorted(max(0.0, s.seconds + slope * (input_tokens - s.input_tokens)) for s in ok)
+            predicted_ms = _percentile_ms(shifted, self.percentile)
+        if ok:
+            output_tokens = sum(s.output_tokens for s in ok) / len(ok)
+        else:
+            output_tokens = self.mean_output_tokens(now) if default_output_tokens is None else default_output_tokens
+        price = self.price(model)
+        cost = (input_tokens * price[0] + output_tokens * price[1]) / 1e6 if price else None
+        return {"samples": len(samples), "error_rate": round(error_rate, 3), "predicted_ms": predicted_ms,
+                "predicted_cost": cost}
+
+    def choose(self, input_tokens: int) -> Decision:
+        """The model for a request of `input_tokens`; no side effects"""
+        now = time.time()
+        output_tokens = self.mean_output_tokens(now)
+        assessed = [(model, self.assess(model, input_tokens, now, output_tokens)) for model in self.candidates]
+        healthy = [(m, a) for m, a in assessed if a["error_rate"] <= self.max_error_rate]
+        meeting = [(m, a) for m, a in healthy if a["predicted_ms"] is None or a["predicted_ms"] <= self.slo_ms]
+        if meeting:
+            model, a = min(meeting, key=lambda item: (item[1]["predicted_cost"] is None,
+                                                      item[1]["predicted_cost"] or 0.0))
+            reason = "unmeasured, assumed within SLO" if a["predicted_ms"] is None else "cheapest within SLO"
+        else:
+            pool, reason = (healthy, "none within SLO: fastest") if healthy else (assessed, "all erroring: fastest")
+            model, a = min(pool, key=lambda item: (item[1]["predicted_ms"] is None, item[1]["predicted_ms"] or 0.0,
+                                                   item[1]["error_rate"]))
+        cost = round(a["predicted_cost"], 8) if a["predicted_cost"] is not None else None
+        return Decision(model, reason, a["predicted_ms"], cost)
+
+    def decide(self, input_tokens: int) -> Decision:
+        """choose(), recorded in the decision counts and log"""
+        decision = self.choose(input_tokens)
+        self.decisions[decision.model] += 1
+        self.recent_decisions.append({"at": round(time.time(), 3), "input_tokens": input_tokens,
+                                      **decision._asdict()})
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        models = {}
+        for model in self.candidates:
+            samples = self._window(model).recent(now)
+            ok = [s for s in samples if s.ok]
+            latencies = sorted(s.seconds for s in ok)
+            price = self.price(model)
+            spent = sum(s.input_tokens * price[0] + s.output_tokens * price[1] for s in ok) / 1e6 if price else None
+            models[model] = {
+                "samples": len(samples),
+                "error_rate": round((len(samples) - len(ok)) / len(samples), 3) if samples else 0.0,
+                "p50_ms": _percentile_ms(latencies, 50),
+                "p95_ms": _percentile_ms(latencies, 95),
+                "seconds_per_1k_input_tokens": round(ModelWindow.slope(ok) * 1000, 4),
+                "mean_cost_usd": round(spent / len(ok), 8) if ok and spent is not None else None,
+                "price_per_million": price,
+                "decisions": self.decisions[model],
+            }
+        return {
+            "candidates": self.candidates,
+            "latency_slo_ms": self.slo_ms,
+            "slo_percentile": self.percentile,
+            "max_error_rate": self.max_error_rate,
+            "window_seconds": self.window_seconds,
+            "models": models,
+            "recent_decisions": list(self.recent_decisions),
+        }
+
+
+def _percentile_ms(ordered: List[float], pct: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] * 1000, 1)
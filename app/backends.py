@@ -0,0 +1,369 @@
+"""
+LLM backends: how one prompt reaches the provider.
+
+The engine (app.engine) owns everything around a call: caching, coalescing,
+compaction, rate limits, hedging, output budgets and parsing. A backend only
+sends one Call and returns the completion and its token usage:
+
+- "litellm" (LiteLLMBackend): any litellm model; JSON schema output through
+  response_format. litellm is imported on first use.
+- "http" (HTTPBackend): Gemini and Anthropic straight over the pooled httpx
+  clients of app.transport. No SDK, so no tiktoken and the smallest cold
+  start; Gemini JSON mode with explicit context caching, Claude forced tool
+  use.
+
+LLM_BACKEND picks one. Model names work with either: "gemini/" is added or
+stripped as the backend needs.
+"""
+import asyncio
+import json
+import os
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, NamedTuple, Optional, Union
+
+from app import transport
+from app.prompt_cache import GeminiContextCache, cache_control_for
+from app.ratelimit import ProviderError, error_from_response
+from app.structured import claude_tool_options, gemini_generation_config, litellm_response_format
+from app.transport import provider_for_model
+from app.usage import usage_from_anthropic, usage_from_gemini, usage_from_litellm
+
+TEMPERATURE = 0.1
+
+
+class Call(NamedTuple):
+    model: str
+    api_key: Optional[str]  # None: the provider key from the environment
+    system_prompt: str
+    job_context: str
+    prompt: str
+    max_tokens: int
+    structured: bool = True  # constrain the output to the evaluation schema
+
+    @property
+    def provider(self) -> str:
+        return provider_for_model(self.model)
+
+
+class Completion(NamedTuple):
+    output: Union[str, Dict[str, Any]]  # completion text, or an already decoded tool input
+    usage: Dict[str, int]
+
+
+class Backend:
+    """Interface of a provider backend"""
+
+    name = ""
+
+    def prewarm(self, background: bool = False):
+        """Load what the first request would otherwise wait for (startup / Lambda INIT)"""
+
+    async def startup(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def prepare(self, call: Call):
+        """Set up provider resources for a prefix many calls will share (an interview session)"""
+
+    async def complete(self, call: Call) -> Completion:
+        """One provider call; failures are raised for the scheduler to classify and retry"""
+        raise NotImplementedError
+
+    def stream(self, call: Call, on_usage: Callable[[Dict[str, int]], None]) -> AsyncIterator[str]:
+        """Yield completion text as it is generated; on_usage gets the token usage at the end"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+_litellm = None
+_litellm_lock = threading.Lock()
+
+
+def get_litellm():
+    """Import litellm on first use.
+
+    litellm pulls in tiktoken and its model cost map, which costs seconds at
+    import; keeping it out of module import keeps cold starts and the
+    non-LLM routes fast.
+    """
+    global _litellm
+    if _litellm is None:
+        with _litellm_lock:
+            if _litellm is None:
+                # Use the bundled cost map instead of fetching it over the network
+                os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+                import litellm
+                # Disable telemetry and token counting to avoid network issues
+                litellm.telemetry = False
+                litellm.drop_params = True
+                _litellm = litellm
+    return _litellm
+
+
+def prewarm_enabled() -> bool:
+    return os.getenv("PREWARM", "1").lower() not in ("0", "false", "no")
+
+
+class LiteLLMBackend(Backend):
+    name = "litellm"
+
+    def prewarm(self, background: bool = False):
+        if not prewarm_enabled():
+            return
+        if background:
+            threading.Thread(target=get_litellm, name="prewarm", daemon=True).start()
+        else:
+            get_litellm()
+
+    async def startup(self):
+        await asyncio.to_thread(self.prewarm)
+
+    @staticmethod
+    def model_name(model: str) -> str:
+        # A bare Gemini name would make litellm route to Vertex AI
+        if "/" not in model and provider_for_model(model) == "gemini":
+            return "gemini/" + model
+        return model
+
+    @staticmethod
+    def build_messages(call: Call) -> list:
+        """System prompt and job description form a stable, cacheable prefix"""
+        system_block = {"type": "text", "text": call.system_prompt}
+        job_block = {"type": "text", "text": call.job_context}
+        cache_control = cache_control_for(call.provider, call.system_prompt + call.job_context)
+        if cache_control:
+            system_block["cache_control"] = cache_control
+            job_block["cache_control"] = cache_control
+        return [
+            {"role": "system", "content": [system_block]},
+            {"role": "user", "content": [job_block, {"type": "text", "text": call.prompt}]}
+        ]
+
+    @staticmethod
+    def provider_options(call: Call) -> dict:
+        """Extra litellm kwargs: per-request credentials and an optional API base (proxy or mock)
+
+        The key is passed per call rather than through os.environ, which is
+        shared by every concurrent request in the process.
+        """
+        env_name = "ANTHROPIC_API_BASE" if call.provider == "anthropic" else "GEMINI_API_BASE"
+        options = {}
+        api_base = os.getenv(env_name)
+        if api_base:
+            options["api_base"] = api_base
+        if call.api_key:
+            options["api_key"] = call.api_key
+        return options
+
+    def _options(self, call: Call) -> dict:
+        return dict(
+            model=self.model_name(call.model),
+            messages=self.build_messages(call),
+            temperature=TEMPERATURE,
+            max_tokens=call.max_tokens,
+            **self.provider_options(call)
+        )
+
+    async def complete(self, call: Call) -> Completion:
+        structured = litellm_response_format() if call.structured else {}
+        completion = await get_litellm().acompletion(**self._options(call), **structured)
+        return Completion(completion.choices[0].message.content, usage_from_litellm(completion))
+
+    async def stream(self, call: Call, on_usage: Callable[[Dict[str, int]], None]) -> AsyncIterator[str]:
+        stream = await get_litellm().acompletion(**self._options(call), stream=True,
+                                                 stream_options={"include_usage": True})
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                on_usage(usage_from_litellm(chunk))
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class HTTPBackend(Backend):
+    name = "http"
+
+    def __init__(self):
+        self.context_cache = GeminiContextCache()
+
+    def prewarm(self, background: bool = False):
+        # Building the clients (and their SSL contexts) is quick: never worth a thread
+        if prewarm_enabled():
+            transport.prewarm()
+
+    async def startup(self):
+        await transport.startup()
+
+    async def shutdown(self):
+        await transport.shutdown()
+
+    @staticmethod
+    def api_key(provider: str, api_key: Optional[str]) -> str:
+        env_name = transport.PROVIDER_KEY_ENV[provider]
+        api_key = api_key or os.getenv(env_name)
+        if not api_key:
+            raise ProviderError(env_name + " not set", retryable=False)
+        return api_key
+
+    async def prepare(self, call: Call):
+        """Open the key's pooled client and create the Gemini context cache handle up front"""
+        api_key = self.api_key(call.provider, call.api_key)
+        client = transport.get_client(call.provider, api_key)
+        if call.provider == "gemini":
+            await self.context_cache.get(client, call.model.replace("gemini/", ""), api_key, call.system_prompt,
+                                         call.job_context)
+
+    async def complete(self, call: Call) -> Completion:
+        if call.provider == "anthropic":
+            return await self._complete_claude(call)
+        return await self._complete_gemini(call)
+
+    def stream(self, call: Call, on_usage: Callable[[Dict[str, int]], None]) -> AsyncIterator[str]:
+        if call.provider == "anthropic":
+            return self._stream_claude(call, on_usage)
+        return self._stream_gemini(call, on_usage)
+
+    async def _complete_gemini(self, call: Call) -> Completion:
+        api_key = self.api_key("gemini", call.api_key)
+        model_name = call.model.replace("gemini/", "")
+        url = f"/v1beta/models/{model_name}:generateContent"
+        client = transport.get_client("gemini", api_key)
+        cached_content = await self.context_cache.get(client, model_name, api_key, call.system_prompt,
+                                                      call.job_context)
+        response = await client.post(url, json=gemini_payload(call, cached_content))
+        if cached_content and response.status_code in (400, 403, 404):
+            # Cache handle expired or was evicted upstream: resend the prefix inline
+            self.context_cache.invalidate(cached_content)
+            response = await client.post(url, json=gemini_payload(call, None))
+        if response.status_code >= 400:
+            raise error_from_response(response, "Gemini")
+        data = response.json()
+        return Completion(data["candidates"][0]["content"]["parts"][0]["text"], usage_from_gemini(data))
+
+    async def _stream_gemini(self, call: Call, on_usage: Callable[[Dict[str, int]], None]) -> AsyncIterator[str]:
+        """Completion text from Gemini's streamGenerateContent (SSE)"""
+        api_key = self.api_key("gemini", call.api_key)
+        model_name = call.model.replace("gemini/", "")
+        url = f"/v1beta/models/{model_name}:streamGenerateContent?alt=sse"
+        client = transport.get_client("gemini", api_key)
+        cached_content = await self.context_cache.get(client, model_name, api_key, call.system_prompt,
+                                                      call.job_context)
+        last_event = None
+        async with client.stream("POST", url, json=gemini_payload(call, cached_content)) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                if cached_content:
+                    self.context_cache.invalidate(cached_content)
+                raise error_from_response(response, "Gemini")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                last_event = json.loads(line[5:])
+                for candidate in last_event.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            yield part["text"]
+        # The final chunk carries the cumulative usage
+        if last_event:
+            on_usage(usage_from_gemini(last_event))
+
+    async def _complete_claude(self, call: Call) -> Completion:
+        api_key = self.api_key("anthropic", call.api_key)
+        response = await transport.get_client("anthropic", api_key).post("/v1/messages", json=claude_payload(call))
+        if response.status_code >= 400:
+            raise error_from_response(response, "Claude")
+        data = response.json()
+        return Completion(claude_output(data), usage_from_anthropic(data))
+
+    async def _stream_claude(self, call: Call, on_usage: Callable[[Dict[str, int]], None]) -> AsyncIterator[str]:
+        """Completion text from the Messages API with stream=true (SSE)"""
+        api_key = self.api_key("anthropic", call.api_key)
+        payload = claude_payload(call)
+        payload["stream"] = True
+        usage = {}
+        client = transport.get_client("anthropic", api_key)
+        async with client.stream("POST", "/v1/messages", json=payload) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise error_from_response(response, "Claude")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                if event["type"] == "message_start":
+                    usage.update(event["message"].get("usage", {}))
+                elif event["type"] == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                    yield event["delta"]["text"]
+                elif event["type"] == "content_block_delta" and event["delta"].get("type") == "input_json_delta":
+                    # Tool-use output: the evaluation arrives as the tool input's JSON text
+                    yield event["delta"]["partial_json"]
+                elif event["type"] == "message_delta":
+                    usage.update(event.get("usage", {}))
+                elif event["type"] == "error":
+                    raise ProviderError(f"Claude API error: {event['error'].get('message')}", retryable=False)
+        on_usage(usage_from_anthropic({"usage": usage}))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"gemini_context_cache": self.context_cache.stats(), "http_clients": transport.stats()}
+
+
+def gemini_payload(call: Call, cached_content: Optional[str]) -> dict:
+    parts = [{"text": call.prompt}]
+    payload = {
+        "generationConfig": {
+            "temperature": TEMPERATURE,
+            "maxOutputTokens": call.max_tokens,
+            # JSON mode constrained to the evaluation schema
+            **(gemini_generation_config() if call.structured else {})
+        }
+    }
+    if cached_content:
+        # System prompt and job description already live in the cached content
+        payload["cachedContent"] = cached_content
+    else:
+        # Stable prefix first so Gemini's implicit prefix caching can apply
+        payload["systemInstruction"] = {"parts": [{"text": call.system_prompt}]}
+        parts.insert(0, {"text": call.job_context})
+    payload["contents"] = [{"role": "user", "parts": parts}]
+    return payload
+
+
+def claude_payload(call: Call) -> dict:
+    cache_control = cache_control_for("anthropic", call.system_prompt + call.job_context)
+    system_block = {"type": "text", "text": call.system_prompt}
+    content = [{"type": "text", "text": call.job_context}, {"type": "text", "text": call.prompt}]
+    if cache_control:
+        # Breakpoints after the system prompt and after the job description
+        system_block["cache_control"] = cache_control
+        content[0]["cache_control"] = cache_control
+    return {
+        "model": call.model,
+        "max_tokens": call.max_tokens,
+        "temperature": TEMPERATURE,
+        "system": [system_block],
+        "messages": [{"role": "user", "content": content}],
+        # Forced tool call: the evaluation comes back as schema-checked tool input
+        **(claude_tool_options() if call.structured else {})
+    }
+
+
+def claude_output(data: dict) -> Union[str, Dict[str, Any]]:
+    """The tool input of a tool-use response, otherwise the text of the first text block"""
+    for block in data["content"]:
+        if block.get("type") == "tool_use":
+            return block["input"]
+    return next(block["text"] for block in data["content"] if block.get("type") == "text")
+
+
+BACKENDS = {"litellm": LiteLLMBackend, "http": HTTPBackend}
+
+
+def get_backend(name: str) -> Backend:
+    """The backend configured by LLM_BACKEND ("litellm" or "http")"""
+    try:
+        return BACKENDS[name.lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown LLM_BACKEND {name!r}; expected one of: {', '.join(BACKENDS)}")
@@ -0,0 +1,169 @@
+"""
+Content-addressed cache for evaluation results.
+
+Results are keyed by a hash of the normalized request inputs, the model and
+the system prompt version. An in-process LRU tier (size bound + TTL) sits in
+front of an optional SQLite tier that survives restarts.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Collapse whitespace so trivially reformatted inputs share a key"""
+    return " ".join(text.split()) if text else ""
+
+
+def make_cache_key(question: str, answer: str, job_description: Optional[str], model: str,
+                   prompt_version: str, *extra: Any) -> str:
+    material = [
+        normalize_text(question),
+        normalize_text(answer),
+        normalize_text(job_description),
+        model,
+        prompt_version,
+        *extra,
+    ]
+    encoded = json.dumps(material, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class _SQLiteTier:
+    """Blocking SQLite store; always called through asyncio.to_thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use so importing the app never touches the disk
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM evaluations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM evaluations WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return row[1], json.loads(row[0])
+
+    def set(self, key: str, value: Dict, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO evaluations (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM evaluations WHERE key = ?", (key,))
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    def clear(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM evaluations")
+            self._conn.commit()
+            return cursor.rowcount
+
+
+class EvaluationCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400.0, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._disk = _SQLiteTier(db_path) if db_path else None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "EvaluationCache":
+        return cls(
+            max_entries=int(os.getenv("EVAL_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("EVAL_CACHE_TTL", "86400")),
+            db_path=os.getenv("EVAL_CACHE_DB") or None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._disk is not None
+
+    def _remember(self, key: str, value: Dict, expires_at: float):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] >= time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+        if self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, key)
+            if entry is not None:
+                self._remember(key, entry[1], entry[0])
+                self.hits += 1
+                return entry[1]
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Dict):
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.set, key, value, expires_at)
+
+    async def delete(self, key: str) -> bool:
+        deleted = self._entries.pop(key, None) is not None
+        if self._disk is not None:
+            deleted = await asyncio.to_thread(self._disk.delete, key) or deleted
+        return deleted
+
+    async def clear(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        if self._disk is not None:
+            count = max(count, await asyncio.to_thread(self._disk.clear))
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "disk_enabled": self._disk is not None,
+        }
@@ -0,0 +1,457 @@
+"""
+The evaluation engine: one pipeline on top of a pluggable provider backend.
+
+Engine owns every step around the provider call, so each one exists once
+and behaves the same whichever backend (app.backends) is configured:
+
+    prescore -> exact cache -> semantic cache -> coalescing -> compaction
+    -> hedging -> rate-limit scheduler -> backend call -> JSON extraction/validation
+
+Requests with "samples" > 1 skip the semantic cache and hedging and run
+that many evaluations as an ensemble (app.ensemble) instead.
+
+app.api exposes an Engine over HTTP; app.main and app.lambda_main differ
+only in the backend they default to.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app import metrics, packing
+from app.autoroute import AUTO_MODEL, AutoRouter
+from app.backends import Backend, Call, Completion
+from app.cache import EvaluationCache, make_cache_key, normalize_text
+from app.ensemble import Ensemble
+from app.hedging import HedgingRouter
+from app.limits import ConcurrencyLimiter
+from app.metrics import stage
+from app.prescore import Prescorer, local_evaluation
+from app.prompts import PROMPT_VERSION, SYSTEM_PROMPT, build_job_context, build_prompt
+from app.ratelimit import ProviderError, RateLimitScheduler, classify_error, to_http_exception
+from app.schemas import BatchItemResult, EnsembleEvaluationResponse, EvaluationRequest, EvaluationResponse
+from app.semantic import SemanticCache
+from app.singleflight import SingleFlight
+from app.structured import ExtractedJSON, StructuredOutputError, extract_json, to_model, validate_json
+from app.tokens import (ANSWER_MAX_TOKENS, COMPACTION_ENABLED, JOB_DESCRIPTION_MAX_TOKENS, OutputTokenBudget, compact,
+                        estimate_tokens)
+from app.transport import key_fingerprint, provider_for_model
+from app.usage import UsageStats
+
+DEFAULT_MODEL = os.getenv("MODEL", "gemini/gemini-2.0-flash")  # or "auto" (see app.autoroute)
+# Default for requests that don't set "routing": "single" or "hedged"
+ROUTING_MODE = os.getenv("ROUTING_MODE", "single")
+
+
+class EvaluationOutcome(NamedTuple):
+    evaluation: EvaluationResponse
+    cache_key: str
+    cache_hit: bool
+    coalesced: bool
+    similarity: Optional[float] = None  # set when the semantic cache answered
+    scored_locally: bool = False  # by the prescorer, without an LLM call (no cache key)
+
+
+def compact_request(request: EvaluationRequest, model: str) -> EvaluationRequest:
+    """The request with an oversized answer / job description compacted (see app.tokens)"""
+    with stage("compact"):
+        compacted = compact(request.question, request.answer, request.job_description)
+    metrics.report_total("X-Input-Tokens", compacted.tokens_after)
+    metrics.report_total("X-Input-Tokens-Saved", compacted.tokens_saved)
+    if not compacted.steps:
+        return request
+    metrics.observe_compaction(model, compacted.steps, compacted.tokens_saved)
+    return request.model_copy(update={"answer": compacted.answer, "job_description": compacted.job_description})
+
+
+def estimate_input_tokens(request: EvaluationRequest) -> int:
+    """Prompt size of a request, as compaction will leave it at most (for "model": "auto")"""
+    answer_tokens = estimate_tokens(request.answer)
+    jd_tokens = estimate_tokens(request.job_description)
+    if COMPACTION_ENABLED:
+        answer_tokens = min(answer_tokens, ANSWER_MAX_TOKENS)
+        jd_tokens = min(jd_tokens, JOB_DESCRIPTION_MAX_TOKENS)
+    return estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(request.question) + answer_tokens + jd_tokens
+
+
+def parse_output(output: Union[str, Dict[str, Any]], model: str = "") -> EvaluationResponse:
+    """Validate a completion (text, or an already decoded tool input) into an EvaluationResponse"""
+    if isinstance(output, str):
+        with stage("validate"):
+            evaluation = validate_json(output, EvaluationResponse)
+        if evaluation is not None:
+            return evaluation
+    try:
+        with stage("extract_json"):
+            extracted = extract_json(output) if isinstance(output, str) else ExtractedJSON(output, ())
+        with stage("validate"):
+            evaluation = to_model(extracted.value, EvaluationResponse)
+    except StructuredOutputError as e:
+        metrics.PARSE_FAILURES.inc(model)
+        raise HTTPException(status_code=500, detail="Failed to parse LLM response: " + str(e))
+    except ValidationError:
+        metrics.PARSE_FAILURES.inc(model)
+        raise
+    for repair in extracted.repairs:
+        metrics.PARSE_REPAIRS.inc(model, repair)
+    return evaluation
+
+
+class Engine:
+    """Caches, scheduling and routing around one backend; all state is per engine"""
+
+    def __init__(self, backend: Backend):
+        self.backend = backend
+        self.evaluation_cache = EvaluationCache.from_env()
+        self.semantic_cache = SemanticCache.from_env()
+        self.inflight = SingleFlight()
+        self.usage_stats = UsageStats()
+        self.scheduler = RateLimitScheduler.from_env()
+        self.router = HedgingRouter()
+        self.output_budget = OutputTokenBudget()
+        self.ensemble = Ensemble()
+        self.prescorer = Prescorer()
+        self.auto_router = AutoRouter()
+        self.batch_limiter = ConcurrencyLimiter(
+            per_provider=int(os.getenv("BATCH_PROVIDER_CONCURRENCY", "16")),
+            per_key=int(os.getenv("BATCH_KEY_CONCURRENCY", "8")),
+        )
+
+    def resolve_model(self, request: EvaluationRequest, decide: bool = False) -> str:
+        # Use request model if provided, otherwise use env default
+        model = request.model or DEFAULT_MODEL
+        if model != AUTO_MODEL:
+            return model
+        input_tokens = estimate_input_tokens(request)
+        if not decide:
+            return self.auto_router.choose(input_tokens).model
+        decision = self.auto_router.decide(input_tokens)
+        metrics.report("X-Model", decision.model)
+        return decision.model
+
+    def build_call(self, request: EvaluationRequest, model: str, max_tokens: int) -> Call:
+        with stage("build_prompt"):
+            return Call(model, request.api_key, SYSTEM_PROMPT, build_job_context(request.job_description),
+                        build_prompt(request), max_tokens)
+
+    async def prepare(self, model: str, api_key: Optional[str], job_description: Optional[str]):
+        """Best effort: warm the provider side of a job context before its first evaluation"""
+        call = Call(model, api_key, SYSTEM_PROMPT, build_job_context(job_description), "", 0)
+        try:
+            await self.backend.prepare(call)
+        except Exception:
+            pass  # the first evaluation sets it up (or reports the problem) instead
+
+    async def evaluate(self, request: EvaluationRequest) -> EvaluationOutcome:
+        """Cached result, near-identical cached result, or a fresh (coalesced) evaluation"""
+        model = self.resolve_model(request, decide=True)
+        if self.prescorer.enabled:
+            # Trivially weak answers: no LLM call, or a call to a cheaper model (see app.prescore)
+            with stage("prescore"):
+                weak = self.prescorer.check(request.question, request.answer, request.job_description)
+            if weak is not None and self.prescorer.mode == "local":
+                metrics.PRESCORES.inc("local")
+                metrics.report("X-Prescore", "local")
+                return EvaluationOutcome(local_evaluation(weak.features), "", False, False, scored_locally=True)
+            if weak is not None and request.model is None:
+                metrics.PRESCORES.inc("route")
+                metrics.report("X-Prescore", "routed")
+                model = self.prescorer.model
+        if request.samples is not None and request.samples > 1:
+            return await self.evaluate_ensemble(request, model, request.samples)
+        cache_key = make_cache_key(request.question, request.answer, request.job_description, model, PROMPT_VERSION)
+        with stage("cache_lookup"):
+            cached = await self.evaluation_cache.get(cache_key)
+        metrics.CACHE_REQUESTS.inc("miss" if cached is None else "hit")
+        if cached is not None:
+            return EvaluationOutcome(EvaluationResponse(**cached), cache_key, True, False)
+
+        # Near-identical answer to the same question and job (see app.semantic)
+        hit = None
+        if self.semantic_cache.enabled:
+            with stage("semantic_lookup"):
+                hit = self.semantic_cache.lookup(request.question, request.answer, request.job_description, model,
+                                                 PROMPT_VERSION)
+        if hit is not None:
+            metrics.CACHE_REQUESTS.inc("semantic_hit")
+            await self.evaluation_cache.set(cache_key, hit.value)
+            return EvaluationOutcome(EvaluationResponse(**hit.value), cache_key, True, False, hit.similarity)
+
+        # Identical concurrent requests share one upstream call. The key
+        # fingerprint keeps tenants with different credentials apart.
+        flight_key = cache_key + ":" + key_fingerprint(request.api_key)
+        (evaluation, used, stored_key), shared = await self.inflight.do(
+            flight_key, lambda: self.route_evaluation(request, model, cache_key))
+        if not shared:
+            self.semantic_cache.add(stored_key, request.question, request.answer, request.job_description, used,
+                                    PROMPT_VERSION, evaluation.model_dump())
+        return EvaluationOutcome(evaluation, stored_key, False, shared)
+
+    async def evaluate_ensemble(self, request: EvaluationRequest, model: str, k: int) -> EvaluationOutcome:
+        """Cached or fresh (coalesced) aggregate of k evaluations"""
+        if k > self.ensemble.max_samples:
+            raise HTTPException(status_code=400,
+                                detail=f"samples must be at most {self.ensemble.max_samples}")
+        # Its own key: an ensemble result is not interchangeable with a single sample
+        cache_key = make_cache_key(request.question, request.answer, request.job_description, model,
+                                   PROMPT_VERSION, "ensemble", str(k))
+        with stage("cache_lookup"):
+            cached = await self.evaluation_cache.get(cache_key)
+        metrics.CACHE_REQUESTS.inc("miss" if cached is None else "hit")
+        if cached is not None:
+            return EvaluationOutcome(EnsembleEvaluationResponse(**cached), cache_key, True, False)
+
+        async def run() -> EnsembleEvaluationResponse:
+            compacted = compact_request(request, model)
+            evaluation = await self.ensemble.run(lambda: self.sample(compacted, model), k)
+            await self.evaluation_cache.set(cache_key, evaluation.model_dump())
+            return evaluation
+
+        flight_key = cache_key + ":" + key_fingerprint(request.api_key)
+        evaluation, shared = await self.inflight.do(flight_key, run)
+        return EvaluationOutcome(evaluation, cache_key, False, shared)
+
+    async def route_evaluation(self, request: EvaluationRequest, model: str,
+                               cache_key: str) -> Tuple[EvaluationResponse, str, str]:
+        """Run the evaluation on `model`, hedged onto its fallback model when requested
+
+        Returns the evaluation, the model that produced it and the cache key it
+        was stored under: a fallback's result is cached for the fallback model only.
+        """
+        hedge = (request.routing or ROUTING_MODE) == "hedged"
+        original = request
+
+        def key_for(used: str) -> str:
+            # Cache keys are computed from the original text; only the prompt is compacted
+            if used == model:
+                return cache_key
+            return make_cache_key(original.question, original.answer, original.job_description, used,
+                                  PROMPT_VERSION)
+
+        request = compact_request(request, model)
+        evaluation, used = await self.router.run(model, lambda m: self.run_evaluation(request, m, key_for(m)),
+                                                 hedge=hedge)
+        return evaluation, used, key_for(used)
+
+    async def run_evaluation(self, request: EvaluationRequest, model: str, cache_key: str) -> EvaluationResponse:
+        """Evaluate and store the result in the cache"""
+        evaluation = await self.sample(request, model)
+        await self.evaluation_cache.set(cache_key, evaluation.model_dump())
+        return evaluation
+
+    async def sample(self, request: EvaluationRequest, model: str) -> EvaluationResponse:
+        """Call the LLM once and parse its JSON; errors surface as HTTPException"""
+        max_tokens = self.output_budget.max_tokens(model)
+        metrics.report("X-Max-Tokens", max_tokens)
+        call = self.build_call(request, model, max_tokens)
+        try:
+            completion = await self.complete(call)
+            self.output_budget.observe(model, completion.usage["output_tokens"])
+            evaluation = parse_output(completion.output, model)
+        except ProviderError as e:
+            raise to_http_exception(e)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="Evaluation failed: " + str(e))
+        return evaluation
+
+    @staticmethod
+    def estimate_call_tokens(call: Call) -> int:
+        # Reserved against the key's TPM budget, corrected once usage is known
+        return estimate_tokens(call.system_prompt + call.job_context + call.prompt) + call.max_tokens
+
+    async def complete(self, call: Call) -> Completion:
+        """backend.complete() behind the per-key rate limit scheduler, with retries"""
+        provider = call.provider
+        key_id = key_fingerprint(call.api_key)
+        estimated = self.estimate_call_tokens(call)
+        # The "auto" router learns the model's own latency: the last attempt, without the
+        # rate-limit waits, throttle pauses and backoff the "llm" stage also includes
+        attempt_seconds = 0.0
+
+        async def attempt() -> Completion:
+            nonlocal attempt_seconds
+            start = time.perf_counter()
+            try:
+                return await self.backend.complete(call)
+            finally:
+                attempt_seconds = time.perf_counter() - start
+
+        try:
+            with stage("llm") as timer:
+                completion = await self.scheduler.run(provider, key_id, attempt, tokens=estimated,
+                                                      label=provider.capitalize())
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.auto_router.observe(call.model, attempt_seconds, estimated - call.max_tokens, 0, ok=False)
+            raise
+        metrics.observe_upstream(call.model, timer.elapsed)
+        usage = completion.usage
+        self.auto_router.observe(call.model, attempt_seconds, usage["input_tokens"], usage["output_tokens"])
+        self.usage_stats.record(call.model, usage)
+        self.scheduler.reconcile(provider, key_id, estimated, usage["input_tokens"] + usage["output_tokens"])
+        return completion
+
+    async def stream(self, request: EvaluationRequest, model: str):
+        """Yield completion text chunks from the backend's streaming API"""
+        request = compact_request(request, model)
+        call = self.build_call(request, model, self.output_budget.max_tokens(model))
+        key_id = key_fingerprint(call.api_key)
+        reserved = self.estimate_call_tokens(call)
+        settled = False  # usage reconciled, or the stream ran to its end
+
+        def on_usage(usage: Dict[str, int]):
+            nonlocal reserved, settled
+            self.usage_stats.record(model, usage)
+            self.output_budget.observe(model, usage["output_tokens"])
+            actual = usage["input_tokens"] + usage["output_tokens"]
+            self.scheduler.reconcile(call.provider, key_id, reserved, actual)
+            reserved = actual
+            settled = True
+
+        # Streams wait for budget like any call but are not retried once opened
+        await self.scheduler.acquire(call.provider, key_id, reserved)
+        try:
+            async for chunk in self.backend.stream(call, on_usage):
+                yield chunk
+            settled = True
+            self.scheduler.report_success(call.provider, key_id)
+        except HTTPException:
+            raise
+        except Exception as e:
+            error = classify_error(e, call.provider.capitalize())
+            if error.throttled:
+                self.scheduler.report_throttle(call.provider, key_id, error.retry_after)
+            raise to_http_exception(error)
+        finally:
+            # Failed, cancelled or abandoned before its usage came in: the reservation goes back
+            if not settled:
+                self.scheduler.release_tokens(call.provider, key_id, reserved)
+
+    async def evaluate_batch_item(self, index: int, request: EvaluationRequest) -> BatchItemResult:
+        """Evaluate one batch item; failures are reported on the item, never raised"""
+        provider = provider_for_model(self.resolve_model(request))
+        try:
+            async with self.batch_limiter.acquire(provider, key_fingerprint(request.api_key)):
+                outcome = await self.evaluate(request)
+            return BatchItemResult(index=index, result=outcome.evaluation)
+        except HTTPException as e:
+            return BatchItemResult(index=index, error=str(e.detail))
+        except Exception as e:
+            return BatchItemResult(index=index, error="Evaluation failed: " + str(e))
+
+    def evaluate_packed(self, items: List[EvaluationRequest]) -> List[asyncio.Future]:
+        """Start packed evaluation; returns one future per item, in input order"""
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in items]
+        groups = {}
+        for i, item in enumerate(items):
+            model = self.resolve_model(item)
+            group = (model, normalize_text(item.job_description), item.api_key or "")
+            groups.setdefault(group, []).append(i)
+
+        prefix_tokens = packing.estimate_tokens(SYSTEM_PROMPT + packing.PACKED_INSTRUCTIONS)
+        pack_tasks = []
+        for (model, _, _), indexes in groups.items():
+            job_tokens = packing.estimate_tokens(items[indexes[0]].job_description)
+            item_tokens = [
+                packing.estimate_tokens(items[i].question) + packing.estimate_tokens(items[i].answer) + 8
+                for i in indexes
+            ]
+            for pack in packing.plan_packs(prefix_tokens + job_tokens, item_tokens):
+                pack_indexes = [indexes[p] for p in pack]
+                pack_tasks.append(asyncio.ensure_future(self.evaluate_pack(items, pack_indexes, model, futures)))
+
+        # Cancelling any item future (e.g. client disconnect) tears down the packs
+        def cancel_packs(future):
+            if future.cancelled():
+                for task in pack_tasks:
+                    task.cancel()
+
+        for future in futures:
+            future.add_done_callback(cancel_packs)
+        return futures
+
+    async def evaluate_pack(self, items: List[EvaluationRequest], indexes: List[int], model: str,
+                            futures: List[asyncio.Future]):
+        def settle(index: int, result: BatchItemResult):
+            if not futures[index].done():
+                futures[index].set_result(result)
+
+        try:
+            await self.run_pack(items, indexes, model, settle)
+        except Exception as e:
+            for i in indexes:
+                settle(i, BatchItemResult(index=i, error="Evaluation failed: " + str(e)))
+
+    async def run_pack(self, items: List[EvaluationRequest], indexes: List[int], model: str, settle):
+        pending = []
+        for i in indexes:
+            request = items[i]
+            cache_key = make_cache_key(request.question, request.answer, request.job_description, model,
+                                       PROMPT_VERSION, "packed")
+            cached = await self.evaluation_cache.get(cache_key)
+            if cached is not None:
+                settle(i, BatchItemResult(index=i, result=EvaluationResponse(**cached)))
+            else:
+                pending.append((i, cache_key))
+
+        parsed = [None] * len(pending)
+        if len(pending) > 1:
+            compacted = [compact_request(items[i], model) for i, _ in pending]
+            first = compacted[0]
+            call = Call(
+                model,
+                first.api_key,
+                SYSTEM_PROMPT + packing.PACKED_INSTRUCTIONS,
+                build_job_context(first.job_description),
+                packing.build_packed_prompt([(item.question, item.answer) for item in compacted]),
+                packing.output_budget(len(pending)),
+                structured=False,  # a JSON array of evaluations, not one evaluation
+            )
+            try:
+                async with self.batch_limiter.acquire(call.provider, key_fingerprint(first.api_key)):
+                    completion = await self.complete(call)
+                parsed = packing.split_packed_response(completion.output, len(pending))
+            except Exception:
+                pass  # every item falls back to a single evaluation below
+
+        retry = []
+        for (i, cache_key), entry in zip(pending, parsed):
+            try:
+                evaluation = EvaluationResponse(**entry) if entry is not None else None
+            except ValidationError:
+                evaluation = None
+            if evaluation is None:
+                retry.append(i)
+                continue
+            await self.evaluation_cache.set(cache_key, evaluation.model_dump())
+            settle(i, BatchItemResult(index=i, result=evaluation))
+
+        # Only the items that did not come back usable are retried, one at a time
+        for i in retry:
+            settle(i, await self.evaluate_batch_item(i, items[i]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "cache": self.evaluation_cache.stats(),
+            "semantic_cache": self.semantic_cache.stats(),
+            "coalescing": self.inflight.stats(),
+            "usage": self.usage_stats.stats(),
+            "rate_limits": self.scheduler.stats(),
+            "routing": self.router.stats(),
+            "max_output_tokens": self.output_budget.stats(),
+            "ensemble": self.ensemble.stats(),
+            "prescore": self.prescorer.stats(),
+            "batch_in_flight": {
+                "providers": self.batch_limiter.providers.in_use(),
+                "keys": self.batch_limiter.keys.in_use(),
+            },
+            **self.backend.stats(),
+        }
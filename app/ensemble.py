@@ -0,0 +1,186 @@
+"""
+Score-consistency ensembles: k samples of one evaluation, aggregated.
+
+A single sample drifts by several points between runs, even at a low
+temperature. With "samples": k on a request, the engine starts k
+evaluations concurrently and aggregates what comes back:
+
+- score and each criterion: the median (job_alignment over the samples that
+  scored it);
+- summary: the sample whose score is closest to the median;
+- strengths, weaknesses, improvement_suggestions: merged across samples,
+  near-duplicates dropped, points made by more samples first.
+
+Early stopping: once ENSEMBLE_MIN_AGREE samples are in and all scores so
+far are within ENSEMBLE_TOLERANCE points of each other, the rest are
+cancelled, so consistent answers wait only for the fastest samples. All k
+calls are already sent by then, though. With ENSEMBLE_STAGGER_MS set, only
+MIN_AGREE samples start at once and the rest follow when those disagree,
+fail or take longer than the stagger: consistent answers then cost about
+MIN_AGREE calls, at the price of latency when they do not agree. The spread
+is reported with the result (EnsembleStats). benchmarks/bench_ensemble.py
+measures latency, calls and score stability for each mode.
+"""
+import asyncio
+import os
+import re
+import statistics
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.schemas import CriteriaBreakdown, EnsembleEvaluationResponse, EnsembleStats, EvaluationResponse
+
+ENSEMBLE_MAX_SAMPLES = int(os.getenv("ENSEMBLE_MAX_SAMPLES", "5"))
+ENSEMBLE_TOLERANCE = float(os.getenv("ENSEMBLE_TOLERANCE", "5"))
+ENSEMBLE_MIN_AGREE = int(os.getenv("ENSEMBLE_MIN_AGREE", "2"))
+# > 0: start MIN_AGREE samples, the rest only on disagreement or after this long
+ENSEMBLE_STAGGER_MS = float(os.getenv("ENSEMBLE_STAGGER_MS", "0"))
+# Two list entries sharing this share of their words are the same point
+DUPLICATE_OVERLAP = 0.6
+
+LIST_FIELDS = ("strengths", "weaknesses", "improvement_suggestions")
+CRITERIA = ("relevance", "clarity", "depth", "impact", "job_alignment")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _median(values: List[int]) -> int:
+    return int(round(statistics.median(values)))
+
+
+def _stdev(values: List[int]) -> float:
+    return round(statistics.pstdev(values), 2) if len(values) > 1 else 0.0
+
+
+def point_words(text: str) -> frozenset:
+    return frozenset(_WORD.findall(text.lower()))
+
+
+def same_point(words: frozenset, other: frozenset) -> bool:
+    """Whether two feedback entries (as point_words) make the same point"""
+    shared = len(words & other)
+    return words == other or (shared > 0 and shared / min(len(words), len(other)) >= DUPLICATE_OVERLAP)
+
+
+def merge_points(lists: List[List[str]]) -> List[str]:
+    """Entries of all samples without near-duplicates, most agreed-on first"""
+    groups: List[List[Any]] = []  # [representative, its words, samples mentioning it, first position]
+    for sample in lists:
+        seen = set()
+        for position, entry in enumerate(sample):
+            words = point_words(entry)
+            for i, group in enumerate(groups):
+                if same_point(words, group[1]):
+                    if i not in seen:
+                        group[2] += 1
+                        seen.add(i)
+                    break
+            else:
+                seen.add(len(groups))
+                groups.append([entry, words, 1, position])
+    groups.sort(key=lambda group: (-group[2], group[3]))
+    # No longer than the longest sample's list: merging should not pad the feedback
+    limit = max((len(sample) for sample in lists), default=0)
+    return [group[0] for group in groups[:limit]]
+
+
+def aggregate(samples: List[EvaluationResponse], requested: int, failed: int = 0,
+              stopped_early: bool = False) -> EnsembleEvaluationResponse:
+    scores = [sample.score for sample in samples]
+    median_score = _median(scores)
+    criteria: Dict[str, Optional[int]] = {}
+    criteria_stdev: Dict[str, float] = {}
+    for name in CRITERIA:
+        values = [getattr(sample.criteria_breakdown, name) for sample in samples]
+        values = [value for value in values if value is not None]
+        criteria[name] = _median(values) if values else None
+        if values:
+            criteria_stdev[name] = _stdev(values)
+    closest = min(samples, key=lambda sample: abs(sample.score - median_score))
+    return EnsembleEvaluationResponse(
+        score=median_score,
+        criteria_breakdown=CriteriaBreakdown(**criteria),
+        summary=closest.summary,
+        **{field: merge_points([getattr(sample, field) for sample in samples]) for field in LIST_FIELDS},
+        ensemble=EnsembleStats(
+            requested=requested,
+            completed=len(samples),
+            failed=failed,
+            stopped_early=stopped_early,
+            scores=scores,
+            score_stdev=_stdev(scores),
+            score_range=max(scores) - min(scores),
+            criteria_stdev=criteria_stdev,
+        ),
+    )
+
+
+class Ensemble:
+    """Runs k concurrent samples with early stopping; counts what was saved"""
+
+    def __init__(self, max_samples: int = ENSEMBLE_MAX_SAMPLES, tolerance: float = ENSEMBLE_TOLERANCE,
+                 min_agree: int = ENSEMBLE_MIN_AGREE, stagger_ms: float = ENSEMBLE_STAGGER_MS):
+        self.max_samples = max_samples
+        self.tolerance = tolerance
+        self.min_agree = max(1, min_agree)
+        self.stagger_ms = stagger_ms
+        self.runs = 0
+        self.samples_started = 0
+        self.samples_completed = 0
+        self.samples_cancelled = 0
+        self.stopped_early = 0
+
+    def agreed(self, scores: List[int]) -> bool:
+        return len(scores) >= self.min_agree and max(scores) - min(scores) <= self.tolerance
+
+    async def run(self, sample: Callable[[], Awaitable[EvaluationResponse]], k: int) -> EnsembleEvaluationResponse:
+        """Run up to k samples, aggregate them once they agree or all have finished"""
+        self.runs += 1
+        loop = asyncio.get_running_loop()
+        # With a stagger, the rest wait until the first samples disagree, fail or are slow
+        first = min(k, self.min_agree) if self.stagger_ms > 0 else k
+        tasks = [asyncio.ensure_future(sample()) for _ in range(first)]
+        deadline = loop.time() + self.stagger_ms / 1000
+        pending = set(tasks)
+        results: List[EvaluationResponse] = []
+        errors: List[BaseException] = []
+        try:
+            while pending:
+                timeout = max(0.0, deadline - loop.time()) if len(tasks) < k else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    else:
+                        results.append(task.result())
+                scores = [result.score for result in results]
+                if self.agreed(scores):
+                    break
+                if len(tasks) < k and (not done or errors or len(scores) >= self.min_agree):
+                    extra = [asyncio.ensure_future(sample()) for _ in range(k - len(tasks))]
+                    tasks.extend(extra)
+                    pending.update(extra)
+        finally:
+            for task in pending:
+                task.cancel()
+            # Retrieve the outcome of every task so none logs "exception never retrieved"
+            await asyncio.gather(*tasks, return_exceptions=True)
+        stopped_early = len(results) + len(errors) < k
+        self.samples_started += len(tasks)
+        self.samples_completed += len(results)
+        self.samples_cancelled += len(pending)
+        if not results:
+            raise errors[0]
+        if stopped_early:
+            self.stopped_early += 1
+        return aggregate(results, k, len(errors), stopped_early)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "samples_started": self.samples_started,
+            "samples_completed": self.samples_completed,
+            "samples_cancelled": self.samples_cancelled,
+            "stopped_early": self.stopped_early,
+            "tolerance": self.tolerance,
+            "min_agree": self.min_agree,
+            "stagger_ms": self.stagger_ms,
+        }
@@ -0,0 +1,173 @@
+"""
+Latency-aware routing: hedged requests and failover to an equivalent model.
+
+Every routed call is timed into a per-model latency window. In hedged mode
+the primary model gets until its recent HEDGE_PERCENTILE latency to answer;
+after that a second request goes to the fallback model and whichever valid
+result arrives first wins, the other is cancelled. An error from the primary
+fails over to the fallback straight away.
+
+Hedges cost extra tokens, so they draw from a budget that earns
+HEDGE_BUDGET hedges per routed request (at most HEDGE_BURST banked).
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+# Used until a model has HEDGE_MIN_SAMPLES latencies
+HEDGE_INITIAL_DELAY = float(os.getenv("HEDGE_INITIAL_DELAY", "10"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.25"))
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))
+HEDGE_BURST = float(os.getenv("HEDGE_BURST", "5"))
+LATENCY_WINDOW = 512
+
+# Same-provider equivalents, so the request's API key works for both
+DEFAULT_FALLBACKS = {
+    "gemini-2.5-flash": "gemini-2.0-flash",
+    "gemini-2.0-flash": "gemini-2.5-flash",
+    "gemini-2.0-flash-lite": "gemini-2.0-flash",
+    "gemini-2.5-pro": "gemini-2.5-flash",
+    "claude-sonnet-4-20250514": "claude-3-5-sonnet-20241022",
+    "claude-3-5-sonnet-20241022": "claude-sonnet-4-20250514",
+    "claude-3-haiku-20240307": "claude-3-5-sonnet-20241022",
+}
+
+
+def load_fallbacks() -> Dict[str, str]:
+    """DEFAULT_FALLBACKS overridden by FALLBACK_MODELS="primary=fallback,..." """
+    fallbacks = dict(DEFAULT_FALLBACKS)
+    for pair in os.getenv("FALLBACK_MODELS", "").split(","):
+        if "=" in pair:
+            primary, fallback = pair.split("=", 1)
+            fallbacks[primary.strip()] = fallback.strip()
+    return fallbacks
+
+
+class LatencyWindow:
+    """Most recent successful call latencies for one model"""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class HedgingRouter:
+    def __init__(self, fallbacks: Optional[Dict[str, str]] = None, percentile: float = HEDGE_PERCENTILE,
+                 min_samples: int = HEDGE_MIN_SAMPLES, initial_delay: float = HEDGE_INITIAL_DELAY,
+                 min_delay: float = HEDGE_MIN_DELAY, budget: float = HEDGE_BUDGET, burst: float = HEDGE_BURST):
+        self.fallbacks = load_fallbacks() if fallbacks is None else fallbacks
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.budget = budget
+        self.burst = burst
+        self._tokens = burst
+        self._latency: Dict[str, LatencyWindow] = {}
+        self.routed = 0
+        self.hedged = 0
+        self.fallback_wins = 0
+        self.over_budget = 0
+        self.failovers = 0
+
+    def fallback_for(self, model: str) -> Optional[str]:
+        # Keep any provider prefix ("gemini/...") on the fallback as well
+        prefix, _, name = model.rpartition("/")
+        fallback = self.fallbacks.get(model) or self.fallbacks.get(name)
+        if fallback and prefix and "/" not in fallback:
+            fallback = prefix + "/" + fallback
+        return fallback if fallback != model else None
+
+    def hedge_delay(self, model: str) -> float:
+        window = self._latency.get(model)
+        if window is None or len(window.samples) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, window.percentile(self.percentile))
+
+    def _take_budget(self) -> bool:
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        self.over_budget += 1
+        return False
+
+    async def _timed(self, model: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        start = time.perf_counter()
+        window = self._latency.setdefault(model, LatencyWindow())
+        try:
+            result = await call(model)
+        except asyncio.CancelledError:
+            # A cancelled hedge loser took at least this long; dropping it
+            # would bias the percentile (and so the hedge delay) downwards
+            window.observe(time.perf_counter() - start)
+            raise
+        window.observe(time.perf_counter() - start)
+        return result
+
+    async def run(self, model: str, call: Callable[[str], Awaitable[Any]], hedge: bool = False) -> Tuple[Any, str]:
+        """Call call(model), hedging/failing over when enabled; returns (result, model used)"""
+        self.routed += 1
+        self._tokens = min(self.burst, self._tokens + self.budget)
+        fallback = self.fallback_for(model) if hedge else None
+        if fallback is None:
+            return await self._timed(model, call), model
+
+        primary = asyncio.ensure_future(self._timed(model, call))
+        tasks = {primary: model}
+        try:
+            done, _ = await asyncio.wait([primary], timeout=self.hedge_delay(model))
+            fallback_started = not done and self._take_budget()
+            if fallback_started:
+                self.hedged += 1
+                tasks[asyncio.ensure_future(self._timed(fallback, call))] = fallback
+
+            first_error = None
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    used = tasks.pop(task)
+                    if task.exception() is None:
+                        if used != model:
+                            self.fallback_wins += 1
+                        return task.result(), used
+                    first_error = first_error or task.exception()
+                    if task is primary and not fallback_started:
+                        # Primary failed before (or without) a hedge: fail over
+                        self.failovers += 1
+                        fallback_started = True
+                        tasks[asyncio.ensure_future(self._timed(fallback, call))] = fallback
+            raise first_error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        latency = {}
+        for model, window in self._latency.items():
+            latency[model] = {
+                "samples": len(window.samples),
+                "p50_ms": round((window.percentile(50) or 0) * 1000, 1),
+                "p95_ms": round((window.percentile(95) or 0) * 1000, 1),
+                "p99_ms": round((window.percentile(99) or 0) * 1000, 1),
+                "hedge_after_ms": round(self.hedge_delay(model) * 1000, 1),
+            }
+        return {
+            "routed": self.routed,
+            "hedged": self.hedged,
+            "fallback_wins": self.fallback_wins,
+            "over_budget": self.over_budget,
+            "failovers": self.failovers,
+            "latency": latency,
+        }
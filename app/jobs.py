@@ -0,0 +1,473 @@
+"""
+Asynchronous evaluation jobs, persisted in SQLite.
+
+POST /jobs stores a job's items and returns its id straight away. A bounded
+pool of worker tasks evaluates pending items in the background, recording
+each result, progress counters and the job status as it goes, so
+GET /jobs/{id} and its partial results work while the job runs. When the
+last item finishes, the job's webhook (if any) is called.
+
+State lives in JOB_DB, so a crash or restart resumes a job instead of
+restarting it. Each runner takes a random id when it starts and holds a
+lease (JOB_LEASE_SECONDS) on the items and webhook deliveries it claims,
+renewed while it is alive; items and webhooks whose lease has expired are
+claimed again. Process ids are not used, since a restarted container
+reuses them. Several server workers can share the database; claims are
+made in IMMEDIATE transactions.
+
+API keys supplied with items are kept in the memory of the worker that took
+the submission and never written to disk; the database only records which
+live workers hold which key fingerprints, so an item needing a key is only
+claimed by a worker holding it. Once no live worker holds it (e.g. after a
+restart), the item fails with an error asking for it to be resubmitted.
+
+The runner's workers start with the app's lifespan, so jobs need a
+long-running server (app.server, uvicorn). The Lambda handler runs without
+the lifespan and has nothing to process items between invocations, so there
+the /jobs routes answer 503; use POST /evaluate/batch instead.
+
+Throughput is bounded by the provider quotas (the rate-limit scheduler
+and batch limiter used by every evaluation), not by JOB_CONCURRENCY, which
+only needs to be large enough to keep them busy.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+from app.transport import key_fingerprint
+
+# Writable on Lambda and in containers (the working directory may not be)
+JOB_DB = os.getenv("JOB_DB", "/tmp/jobs.sqlite3")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "16"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# A worker's claims expire this long after its last heartbeat (every third of it)
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "30"))
+WEBHOOK_ATTEMPTS = int(os.getenv("JOB_WEBHOOK_ATTEMPTS", "5"))
+WEBHOOK_TIMEOUT = float(os.getenv("JOB_WEBHOOK_TIMEOUT", "10"))
+# When set, webhooks carry X-Signature: sha256=<HMAC of the body>
+WEBHOOK_SECRET = os.getenv("JOB_WEBHOOK_SECRET", "")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    webhook_url TEXT,
+    webhook_status TEXT,
+    webhook_worker TEXT,
+    webhook_lease REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    request TEXT NOT NULL,
+    key_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status);
+CREATE TABLE IF NOT EXISTS job_keys (
+    key_id TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    lease_until REAL NOT NULL,
+    PRIMARY KEY (key_id, worker)
+);
+"""
+# Columns added since the first schema, for databases created before them
+ADDED_COLUMNS = (("jobs", "webhook_lease", "REAL"), ("job_items", "lease_until", "REAL"))
+
+# Evaluates one item: (index, request) -> (result, error)
+Evaluate = Callable[[int, Dict[str, Any]], Awaitable[Tuple[Optional[Dict[str, Any]], Optional[str]]]]
+
+
+class JobItem(NamedTuple):
+    job_id: str
+    index: int
+    request: Dict[str, Any]
+    key_id: str
+
+
+def _summary(row: sqlite3.Row) -> Dict[str, Any]:
+    done = row["completed"] + row["failed"]
+    return {
+        "id": row["id"],
+        "status": row["status"],
+        "total": row["total"],
+        "completed": row["completed"],
+        "failed": row["failed"],
+        "pending": row["total"] - done,
+        "progress": round(done / row["total"], 4) if row["total"] else 1.0,
+        "webhook_status": row["webhook_status"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+        "finished_at": row["finished_at"],
+    }
+
+
+class JobStore:
+    """Jobs and their items in SQLite; every call runs in a worker thread"""
+
+    def __init__(self, path: str = JOB_DB, lease: float = JOB_LEASE_SECONDS):
+        self.path = path
+        self.lease = lease
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            conn.executescript(SCHEMA)
+            for table, column, kind in ADDED_COLUMNS:
+                if column not in {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+            self._conn = conn
+        return self._conn
+
+    def _transaction(self, fn: Callable, *args):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn, *args)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    async def _run(self, fn: Callable, *args):
+        return await asyncio.to_thread(self._transaction, fn, *args)
+
+    async def create(self, items: List[Tuple[Dict[str, Any], str]], webhook_url: Optional[str],
+                     worker: str) -> Dict[str, Any]:
+        """Store a job; items are (request without api_key, key fingerprint) and `worker` holds their keys"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        key_ids = {key_id for _, key_id in items if key_id}
+
+        def create(conn):
+            conn.executemany("INSERT OR REPLACE INTO job_keys (key_id, worker, lease_until) VALUES (?, ?, ?)",
+                             [(key_id, worker, now + self.lease) for key_id in key_ids])
+            conn.execute(
+                "INSERT INTO jobs (id, status, total, webhook_url, webhook_status, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, len(items), webhook_url, "pending" if webhook_url else None, now, now))
+            conn.executemany(
+                "INSERT INTO job_items (job_id, idx, request, key_id, status) VALUES (?, ?, ?, ?, 'pending')",
+                [(job_id, i, json.dumps(request), key_id) for i, (request, key_id) in enumerate(items)])
+            return _summary(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+        return await self._run(create)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        def get(conn):
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return _summary(row) if row else None
+
+        return await self._run(get)
+
+    async def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Finished items (results and errors) in index order, from `offset`"""
+        def results(conn):
+            rows = conn.execute(
+                "SELECT idx, result, error FROM job_items WHERE job_id = ? AND status IN ('done', 'error') "
+                "AND idx >= ? ORDER BY idx LIMIT ?", (job_id, offset, limit)).fetchall()
+            return [{"index": row["idx"], "result": json.loads(row["result"]) if row["result"] else None,
+                     "error": row["error"]} for row in rows]
+
+        return await self._run(results)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Drop a job's pending items; items already running still finish"""
+        now = time.time()
+
+        def cancel(conn):
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] in ("queued", "running"):
+                conn.execute("UPDATE job_items SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'",
+                             (job_id,))
+                conn.execute("UPDATE jobs SET status = 'cancelled', updated_at = ?, finished_at = ? WHERE id = ?",
+                             (now, now, job_id))
+            return _summary(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+        return await self._run(cancel)
+
+    async def claim(self, worker: str) -> Optional[JobItem]:
+        """Mark the oldest pending item `worker` can run as running on it and return it
+
+        That is an item without a key, one whose key `worker` holds, or one whose
+        key no live worker holds any more (it then fails asking for a resubmit).
+        """
+        now = time.time()
+
+        def claim(conn):
+            row = conn.execute(
+                "SELECT job_id, idx, request, key_id FROM job_items WHERE status = 'pending' AND ("
+                "key_id = '' OR key_id IN (SELECT key_id FROM job_keys WHERE worker = ?) "
+                "OR key_id NOT IN (SELECT key_id FROM job_keys WHERE lease_until >= ?)) "
+                "ORDER BY rowid LIMIT 1", (worker, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE job_items SET status = 'running', worker = ?, lease_until = ?, "
+                         "attempts = attempts + 1 WHERE job_id = ? AND idx = ?",
+                         (worker, now + self.lease, row["job_id"], row["idx"]))
+            conn.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'",
+                         (now, row["job_id"]))
+            return JobItem(row["job_id"], row["idx"], json.loads(row["request"]), row["key_id"])
+
+        return await self._run(claim)
+
+    async def finish(self, item: JobItem, result: Optional[Dict[str, Any]], error: Optional[str]) -> bool:
+        """Record an item's outcome; True when it was the job's last item"""
+        now = time.time()
+
+        def finish(conn):
+            conn.execute("UPDATE job_items SET status = ?, result = ?, error = ?, worker = NULL, lease_until = NULL "
+                         "WHERE job_id = ? AND idx = ?",
+                         ("done" if error is None else "error", json.dumps(result) if result else None, error,
+                          item.job_id, item.index))
+            counter = "completed" if error is None else "failed"
+            conn.execute(f"UPDATE jobs SET {counter} = {counter} + 1, updated_at = ? WHERE id = ?",
+                         (now, item.job_id))
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (item.job_id,)).fetchone()
+            if job["status"] == "running" and job["completed"] + job["failed"] >= job["total"]:
+                conn.execute("UPDATE jobs SET status = 'completed', finished_at = ? WHERE id = ?",
+                             (now, item.job_id))
+                return True
+            return False
+
+        return await self._run(finish)
+
+    async def release(self, worker: str):
+        """Put `worker`'s running items back to pending and drop its keys (graceful shutdown)"""
+        def release(conn):
+            conn.execute("UPDATE job_items SET status = 'pending', worker = NULL, lease_until = NULL "
+                         "WHERE status = 'running' AND worker = ?", (worker,))
+            conn.execute("UPDATE jobs SET webhook_worker = NULL, webhook_lease = NULL WHERE webhook_worker = ?",
+                         (worker,))
+            conn.execute("DELETE FROM job_keys WHERE worker = ?", (worker,))
+
+        await self._run(release)
+
+    async def renew(self, worker: str):
+        """Heartbeat: extend the leases of everything `worker` holds"""
+        lease_until = time.time() + self.lease
+
+        def renew(conn):
+            conn.execute("UPDATE job_items SET lease_until = ? WHERE status = 'running' AND worker = ?",
+                         (lease_until, worker))
+            conn.execute("UPDATE jobs SET webhook_lease = ? WHERE webhook_status = 'pending' AND webhook_worker = ?",
+                         (lease_until, worker))
+            conn.execute("UPDATE job_keys SET lease_until = ? WHERE worker = ?", (lease_until, worker))
+
+        await self._run(renew)
+
+    async def recover(self) -> List[str]:
+        """Requeue items whose lease expired; returns jobs whose webhook still needs delivering"""
+        now = time.time()
+
+        def recover(conn):
+            conn.execute("UPDATE job_items SET status = 'pending', worker = NULL, lease_until = NULL "
+                         "WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)", (now,))
+            conn.execute("DELETE FROM job_keys WHERE lease_until < ?", (now,))
+            rows = conn.execute("SELECT id FROM jobs WHERE webhook_status = 'pending' "
+                                "AND status IN ('completed', 'cancelled') "
+                                "AND (webhook_lease IS NULL OR webhook_lease < ?)", (now,)).fetchall()
+            return [row["id"] for row in rows]
+
+        return await self._run(recover)
+
+    async def take_webhook(self, job_id: str, worker: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Claim the delivery of a job's webhook: (url, job summary), or None if not due"""
+        now = time.time()
+
+        def take(conn):
+            row = conn.execute("SELECT * FROM jobs WHERE id = ? AND webhook_status = 'pending'",
+                               (job_id,)).fetchone()
+            if row is None or (row["webhook_worker"] not in (None, worker) and (row["webhook_lease"] or 0) >= now):
+                return None
+            conn.execute("UPDATE jobs SET webhook_worker = ?, webhook_lease = ? WHERE id = ?",
+                         (worker, now + self.lease, job_id))
+            return row["webhook_url"], _summary(row)
+
+        return await self._run(take)
+
+    async def set_webhook_status(self, job_id: str, status: str):
+        def update(conn):
+            conn.execute("UPDATE jobs SET webhook_status = ?, webhook_worker = NULL, webhook_lease = NULL "
+                         "WHERE id = ?", (status, job_id))
+
+        await self._run(update)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobRunner:
+    """Bounded pool of worker tasks evaluating pending job items"""
+
+    def __init__(self, store: JobStore, evaluate: Evaluate, concurrency: int = JOB_CONCURRENCY,
+                 poll_interval: float = JOB_POLL_INTERVAL):
+        self.store = store
+        self.evaluate = evaluate
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = uuid.uuid4().hex
+        self._keys: Dict[str, str] = {}  # key fingerprint -> API key, never persisted
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._webhooks: set = set()
+        self._client: Optional[httpx.AsyncClient] = None
+        self.processed = 0
+
+    async def submit(self, requests: List[Dict[str, Any]], webhook_url: Optional[str] = None) -> Dict[str, Any]:
+        items = []
+        for request in requests:
+            request = dict(request)
+            api_key = request.pop("api_key", None)
+            key_id = key_fingerprint(api_key) if api_key else ""
+            if api_key:
+                self._keys[key_id] = api_key
+            items.append((request, key_id))
+        job = await self.store.create(items, webhook_url, self.worker_id)
+        self._wakeup.set()
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.store.cancel(job_id)
+        if job is not None and job["status"] == "cancelled":
+            self._notify(job_id)
+        return job
+
+    @property
+    def running(self) -> bool:
+        """Whether this process has workers evaluating queued items"""
+        return bool(self._tasks)
+
+    async def start(self):
+        for job_id in await self.store.recover():
+            self._notify(job_id)
+        self._heartbeat = asyncio.ensure_future(self._renew())
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._tasks + [self._heartbeat]:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*self._tasks, *([self._heartbeat] if self._heartbeat else []),
+                             return_exceptions=True)
+        self._tasks = []
+        self._heartbeat = None
+        for task in list(self._webhooks):
+            task.cancel()
+        await asyncio.gather(*self._webhooks, return_exceptions=True)
+        # Interrupted items and webhooks are picked up again by the other or next processes
+        await self.store.release(self.worker_id)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self.store.close()
+
+    async def _renew(self):
+        while True:
+            await asyncio.sleep(self.store.lease / 3)
+            try:
+                await self.store.renew(self.worker_id)
+            except sqlite3.Error:
+                pass  # retried on the next beat, well before the lease runs out
+
+    async def _work(self):
+        while True:
+            item = await self.store.claim(self.worker_id)
+            if item is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    # Other processes may have added jobs, or died holding items
+                    for job_id in await self.store.recover():
+                        self._notify(job_id)
+                continue
+            if await self._process(item):
+                self._notify(item.job_id)
+
+    async def _process(self, item: JobItem) -> bool:
+        request = dict(item.request)
+        result, error = None, None
+        if item.key_id:
+            api_key = self._keys.get(item.key_id)
+            if api_key is None:
+                error = "api_key is no longer held by a running worker (e.g. after a restart); resubmit this item"
+            request["api_key"] = api_key
+        if error is None:
+            try:
+                result, error = await self.evaluate(item.index, request)
+            except Exception as e:
+                error = "Evaluation failed: " + str(e)
+        self.processed += 1
+        return await self.store.finish(item, result, error)
+
+    def _notify(self, job_id: str):
+        task = asyncio.ensure_future(self._deliver(job_id))
+        self._webhooks.add(task)
+        task.add_done_callback(self._webhooks.discard)
+
+    async def _deliver(self, job_id: str):
+        """POST the finished job's summary to its webhook, retrying with backoff"""
+        taken = await self.store.take_webhook(job_id, self.worker_id)
+        if taken is None:
+            return
+        url, summary = taken
+        body = json.dumps({"event": "job.finished", "job": summary}).encode()
+        headers = {"content-type": "application/json"}
+        if WEBHOOK_SECRET:
+            signature = hmac.new(WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+            headers["x-signature"] = "sha256=" + signature
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT)
+        for attempt in range(WEBHOOK_ATTEMPTS):
+            try:
+                response = await self._client.post(url, content=body, headers=headers)
+                if response.status_code < 300:
+                    await self.store.set_webhook_status(job_id, "delivered")
+                    return
+            except httpx.HTTPError:
+                pass
+            if attempt + 1 < WEBHOOK_ATTEMPTS:
+                await asyncio.sleep(min(60.0, 2.0 ** attempt))
+        await self.store.set_webhook_status(job_id, "failed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"worker_id": self.worker_id, "workers": len(self._tasks), "processed": self.processed,
+                "webhooks_in_flight": len(self._webhooks)}
@@ -0,0 +1,160 @@
+"""
+Incremental JSON parsing for streamed evaluations, plus SSE helpers.
+
+IncrementalEvaluationParser is fed raw completion text as it arrives and
+reports each top-level field of the evaluation object as soon as its value
+is complete. The list fields are reported item by item, so clients can
+render strengths/weaknesses/suggestions before the completion finishes.
+"""
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+LIST_FIELDS = ("strengths", "weaknesses", "improvement_suggestions")
+
+
+class IncrementalEvaluationParser:
+    def __init__(self, list_fields=LIST_FIELDS):
+        self.list_fields = set(list_fields)
+        self.text = ""
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._state = "key"  # key -> colon -> value -> (comma) -> key
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._item_index = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume more text; returns the events completed by it"""
+        self.text += chunk
+        events: List[Dict[str, Any]] = []
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            i = self._pos
+            c = text[i]
+            self._pos += 1
+
+            if not self._started:
+                # Skip code fences / prose until the root object opens
+                if c == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == "key" and self._key_start is not None:
+                        self._key = json.loads(text[self._key_start:i + 1])
+                        self._key_start = None
+                        self._state = "colon"
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state == "key":
+                    self._key_start = i
+                elif self._depth == 1 and self._state == "value" and self._value_start is None:
+                    self._value_start = i
+                elif self._in_list() and self._item_start is None:
+                    self._item_start = i
+                continue
+
+            if c.isspace():
+                continue
+
+            if self._depth == 1 and self._state == "colon":
+                if c == ":":
+                    self._state = "value"
+                continue
+
+            if self._depth == 1 and self._state == "value" and self._value_start is None:
+                self._value_start = i
+
+            if self._in_list() and self._item_start is None and c not in ",]":
+                self._item_start = i
+
+            if c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                if self._in_list():
+                    self._emit_item(events, i)
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit_field(events, i)
+                    self.done = True
+            elif c == ",":
+                if self._depth == 1:
+                    self._emit_field(events, i)
+                elif self._in_list():
+                    self._emit_item(events, i)
+        return events
+
+    def _in_list(self) -> bool:
+        return self._depth == 2 and self._state == "value" and self._key in self.list_fields \
+            and self._value_start is not None and self.text[self._value_start] == "["
+
+    def _emit_item(self, events: List[Dict[str, Any]], end: int):
+        if self._item_start is None:
+            return
+        raw = self.text[self._item_start:end].strip()
+        self._item_start = None
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        events.append({"field": self._key, "index": self._item_index, "item": value})
+        self._item_index += 1
+
+    def _emit_field(self, events: List[Dict[str, Any]], end: int):
+        key, start = self._key, self._value_start
+        self._state, self._key, self._value_start, self._item_index = "key", None, None, 0
+        if key is None or start is None:
+            return
+        if key in self.list_fields:
+            return  # already reported item by item
+        try:
+            value = json.loads(self.text[start:end].strip())
+        except ValueError:
+            return
+        events.append({"field": key, "value": value})
+
+
+def sse(event: str, data: Any) -> str:
+    return "event: " + event + "\ndata: " + json.dumps(data) + "\n\n"
+
+
+def replay_events(result: Dict[str, Any]) -> List[str]:
+    """SSE events for an already complete evaluation (e.g. a cache hit)"""
+    events = []
+    for key, value in result.items():
+        if key in LIST_FIELDS:
+            events += [sse("item", {"field": key, "index": i, "item": item}) for i, item in enumerate(value)]
+        else:
+            events.append(sse("field", {"field": key, "value": value}))
+    events.append(sse("result", result))
+    return events
+
+
+async def stream_evaluation(chunks: AsyncIterator[str],
+                            finalize: Callable[[str], Awaitable[Any]]) -> AsyncIterator[str]:
+    """Turn completion text chunks into SSE field/item events and a final result"""
+    parser = IncrementalEvaluationParser()
+    try:
+        async for chunk in chunks:
+            for event in parser.feed(chunk):
+                yield sse("item" if "item" in event else "field", event)
+        evaluation = await finalize(parser.text)
+        yield sse("result", evaluation.model_dump())
+    except Exception as e:
+        detail = getattr(e, "detail", None) or "Evaluation failed: " + str(e)
+        yield sse("error", {"detail": detail})
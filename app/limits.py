@@ -0,0 +1,52 @@
+"""
+Concurrency limits keyed by provider and by API key.
+
+Used by the batch endpoint so one large batch cannot monopolise a provider
+or a tenant's quota.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class KeyedSemaphore:
+    """A lazily created asyncio.Semaphore per key, dropped again when idle"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def acquire(self, key: str):
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = self._semaphores[key] = asyncio.Semaphore(self.limit)
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            async with semaphore:
+                yield
+        finally:
+            self._users[key] -= 1
+            if self._users[key] == 0:
+                del self._users[key]
+                del self._semaphores[key]
+
+    def in_use(self) -> Dict[str, int]:
+        return dict(self._users)
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent work per API key and per provider"""
+
+    def __init__(self, per_provider: int, per_key: int):
+        self.providers = KeyedSemaphore(per_provider)
+        self.keys = KeyedSemaphore(per_key)
+
+    @asynccontextmanager
+    async def acquire(self, provider: str, key_id: str):
+        # Always take the tenant slot first so a waiting tenant does not hold
+        # a provider slot it cannot use yet.
+        async with self.keys.acquire(provider + ":" + key_id):
+            async with self.providers.acquire(provider):
+                yield
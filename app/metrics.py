@@ -0,0 +1,285 @@
+"""
+Prometheus-style metrics and per-request stage timing.
+
+A small in-process registry of counters and histograms, rendered in the
+Prometheus text format by the /metrics endpoint. Stages of an evaluation
+are timed with `with stage("extract_json"):`; each stage feeds the
+evaluation_stage_seconds histogram and the current request's
+Server-Timing header (added by MetricsMiddleware).
+
+Request-level figures that are not timings (e.g. prompt tokens saved by
+compaction) are attached as response headers with report().
+
+Everything is plain arithmetic on perf_counter() values, cheap enough to
+leave on; METRICS=0 turns the middleware and stage timing off entirely.
+
+The registry belongs to one process. Under the multi-worker app.server each
+worker also publishes a snapshot of it (see app.workerstats), and /metrics
+renders the sum over all workers, so any worker answers a scrape with the
+same, monotonic series.
+"""
+import contextvars
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS", "1").lower() not in ("0", "false", "no")
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}"
+                for labels, value in sorted(self._values.items())]
+
+    def empty(self) -> "Counter":
+        return Counter(self.name, self.help, self.labelnames)
+
+    def snapshot(self) -> list:
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+    def merge(self, snapshot: list):
+        for labels, value in snapshot:
+            self.inc(*labels, amount=value)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+    def empty(self) -> "Histogram":
+        return Histogram(self.name, self.help, self.labelnames, self.buckets)
+
+    def snapshot(self) -> list:
+        return [[list(labels), counts, total, count] for labels, (counts, total, count) in self._series.items()]
+
+    def merge(self, snapshot: list):
+        for labels, counts, total, count in snapshot:
+            series = self._series.setdefault(tuple(labels), [[0] * (len(self.buckets) + 1), 0.0, 0])
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+            series[2] += count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines += metric.samples()
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, list]:
+        """JSON-serializable state of every metric, for merging in another process"""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def merged(self, snapshots: List[Dict[str, list]]) -> "Registry":
+        """A registry of the same metrics holding the sum of `snapshots`"""
+        total = Registry()
+        for metric in self._metrics:
+            combined = total.register(metric.empty())
+            for snapshot in snapshots:
+                combined.merge(snapshot.get(metric.name, []))
+        return total
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "evaluation_request_seconds", "Total time to answer an evaluation request", ("model", "status")))
+UPSTREAM_SECONDS = REGISTRY.register(Histogram(
+    "llm_upstream_seconds", "Provider call latency, including rate-limit waits and retries", ("model",)))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "evaluation_stage_seconds", "Time spent in each evaluation stage", ("stage",)))
+TOKENS = REGISTRY.register(Histogram(
+    "llm_tokens", "Tokens per provider call", ("model", "kind"), buckets=TOKEN_BUCKETS))
+PARSE_FAILURES = REGISTRY.register(Counter(
+    "llm_parse_failures_total", "Completions that could not be parsed into an evaluation", ("model",)))
+PARSE_REPAIRS = REGISTRY.register(Counter(
+    "llm_parse_repairs_total", "Completions that parsed only after repairing a defect", ("model", "repair")))
+RETRIES = REGISTRY.register(Counter(
+    "llm_retries_total", "Provider calls retried by the scheduler", ("provider", "reason")))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "evaluation_cache_requests_total", "Evaluation cache lookups", ("result",)))
+COMPACTIONS = REGISTRY.register(Counter(
+    "prompt_compactions_total", "Prompts shrunk before the provider call, by compaction step", ("model", "step")))
+TOKENS_SAVED = REGISTRY.register(Counter(
+    "prompt_tokens_saved_total", "Estimated input tokens removed by compaction", ("model",)))
+PRESCORES = REGISTRY.register(Counter(
+    "evaluation_prescores_total", "Answers the local prescorer judged weak, by action taken", ("action",)))
+ADMISSION_QUEUE_SECONDS = REGISTRY.register(Histogram(
+    "admission_queue_seconds", "Time admitted requests waited for an in-flight slot", ("lane",)))
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "admission_rejections_total", "Requests turned away with 503 by admission control", ("lane", "reason")))
+
+
+def observe_request(model: str, status: str, start: float):
+    if METRICS_ENABLED:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, model, status)
+
+
+def observe_upstream(model: str, seconds: float):
+    if METRICS_ENABLED:
+        UPSTREAM_SECONDS.observe(seconds, model)
+
+
+def record_usage(model: str, usage: Dict[str, int]):
+    if not METRICS_ENABLED:
+        return
+    for kind in ("input", "output", "cached"):
+        TOKENS.observe(usage.get(kind + "_tokens", 0), model, kind)
+
+
+def observe_compaction(model: str, steps: Sequence[str], tokens_saved: int):
+    if not METRICS_ENABLED:
+        return
+    for step in steps:
+        COMPACTIONS.inc(model, step)
+    TOKENS_SAVED.inc(model, amount=tokens_saved)
+
+
+# Stage timings of the request being handled, for its Server-Timing header
+_timings: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("stage_timings", default=None)
+# Extra response headers of the request being handled, set with report()
+_reported: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("reported_headers", default=None)
+
+
+def report(header: str, value):
+    """Attach `header: value` to the current request's response (no-op outside a request)"""
+    reported = _reported.get()
+    if reported is not None:
+        reported[header.lower()] = str(value)
+
+
+def report_total(header: str, amount: int):
+    """Like report(), but summed over the request (e.g. across the items of a batch)"""
+    reported = _reported.get()
+    if reported is not None:
+        reported[header.lower()] = str(int(reported.get(header.lower(), 0)) + amount)
+
+
+class stage:
+    """Context manager timing one stage: `with stage("llm") as timer: ...; timer.elapsed`"""
+    __slots__ = ("name", "start", "elapsed")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        if METRICS_ENABLED:
+            STAGE_SECONDS.observe(self.elapsed, self.name)
+            timings = _timings.get()
+            if timings is not None:
+                timings.append((self.name, self.elapsed))
+        return False
+
+
+def server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing header value; repeated stages (e.g. retries) are summed"""
+    merged: Dict[str, float] = {}
+    for name, elapsed in timings:
+        merged[name] = merged.get(name, 0.0) + elapsed
+    parts = [f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in merged.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """ASGI middleware collecting stage timings per request into Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        timings: list = []
+        reported: dict = {}
+        token = _timings.set(timings)
+        reported_token = _reported.set(reported)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and (timings or reported):
+                headers = list(message.get("headers", []))
+                if timings:
+                    header = server_timing(timings, time.perf_counter() - start)
+                    # Timing-Allow-Origin lets a cross-origin front end read the timings
+                    headers += [(b"server-timing", header.encode()), (b"timing-allow-origin", b"*")]
+                headers += [(name.encode(), value.encode()) for name, value in reported.items()]
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            _reported.reset(reported_token)
@@ -0,0 +1,78 @@
+"""
+Multi-answer packing: evaluate several question/answer pairs that share a
+job description in one LLM call.
+
+The system prompt and job description are sent once per pack instead of once
+per answer. Pack size adapts to input/output token budgets.
+"""
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from app.structured import StructuredOutputError, extract_json_array
+from app.tokens import estimate_tokens
+
+PACK_MAX_ITEMS = int(os.getenv("PACK_MAX_ITEMS", "10"))
+PACK_MAX_INPUT_TOKENS = int(os.getenv("PACK_MAX_INPUT_TOKENS", "12000"))
+PACK_MAX_OUTPUT_TOKENS = int(os.getenv("PACK_MAX_OUTPUT_TOKENS", "8192"))
+PACK_OUTPUT_TOKENS_PER_ITEM = int(os.getenv("PACK_OUTPUT_TOKENS_PER_ITEM", "400"))
+
+PACKED_INSTRUCTIONS = """
+
+Batch mode: you will receive several numbered items that share one job description.
+Evaluate each item independently with the criteria above.
+Return ONLY a JSON array with exactly one object per item, in item order.
+Each object uses the JSON format above plus an "item" field with the item number."""
+
+
+def format_item(number: int, question: str, answer: str) -> str:
+    return "Item " + str(number) + ":\nQuestion: " + question + "\nAnswer: " + answer
+
+
+def build_packed_prompt(items: Sequence[Tuple[str, str]]) -> str:
+    """Item block of a packed prompt; the job description is sent once ahead of it"""
+    content = "Evaluate " + str(len(items)) + " items."
+    for number, (question, answer) in enumerate(items, start=1):
+        content += "\n\n" + format_item(number, question, answer)
+    return content
+
+
+def plan_packs(prefix_tokens: int, item_tokens: Sequence[int]) -> List[List[int]]:
+    """Greedily group item indexes into packs that fit the token budgets"""
+    max_items = max(1, min(PACK_MAX_ITEMS, PACK_MAX_OUTPUT_TOKENS // PACK_OUTPUT_TOKENS_PER_ITEM))
+    packs: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = prefix_tokens
+    for index, tokens in enumerate(item_tokens):
+        fits = len(current) < max_items and current_tokens + tokens <= PACK_MAX_INPUT_TOKENS
+        if current and not fits:
+            packs.append(current)
+            current, current_tokens = [], prefix_tokens
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def output_budget(item_count: int) -> int:
+    return min(PACK_MAX_OUTPUT_TOKENS, PACK_OUTPUT_TOKENS_PER_ITEM * item_count)
+
+
+def split_packed_response(result_text: str, item_count: int) -> List[Optional[dict]]:
+    """Map a JSON array reply back to items; unusable entries come back as None"""
+    # Same tolerance as single replies: fences, prose around the array, truncation
+    try:
+        parsed = extract_json_array(result_text).value
+    except StructuredOutputError:
+        return [None] * item_count
+
+    results: List[Optional[dict]] = [None] * item_count
+    for position, entry in enumerate(parsed):
+        if not isinstance(entry, dict):
+            continue
+        number = entry.pop("item", None)
+        # Trust the item number when present, fall back to array position
+        index = number - 1 if isinstance(number, int) else position
+        if 0 <= index < item_count and results[index] is None:
+            results[index] = entry
+    return results
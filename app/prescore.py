@@ -0,0 +1,189 @@
+"""
+Local pre-scoring: spot trivially weak answers without calling the LLM.
+
+"I like your company." or "I've never really failed at anything important."
+are scored very weak by every model, after a full provider round trip.
+Prescorer computes a few cheap features of the answer in microseconds:
+
+- length in words;
+- evidence: numbers, percentages and amounts;
+- specificity: outcome verbs ("led", "reduced", ...) and named things
+  (capitalized words past the start of a sentence);
+- overlap of the answer's terms with the question's and the job
+  description's;
+- generic phrases ("I like your company", "never failed", "hard worker").
+
+From these it estimates a score. Only when the answer is short, has no
+evidence, and the estimate is at most PRESCORE_MAX_SCORE does it act; everything
+else goes to the LLM as before. What it does is set by PRESCORE:
+
+- "off" (default): nothing, features are not even computed;
+- "local": answer with a templated evaluation built from the features,
+  flagged with "scored_locally": true and the features that decided it;
+- "route": evaluate on the cheaper PRESCORE_MODEL instead of the default
+  model (requests that name a model keep it).
+
+benchmarks/bench_prescore.py reports how often the local verdict agrees
+with recorded LLM scores and the share of calls it would avoid.
+"""
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.schemas import CriteriaBreakdown, PrescoredEvaluationResponse, PrescoreFeatures
+from app.tokens import ACTION_WORDS, STOPWORDS
+
+PRESCORE_MODE = os.getenv("PRESCORE", "off").lower()
+# Act only on answers of at most this many words...
+PRESCORE_MAX_WORDS = int(os.getenv("PRESCORE_MAX_WORDS", "25"))
+# ...whose estimated score is at most this
+PRESCORE_MAX_SCORE = int(os.getenv("PRESCORE_MAX_SCORE", "35"))
+PRESCORE_MODEL = os.getenv("PRESCORE_MODEL", "gemini/gemini-2.0-flash-lite")
+
+# Criterion weights of the system prompt (app.prompts)
+WEIGHTS = {"relevance": 0.25, "clarity": 0.20, "depth": 0.25, "impact": 0.15, "job_alignment": 0.15}
+
+GENERIC_PHRASES = re.compile("|".join([
+    r"\bi (really )?(like|love) (your|the) company\b",
+    r"\bnever (really )?failed\b",
+    r"\bi (don'?t|do not) have (any )?weaknesses\b",
+    r"\b(i'?m|i am) (a |just )?(perfectionist|hard worker|team player|people person)\b",
+    r"\bwork (too|very) hard\b",
+    r"\bavoid conflict\b",
+    r"\bjust agree\b",
+    r"\bi (don'?t|do not) know\b",
+    r"\bno idea\b",
+    r"\b(need|want) (a|the) (job|money)\b",
+]), re.IGNORECASE)
+_WORD = re.compile(r"[A-Za-z0-9][A-Za-z0-9+#'.-]*")
+_EVIDENCE = re.compile(r"\d|%|\$")
+_SENTENCE_START = re.compile(r"(?:^|[.!?]\s+)([A-Z][A-Za-z]*)")
+
+
+class Prescore(NamedTuple):
+    features: PrescoreFeatures
+    confident: bool  # weak enough to act on without the LLM
+
+
+def _terms(words: List[str]) -> set:
+    return {word for word in words if word not in STOPWORDS}
+
+
+def _overlap(answer_terms: set, text: Optional[str]) -> Optional[float]:
+    if not text:
+        return None
+    terms = _terms([word.lower() for word in _WORD.findall(text)])
+    return round(len(answer_terms & terms) / len(terms), 2) if terms else None
+
+
+def features(question: str, answer: str, job_description: Optional[str] = None) -> PrescoreFeatures:
+    words = _WORD.findall(answer)
+    lowered = [word.lower() for word in words]
+    answer_terms = _terms(lowered)
+    sentence_starts = set(_SENTENCE_START.findall(answer))
+    named = sum(1 for word in words if word[:1].isupper() and word not in sentence_starts and word != "I")
+    f = PrescoreFeatures(
+        words=len(words),
+        evidence=len(_EVIDENCE.findall(answer)),
+        action_words=sum(1 for word in lowered if word in ACTION_WORDS),
+        named_things=named,
+        question_overlap=_overlap(answer_terms, question) or 0.0,
+        job_overlap=_overlap(answer_terms, job_description),
+        generic_phrases=[match.group(0) for match in GENERIC_PHRASES.finditer(answer)],
+    )
+    f.estimated_score = estimate(f)
+    return f
+
+
+def estimate(f: PrescoreFeatures) -> int:
+    """Rough 0-100 score; calibrated on the low end, where it is acted on"""
+    score = 15.0
+    score += min(f.words, 120) / 120 * 35
+    score += min(f.evidence, 4) * 5
+    score += min(f.action_words, 3) * 4 + min(f.named_things, 3) * 2
+    score += f.question_overlap * 15 + (f.job_overlap or 0.0) * 10
+    score -= len(f.generic_phrases) * 5
+    return int(round(min(100.0, max(0.0, score))))
+
+
+def prescore(question: str, answer: str, job_description: Optional[str] = None,
+             max_words: int = PRESCORE_MAX_WORDS, max_score: int = PRESCORE_MAX_SCORE) -> Prescore:
+    f = features(question, answer, job_description)
+    confident = f.words <= max_words and f.evidence == 0 and f.estimated_score <= max_score
+    return Prescore(f, confident)
+
+
+def _issues(f: PrescoreFeatures) -> List[Tuple[str, str]]:
+    """(weakness, improvement suggestion) pairs the features show"""
+    issues = []
+    if f.generic_phrases:
+        issues.append((f'Generic statement ("{f.generic_phrases[0]}")',
+                       "Replace general statements with your own experience"))
+    if f.words < 40:
+        issues.append((f"Very short answer ({f.words} words)",
+                       "Give a specific example using the STAR format (situation, task, action, result)"))
+    if not f.evidence:
+        issues.append(("No concrete examples, numbers or results",
+                       "Quantify the outcome: numbers, percentages, time or money saved"))
+    if f.question_overlap == 0:
+        issues.append(("Little connection to the question asked", "Answer the question that was asked directly"))
+    if f.job_overlap == 0:
+        issues.append(("No link to the job requirements", "Connect the answer to the role's requirements"))
+    return issues
+
+
+def local_evaluation(f: PrescoreFeatures) -> PrescoredEvaluationResponse:
+    """Templated evaluation for an answer prescore() was confident about"""
+    score = f.estimated_score
+    weights = dict(WEIGHTS)
+    if f.job_overlap is None:
+        # No job description: its weight goes to the other criteria, as the prompt asks
+        del weights["job_alignment"]
+    total = sum(weights.values())
+    criteria: Dict[str, Any] = {name: int(round(score * weight / total)) for name, weight in weights.items()}
+    issues = _issues(f)
+    return PrescoredEvaluationResponse(
+        score=score,
+        criteria_breakdown=CriteriaBreakdown(**criteria),
+        summary="Very weak answer: too short and general to show relevant experience or results.",
+        strengths=[],
+        weaknesses=[weakness for weakness, _ in issues],
+        improvement_suggestions=[suggestion for _, suggestion in issues],
+        prescore=f,
+    )
+
+
+class Prescorer:
+    """PRESCORE mode and thresholds, with counts of what it decided"""
+
+    def __init__(self, mode: str = PRESCORE_MODE, max_words: int = PRESCORE_MAX_WORDS,
+                 max_score: int = PRESCORE_MAX_SCORE, model: str = PRESCORE_MODEL):
+        self.mode = mode
+        self.max_words = max_words
+        self.max_score = max_score
+        self.model = model
+        self.checked = 0
+        self.decided = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("local", "route")
+
+    def check(self, question: str, answer: str, job_description: Optional[str]) -> Optional[Prescore]:
+        """The prescore when the answer is confidently weak, else None"""
+        self.checked += 1
+        result = prescore(question, answer, job_description, self.max_words, self.max_score)
+        if not result.confident:
+            return None
+        self.decided += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "checked": self.checked,
+            "decided": self.decided,
+            "max_words": self.max_words,
+            "max_score": self.max_score,
+            "model": self.model if self.mode == "route" else None,
+        }
@@ -0,0 +1,113 @@
+"""
+Provider-side prompt caching for the stable prompt prefix.
+
+The system prompt and (within one interview loop) the job description are
+identical on every call, so they are sent as a separate leading block:
+
+- Anthropic: the blocks carry cache_control markers; prefixes below the
+  model's minimum cacheable length are simply not cached by the API.
+- Gemini: 2.5 models cache identical prefixes implicitly. For long prefixes
+  an explicit cachedContents resource is created and reused by name
+  (GeminiContextCache), which also guarantees the discount on older models.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from app.tokens import estimate_tokens
+from app.singleflight import SingleFlight
+from app.transport import key_fingerprint
+
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE", "1").lower() not in ("0", "false", "no")
+# Gemini rejects explicit caches below a per-model minimum size
+GEMINI_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "4096"))
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", "3600"))
+GEMINI_CACHE_MAX_HANDLES = int(os.getenv("GEMINI_CACHE_MAX_HANDLES", "256"))
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def cache_control_for(provider: str, prefix_text: str) -> Optional[Dict[str, str]]:
+    """cache_control marker to attach to the stable prefix blocks, if any"""
+    if not PROMPT_CACHE_ENABLED:
+        return None
+    if provider == "anthropic":
+        return CACHE_CONTROL
+    # litellm turns Gemini cache_control into an explicit cachedContents call,
+    # which fails outright below the minimum size
+    if estimate_tokens(prefix_text) >= GEMINI_CACHE_MIN_TOKENS:
+        return CACHE_CONTROL
+    return None
+
+
+class GeminiContextCache:
+    """Creates and remembers cachedContents handles for (model, key, prefix)"""
+
+    def __init__(self):
+        self._handles: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._failed_until: Dict[str, float] = {}
+        self._creating = SingleFlight()
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def _key(model_name: str, api_key: str, system_prompt: str, job_context: str) -> str:
+        material = "\0".join([model_name, key_fingerprint(api_key), system_prompt, job_context])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def get(self, client: httpx.AsyncClient, model_name: str, api_key: str,
+                  system_prompt: str, job_context: str) -> Optional[str]:
+        """Return a cachedContents name for the prefix, or None to send it inline
+        
+        `client` must be the pooled client for `api_key`; it carries the credentials.
+        """
+        if not PROMPT_CACHE_ENABLED or estimate_tokens(system_prompt + job_context) < GEMINI_CACHE_MIN_TOKENS:
+            return None
+        key = self._key(model_name, api_key, system_prompt, job_context)
+        now = time.time()
+        handle = self._handles.get(key)
+        # Leave a minute of headroom so the handle does not expire mid-request
+        if handle is not None and handle[1] > now + 60:
+            self._handles.move_to_end(key)
+            self.reused += 1
+            return handle[0]
+        if self._failed_until.get(key, 0) > now:
+            return None
+        name, _ = await self._creating.do(
+            key, lambda: self._create(key, client, model_name, api_key, system_prompt, job_context)
+        )
+        return name
+
+    async def _create(self, key: str, client: httpx.AsyncClient, model_name: str, api_key: str,
+                      system_prompt: str, job_context: str) -> Optional[str]:
+        payload = {
+            "model": "models/" + model_name,
+            "systemInstruction": {"parts": [{"text": system_prompt}]},
+            "contents": [{"role": "user", "parts": [{"text": job_context}]}],
+            "ttl": str(GEMINI_CACHE_TTL) + "s",
+        }
+        try:
+            response = await client.post("/v1beta/cachedContents", json=payload)
+            response.raise_for_status()
+            name = response.json()["name"]
+        except (httpx.HTTPError, KeyError, ValueError):
+            # Don't hammer the API; send the prefix inline for a while
+            self._failed_until[key] = time.time() + 300
+            return None
+        self._handles[key] = (name, time.time() + GEMINI_CACHE_TTL)
+        while len(self._handles) > GEMINI_CACHE_MAX_HANDLES:
+            self._handles.popitem(last=False)
+        self.created += 1
+        return name
+
+    def invalidate(self, name: str):
+        for key, handle in list(self._handles.items()):
+            if handle[0] == name:
+                del self._handles[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"handles": len(self._handles), "created": self.created, "reused": self.reused}
@@ -0,0 +1,39 @@
+"""
+The evaluation prompt, identical for every backend.
+
+The system prompt and the job context are sent first, as the stable prefix
+providers can cache (see app.prompt_cache); the question and answer follow.
+"""
+import hashlib
+from typing import Optional
+
+from app.schemas import EvaluationRequest
+
+SYSTEM_PROMPT = """You are an Interview Answer Evaluation Agent that evaluates candidate interview answers using concise reasoning and structured scoring.
+
+Evaluation Criteria:
+- Relevance (25%): Directly answers the question
+- Clarity & Structure (20%): Logical, concise, easy to follow
+- Depth & Evidence (25%): Uses examples, results, or concrete reasoning
+- Impact & Professionalism (15%): Demonstrates value, ownership, confidence
+- Job Alignment (15%): Matches required skills (only if job_description exists)
+
+If job_description is not provided, redistribute its weight proportionally.
+
+Scoring: 0-100 (90-100 Excellent, 75-89 Good, 60-74 Average, 40-59 Weak, 0-39 Very weak)
+
+Return ONLY valid JSON:
+{"score": 0, "criteria_breakdown": {"relevance": 0, "clarity": 0, "depth": 0, "impact": 0, "job_alignment": null}, "summary": "", "strengths": [], "weaknesses": [], "improvement_suggestions": []}
+
+No markdown, no explanation. Only valid JSON."""
+
+# Part of every cache key, so editing the prompt invalidates old results
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+
+def build_job_context(job_description: Optional[str]) -> str:
+    return "Job Description: " + (job_description or "Not provided")
+
+
+def build_prompt(request: EvaluationRequest) -> str:
+    return "Evaluate:\nQuestion: " + request.question + "\nAnswer: " + request.answer
@@ -0,0 +1,328 @@
+"""
+Per-provider, per-API-key request scheduling with retries.
+
+Every provider call goes through RateLimitScheduler.run(), which:
+
+- keeps a requests-per-minute and a tokens-per-minute budget for each
+  (provider, API key) pair and queues callers FIFO until their share of the
+  budget is available, so one tenant's burst cannot starve another's;
+- pauses the key when the provider answers 429/529, honouring Retry-After,
+  and scales the budgets down (and slowly back up) so the next burst stays
+  under the provider's real limit;
+- retries only retryable failures (throttling, 5xx, timeouts and connection
+  errors) with jittered exponential backoff.
+
+Budgets default to unlimited (RATE_LIMIT_RPM / RATE_LIMIT_TPM = 0); then the
+scheduler only reacts to the provider's own throttling signals.
+"""
+import asyncio
+import email.utils
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from app.metrics import RETRIES
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+THROTTLE_STATUS = {429, 529}
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "20"))
+# Give up on a request that has been queued/retried longer than this
+RETRY_DEADLINE = float(os.getenv("RETRY_DEADLINE", "60"))
+MAX_TRACKED_KEYS = 1024
+
+
+class ProviderError(Exception):
+    """A failed provider call, with what is needed to decide on a retry"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None,
+                 retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = status_code in RETRYABLE_STATUS if retryable is None else retryable
+
+    @property
+    def throttled(self) -> bool:
+        return self.status_code in THROTTLE_STATUS
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Seconds to wait from retry-after-ms / Retry-After (seconds or HTTP date)"""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def error_from_response(response: httpx.Response, label: str) -> ProviderError:
+    return ProviderError(
+        f"{label} API error: {response.status_code} {response.text[:200]}",
+        status_code=response.status_code,
+        retry_after=parse_retry_after(response.headers),
+    )
+
+
+def classify_error(exc: Exception, label: str) -> ProviderError:
+    """Map httpx / litellm exceptions onto ProviderError"""
+    if isinstance(exc, ProviderError):
+        return exc
+    if isinstance(exc, httpx.HTTPStatusError):
+        return error_from_response(exc.response, label)
+    if isinstance(exc, (httpx.TimeoutException, httpx.TransportError)):
+        return ProviderError(f"{label} API error: {exc!r}", retryable=True)
+    # litellm exceptions carry status_code and usually the httpx response
+    status_code = getattr(exc, "status_code", None)
+    response = getattr(exc, "response", None)
+    retry_after = parse_retry_after(getattr(response, "headers", None))
+    if isinstance(status_code, int):
+        return ProviderError(f"{label} API error: {exc}", status_code=status_code, retry_after=retry_after)
+    if type(exc).__name__ in ("APIConnectionError", "Timeout"):
+        return ProviderError(f"{label} API error: {exc}", retryable=True)
+    return ProviderError(f"Evaluation failed: {exc}", retryable=False)
+
+
+def to_http_exception(error: ProviderError) -> HTTPException:
+    """Surface throttling as 429/503 with Retry-After; anything else stays a 500"""
+    if not error.throttled:
+        return HTTPException(status_code=500, detail=str(error))
+    headers = {"Retry-After": str(max(1, round(error.retry_after)))} if error.retry_after is not None else None
+    return HTTPException(status_code=429 if error.status_code == 429 else 503, detail=str(error), headers=headers)
+
+
+class _Bucket:
+    """Token bucket refilled continuously at capacity per minute; 0 = unlimited"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, capacity: float):
+        now = time.monotonic()
+        self.level = min(capacity, self.level + (now - self.updated) * capacity / 60)
+        self.updated = now
+
+    def delay(self, amount: float, scale: float) -> float:
+        if not self.per_minute:
+            return 0.0
+        capacity = self.per_minute * scale
+        self._refill(capacity)
+        # A request bigger than the whole budget waits for a full bucket
+        amount = min(amount, capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / capacity
+
+    def take(self, amount: float, scale: float):
+        if self.per_minute:
+            self.level -= min(amount, self.per_minute * scale)
+
+    def give_back(self, amount: float, scale: float):
+        if self.per_minute:
+            self.level = min(self.per_minute * scale, self.level + amount)
+
+
+class _KeyState:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = _Bucket(rpm)
+        self.tokens = _Bucket(tpm)
+        self.scale = 1.0  # shrinks on throttling, recovers on success
+        self.paused_until = 0.0
+        self.queued = 0
+        self.lock = asyncio.Lock()
+        self.loop = None
+
+
+class RateLimitScheduler:
+    def __init__(self, rpm: Optional[Dict[str, int]] = None, tpm: Optional[Dict[str, int]] = None,
+                 max_attempts: int = RETRY_MAX_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, deadline: float = RETRY_DEADLINE):
+        self.rpm = rpm or {}
+        self.tpm = tpm or {}
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._keys: "OrderedDict[str, _KeyState]" = OrderedDict()
+        self.admitted = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.retries = 0
+        self.throttled = 0
+        self.gave_up = 0
+
+    @classmethod
+    def from_env(cls) -> "RateLimitScheduler":
+        """Budgets from RATE_LIMIT_RPM/TPM, overridable per provider (GEMINI_RPM, ANTHROPIC_TPM, ...)"""
+        rpm, tpm = {}, {}
+        for provider in ("gemini", "anthropic"):
+            prefix = provider.upper()
+            rpm[provider] = int(os.getenv(prefix + "_RPM", os.getenv("RATE_LIMIT_RPM", "0")))
+            tpm[provider] = int(os.getenv(prefix + "_TPM", os.getenv("RATE_LIMIT_TPM", "0")))
+        return cls(rpm, tpm)
+
+    def _state(self, provider: str, key_id: str) -> _KeyState:
+        name = provider + ":" + key_id
+        state = self._keys.get(name)
+        loop = asyncio.get_running_loop()
+        if state is None:
+            state = _KeyState(self.rpm.get(provider, 0), self.tpm.get(provider, 0))
+            self._keys[name] = state
+            while len(self._keys) > MAX_TRACKED_KEYS:
+                oldest, idle = next(iter(self._keys.items()))
+                if idle.queued:
+                    break
+                del self._keys[oldest]
+        elif state.loop is not loop and not state.queued:
+            # Warm Lambda invocations may run on a new event loop
+            state.lock = asyncio.Lock()
+        state.loop = loop
+        self._keys.move_to_end(name)
+        return state
+
+    async def acquire(self, provider: str, key_id: str, tokens: int = 0) -> float:
+        """Wait (FIFO per key) until the key may send a request; returns seconds waited"""
+        state = self._state(provider, key_id)
+        start = time.monotonic()
+        state.queued += 1
+        try:
+            async with state.lock:
+                while True:
+                    delay = max(
+                        state.paused_until - time.monotonic(),
+                        state.requests.delay(1, state.scale),
+                        state.tokens.delay(tokens, state.scale),
+                    )
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                state.requests.take(1, state.scale)
+                state.tokens.take(tokens, state.scale)
+        finally:
+            state.queued -= 1
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        if waited > 0.001:
+            self.waited += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return waited
+
+    def reconcile(self, provider: str, key_id: str, estimated: int, actual: int):
+        """Correct the token budget once the real usage of a call is known"""
+        state = self._keys.get(provider + ":" + key_id)
+        if state is None or estimated == actual:
+            return
+        if actual > estimated:
+            state.tokens.take(actual - estimated, state.scale)
+        else:
+            state.tokens.give_back(estimated - actual, state.scale)
+
+    def release_tokens(self, provider: str, key_id: str, tokens: int):
+        """Return the tokens acquire() reserved for a call that failed or was cancelled"""
+        state = self._keys.get(provider + ":" + key_id)
+        if state is not None and tokens:
+            state.tokens.give_back(tokens, state.scale)
+
+    def report_throttle(self, provider: str, key_id: str, retry_after: Optional[float]):
+        """Record a 429/529: pause the key and shrink its budgets"""
+        state = self._state(provider, key_id)
+        self.throttled += 1
+        state.scale = max(0.1, state.scale * 0.5)
+        pause = retry_after if retry_after is not None else self.base_delay
+        state.paused_until = max(state.paused_until, time.monotonic() + min(pause, self.max_delay))
+
+    def report_success(self, provider: str, key_id: str):
+        state = self._keys.get(provider + ":" + key_id)
+        if state is not None and state.scale < 1.0:
+            state.scale = min(1.0, state.scale + 0.05)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry number (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def run(self, provider: str, key_id: str, fn: Callable[[], Awaitable[Any]], tokens: int = 0,
+                  label: str = "Provider") -> Any:
+        """Call fn() within the key's budget, retrying retryable ProviderErrors"""
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            await self.acquire(provider, key_id, tokens)
+            try:
+                result = await fn()
+            except Exception as e:
+                # A failed attempt used no tokens: retries must not charge the budget again
+                self.release_tokens(provider, key_id, tokens)
+                error = classify_error(e, label)
+                delay = error.retry_after if error.retry_after is not None else self.backoff(attempt)
+                # Like the key pause in report_throttle(): a long Retry-After is capped, and
+                # only the deadline decides whether the wait is still worth it
+                delay = min(delay, self.max_delay)
+                if error.throttled:
+                    self.report_throttle(provider, key_id, delay)
+                if (not error.retryable or attempt >= self.max_attempts
+                        or time.monotonic() + delay > deadline):
+                    if error.retryable:
+                        self.gave_up += 1
+                    raise error from e
+                self.retries += 1
+                RETRIES.inc(provider, "throttled" if error.throttled else str(error.status_code or "network"))
+                if not error.throttled:
+                    # Throttles already pause the whole key; other errors back off here
+                    await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled mid-call (hedge loser, ensemble early stop, client gone)
+                self.release_tokens(provider, key_id, tokens)
+                raise
+            self.report_success(provider, key_id)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        keys = {
+            name: {
+                "queue_depth": state.queued,
+                "paused_for_s": round(max(0.0, state.paused_until - now), 2),
+                "budget_scale": round(state.scale, 2),
+            }
+            for name, state in self._keys.items()
+            if state.queued or state.paused_until > now or state.scale < 1.0
+        }
+        return {
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "avg_wait_ms": round(self.wait_seconds / self.waited * 1000, 1) if self.waited else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 1),
+            "queue_depth": sum(state.queued for state in self._keys.values()),
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "gave_up": self.gave_up,
+            "keys": keys,
+        }
@@ -0,0 +1,42 @@
+"""
+Pre-serialized JSON responses for the hot routes.
+
+When a route returns a model, FastAPI validates it again against
+response_model, walks it through jsonable_encoder and encodes it with the
+stdlib json module: about 10x the cost of serializing it directly. The
+evaluation was already validated once, when it was parsed from the LLM
+output, so /evaluate and /evaluate/batch return a JSONBytesResponse instead.
+response_model stays on those routes for the OpenAPI schema.
+
+Models are serialized by pydantic-core, which is faster for them than
+model_dump() + orjson; plain dicts and lists go through orjson when it is
+installed. benchmarks/bench_serialization.py measures both paths.
+"""
+import json
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json instead
+    orjson = None
+
+
+def dump_json(content: Any) -> bytes:
+    """JSON bytes of a model, bytes already serialized, or plain JSON data"""
+    if isinstance(content, bytes):
+        return content
+    if isinstance(content, BaseModel):
+        return content.model_dump_json().encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class JSONBytesResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
@@ -0,0 +1,153 @@
+"""
+Request and response models of the HTTP API, shared by every entry point.
+"""
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, SerializeAsAny
+
+
+class EvaluationRequest(BaseModel):
+    question: str
+    answer: str
+    job_description: Optional[str] = None
+    model: Optional[str] = None  # Override default model
+    api_key: Optional[str] = None  # Override default API key
+    routing: Optional[str] = None  # "hedged": race a fallback model when the primary is slow
+    samples: Optional[int] = None  # > 1: median of that many evaluations (see app.ensemble)
+
+
+class CriteriaBreakdown(BaseModel):
+    relevance: int
+    clarity: int
+    depth: int
+    impact: int
+    job_alignment: Optional[int] = None
+
+
+class EvaluationResponse(BaseModel):
+    score: int
+    criteria_breakdown: CriteriaBreakdown
+    summary: str
+    strengths: List[str]
+    weaknesses: List[str]
+    improvement_suggestions: List[str]
+
+
+class EnsembleStats(BaseModel):
+    requested: int
+    completed: int
+    failed: int
+    stopped_early: bool  # the remaining samples were cancelled once the first ones agreed
+    scores: List[int]
+    score_stdev: float
+    score_range: int
+    criteria_stdev: Dict[str, float]
+
+
+class EnsembleEvaluationResponse(EvaluationResponse):
+    ensemble: EnsembleStats
+
+
+class PrescoreFeatures(BaseModel):
+    words: int
+    evidence: int  # digits, % and $ signs
+    action_words: int
+    named_things: int
+    question_overlap: float  # share of the question's terms used in the answer
+    job_overlap: Optional[float] = None  # same for the job description, if any
+    generic_phrases: List[str]
+    estimated_score: int = 0
+
+
+class PrescoredEvaluationResponse(EvaluationResponse):
+    scored_locally: bool = True  # templated from the features below, no LLM call
+    prescore: PrescoreFeatures
+
+
+class SessionRequest(BaseModel):
+    job_description: Optional[str] = None
+    model: Optional[str] = None
+    api_key: Optional[str] = None
+    routing: Optional[str] = None
+    samples: Optional[int] = None
+
+
+class SessionAnswer(BaseModel):
+    question: str
+    answer: str
+
+
+class SessionAnswerScore(BaseModel):
+    index: int
+    question: str  # first SESSION_QUESTION_CHARS characters
+    score: int
+
+
+class SessionSummary(BaseModel):
+    answers: int
+    failed: int
+    average_score: Optional[float] = None
+    min_score: Optional[int] = None
+    max_score: Optional[int] = None
+    score_stdev: float = 0.0
+    criteria_averages: Dict[str, float]
+    recurring_strengths: List[str]  # points made about more than one answer, most frequent first
+    recurring_weaknesses: List[str]
+    scores: List[SessionAnswerScore]
+
+
+class SessionInfo(BaseModel):
+    id: str
+    model: str
+    created_at: float
+    last_used_at: float
+    expires_at: float  # if left idle
+    summary: SessionSummary
+
+
+class SessionAnswerResult(BaseModel):
+    index: int
+    evaluation: SerializeAsAny[EvaluationResponse]
+    summary: SessionSummary
+
+
+class BatchEvaluationRequest(BaseModel):
+    items: List[EvaluationRequest]
+    stream: bool = False  # Emit NDJSON lines as items finish instead of one response
+    pack: bool = False  # Evaluate items sharing a job description in one LLM call
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    # SerializeAsAny: ensemble / locally scored results keep their extra fields
+    result: Optional[SerializeAsAny[EvaluationResponse]] = None
+    error: Optional[str] = None
+
+
+class BatchEvaluationResponse(BaseModel):
+    results: List[BatchItemResult]
+
+
+class JobRequest(BaseModel):
+    items: List[EvaluationRequest]
+    webhook_url: Optional[str] = None  # POSTed the job summary when it finishes
+
+
+class JobStatus(BaseModel):
+    id: str
+    status: str  # queued, running, completed or cancelled
+    total: int
+    completed: int
+    failed: int
+    pending: int
+    progress: float
+    webhook_status: Optional[str] = None  # pending, delivered or failed
+    created_at: float
+    updated_at: float
+    finished_at: Optional[float] = None
+
+
+class JobResults(BaseModel):
+    id: str
+    results: List[BatchItemResult]
+    next_offset: Optional[int] = None  # pass as ?offset= for the next page
@@ -0,0 +1,275 @@
+"""
+Semantic cache: reuse an evaluation for a near-identical answer.
+
+Many candidates give almost word-for-word the same answer to stock
+questions ("Tell me about yourself"). The exact-hash EvaluationCache misses
+those, so this layer sits behind it. An answer is embedded as a hashed
+bag of word unigrams, word bigrams and character 4-grams: local and
+CPU-only, with no model download. Its nearest cached neighbours above
+SEMANTIC_THRESHOLD (cosine similarity) are candidates.
+
+A candidate is only used when the two answers really are the same answer:
+- they share the question, job description, model and prompt version
+  (entries are partitioned by that scope, so only answers to the same
+  question are ever compared);
+- they differ by at most SEMANTIC_MAX_EDITS words, after filler words
+  ("um", "basically") are dropped and contractions expanded;
+- their numbers and negations match exactly. "Reduced costs by 40%" and
+  "by 4%", or "I have" and "I have not", embed close together but
+  deserve different scores.
+
+Only answers within SEMANTIC_MAX_EDITS words of the same length are
+compared. With NumPy installed their sparse vectors are packed into flat
+arrays and scored in one vectorized pass; without it, dict by dict. benchmarks/bench_semantic.py measures precision/recall per
+threshold on a synthetic paraphrase set.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import time
+import zlib
+from collections import Counter, OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: pure-Python sparse vectors instead
+    np = None
+
+from app.cache import normalize_text
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "0").lower() not in ("0", "false", "no")
+SEMANTIC_THRESHOLD = float(os.getenv("SEMANTIC_THRESHOLD", "0.85"))
+SEMANTIC_MAX_EDITS = int(os.getenv("SEMANTIC_MAX_EDITS", "3"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "10000"))
+SEMANTIC_DIMENSIONS = 1 << 14  # hashed feature space; collisions are rare at this size
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+FILLERS = frozenset("um umm uh uhh er erm hmm basically actually honestly literally".split())
+CONTRACTIONS = {"can't": "can not", "won't": "will not", "cannot": "can not", "n't": " not", "'m": " am",
+                "'re": " are", "'ve": " have", "'ll": " will", "'d": " would"}
+_CONTRACTION = re.compile(r"\b(can't|won't|cannot)\b|(n't|'m|'re|'ve|'ll|'d)\b")
+_FILLER_PHRASE = re.compile(r"\b(you know|i mean),")
+NEGATIONS = frozenset("no not never none nothing nobody neither nor".split())
+
+
+def words(text: str) -> List[str]:
+    """Lowercased words with contractions expanded and filler words dropped"""
+    text = _CONTRACTION.sub(lambda m: CONTRACTIONS[m.group()], text.lower().replace("’", "'"))
+    text = _FILLER_PHRASE.sub(" ", text)
+    return [w for w in _WORD.findall(text) if w not in FILLERS]
+
+
+def features(tokens: List[str]) -> Counter:
+    """Word unigrams and bigrams plus character 4-grams of the words"""
+    counts = Counter(tokens)
+    counts.update(a + " " + b for a, b in zip(tokens, tokens[1:]))
+    joined = " " + " ".join(tokens) + " "
+    counts.update("#" + joined[i:i + 4] for i in range(len(joined) - 3))
+    return counts
+
+
+def embed(tokens: List[str]) -> Dict[int, float]:
+    """Unit-length sparse vector {dimension: weight} of hashed features"""
+    vector: Dict[int, float] = {}
+    for feature, count in features(tokens).items():
+        h = zlib.crc32(feature.encode("utf-8"))
+        index = h & (SEMANTIC_DIMENSIONS - 1)
+        # Signed hashing: collisions cancel out on average instead of adding up
+        weight = (1.0 + math.log(count)) * (1.0 if h & 0x80000000 else -1.0)
+        vector[index] = vector.get(index, 0.0) + weight
+    norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+    return {index: w / norm for index, w in vector.items()}
+
+
+def _dot(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(i, 0.0) for i, w in a.items())
+
+
+def word_edits(a: List[str], b: List[str]) -> int:
+    """Words inserted, deleted or replaced to turn `a` into `b`"""
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    return sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal")
+
+
+def guard_signature(text: str, tokens: List[str]) -> Tuple[Tuple[str, ...], int]:
+    """What must match exactly between two answers: their numbers and negation count"""
+    return tuple(sorted(_NUMBER.findall(text))), sum(1 for w in tokens if w in NEGATIONS)
+
+
+def scope_key(question: str, job_description: Optional[str], model: str, prompt_version: str) -> str:
+    material = [normalize_text(question).lower(), normalize_text(job_description).lower(), model, prompt_version]
+    return hashlib.sha256(json.dumps(material).encode("utf-8")).hexdigest()
+
+
+class SemanticHit(NamedTuple):
+    value: Dict[str, Any]
+    cache_key: str  # exact-cache key of the entry that answered
+    similarity: float
+
+
+class _Entry(NamedTuple):
+    scope: str
+    expires_at: float
+    words: List[str]
+    signature: tuple
+    value: Dict[str, Any]
+
+
+class _Bucket:
+    """Cached answers of one scope and word count; sparse vectors packed for NumPy lazily"""
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.vectors: List[Dict[int, float]] = []
+        self._packed = None  # (indices, weights, offsets) of all vectors, concatenated
+
+    def add(self, key: str, vector: Dict[int, float]):
+        self.keys.append(key)
+        self.vectors.append(vector)
+        if self._packed is not None:
+            indices, weights, offsets = self._packed
+            self._packed = (
+                np.concatenate([indices, np.fromiter(vector, dtype=np.int32)]),
+                np.concatenate([weights, np.fromiter(vector.values(), dtype=np.float32)]),
+                np.append(offsets, len(indices)),
+            )
+
+    def remove(self, key: str):
+        i = self.keys.index(key)
+        del self.keys[i], self.vectors[i]
+        self._packed = None
+
+    def similarities(self, vector: Dict[int, float], dense) -> List[float]:
+        if dense is None:
+            return [_dot(vector, other) for other in self.vectors]
+        if self._packed is None:
+            self._packed = (
+                np.fromiter((i for v in self.vectors for i in v), dtype=np.int32),
+                np.fromiter((w for v in self.vectors for w in v.values()), dtype=np.float32),
+                np.cumsum([0] + [len(v) for v in self.vectors[:-1]]),
+            )
+        indices, weights, offsets = self._packed
+        # One gather-multiply-sum over every stored vector: sparse dot products without a dense matrix
+        return np.add.reduceat(dense[indices] * weights, offsets).tolist()
+
+
+class SemanticCache:
+    """Nearest-neighbour lookup of cached evaluations by answer similarity"""
+
+    def __init__(self, threshold: float = SEMANTIC_THRESHOLD, max_edits: int = SEMANTIC_MAX_EDITS,
+                 max_entries: int = SEMANTIC_CACHE_SIZE, ttl: float = 86400.0,
+                 enabled: bool = SEMANTIC_CACHE_ENABLED):
+        self.threshold = threshold
+        self.max_edits = max_edits
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled and max_entries > 0
+        # scope -> word count -> bucket: answers more than max_edits words longer
+        # or shorter can never match, so they are not even compared
+        self._scopes: Dict[str, Dict[int, _Bucket]] = {}
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()  # by cache key, oldest first
+        self.hits = 0
+        self.misses = 0
+        self.rejections = 0  # similar enough to retrieve, but not the same answer
+
+    @classmethod
+    def from_env(cls) -> "SemanticCache":
+        return cls(ttl=float(os.getenv("EVAL_CACHE_TTL", "86400")))
+
+    def lookup(self, question: str, answer: str, job_description: Optional[str], model: str,
+               prompt_version: str) -> Optional[SemanticHit]:
+        if not self.enabled:
+            return None
+        scope = self._scopes.get(scope_key(question, job_description, model, prompt_version))
+        if scope is None:
+            self.misses += 1
+            return None
+        tokens = words(answer)
+        vector = embed(tokens)
+        dense = None
+        if np is not None:
+            dense = np.zeros(SEMANTIC_DIMENSIONS, dtype=np.float32)
+            dense[list(vector)] = list(vector.values())
+        candidates = []
+        for length in range(len(tokens) - self.max_edits, len(tokens) + self.max_edits + 1):
+            bucket = scope.get(length)
+            if bucket is not None:
+                candidates += zip(bucket.similarities(vector, dense), bucket.keys)
+        signature = guard_signature(answer, tokens)
+        now = time.time()
+        hit = None
+        expired = []
+        for similarity, key in sorted(candidates, reverse=True):
+            if similarity < self.threshold:
+                break
+            entry = self._entries[key]
+            if entry.expires_at < now:
+                expired.append(key)
+                continue
+            if entry.signature != signature or word_edits(entry.words, tokens) > self.max_edits:
+                self.rejections += 1
+                continue
+            self._entries.move_to_end(key)
+            hit = SemanticHit(entry.value, key, similarity)
+            break
+        for key in expired:
+            self.delete(key)
+        if hit is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return hit
+
+    def add(self, cache_key: str, question: str, answer: str, job_description: Optional[str], model: str,
+            prompt_version: str, value: Dict[str, Any]):
+        if not self.enabled or cache_key in self._entries:
+            return
+        scope_id = scope_key(question, job_description, model, prompt_version)
+        tokens = words(answer)
+        if not tokens:
+            return
+        scope = self._scopes.setdefault(scope_id, {})
+        scope.setdefault(len(tokens), _Bucket()).add(cache_key, embed(tokens))
+        self._entries[cache_key] = _Entry(scope_id, time.time() + self.ttl, tokens,
+                                          guard_signature(answer, tokens), value)
+        while len(self._entries) > self.max_entries:
+            self.delete(next(iter(self._entries)))
+
+    def delete(self, cache_key: str) -> bool:
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return False
+        scope = self._scopes[entry.scope]
+        bucket = scope[len(entry.words)]
+        bucket.remove(cache_key)
+        if not bucket.keys:
+            del scope[len(entry.words)]
+        if not scope:
+            del self._scopes[entry.scope]
+        return True
+
+    def clear(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        self._scopes.clear()
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejections": self.rejections,
+            "entries": len(self._entries),
+            "scopes": len(self._scopes),
+            "threshold": self.threshold,
+            "max_edits": self.max_edits,
+            "backend": "numpy" if np is not None else "python",
+        }
@@ -0,0 +1,98 @@
+"""
+Production entry point: multi-worker uvicorn with graceful shutdown.
+
+    python -m app.server --workers 4 --port 8000
+
+- WORKERS (or WEB_CONCURRENCY) defaults to the CPUs actually available to
+  the container (cgroup quota / CPU affinity), not the host's core count.
+- Uses uvloop and httptools when installed, asyncio/h11 otherwise.
+- On SIGTERM every worker stops accepting connections, lets in-flight
+  requests (including running LLM calls and streams) finish for up to
+  GRACEFUL_TIMEOUT seconds, then runs the app's shutdown (closing the
+  pooled provider clients).
+- Each worker runs the app lifespan, so provider clients/SDKs are
+  prewarmed per process before it serves traffic.
+- With more than one worker, per-worker stats are written to
+  WORKER_STATS_DIR and merged by GET /stats/workers.
+"""
+import argparse
+import glob
+import importlib.util
+import math
+import os
+import tempfile
+
+import uvicorn
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS/Windows
+        cpus = os.cpu_count() or 1
+    # cgroup v2 quota, e.g. "25000 100000" for 0.25 vCPU or "max 100000"
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def default_workers() -> int:
+    value = os.getenv("WORKERS") or os.getenv("WEB_CONCURRENCY")
+    return int(value) if value else available_cpus()
+
+
+def event_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def prepare_stats_dir(workers: int):
+    """Give the workers a shared, clean directory for their stats snapshots"""
+    if workers <= 1:
+        return
+    directory = os.environ.get("WORKER_STATS_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for stale in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(stale)
+    else:
+        os.environ["WORKER_STATS_DIR"] = tempfile.mkdtemp(prefix="interview-agent-stats-")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Interview Agent API with multiple workers")
+    parser.add_argument("--app", default=os.getenv("APP_MODULE", "app.main:app"))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")))
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args()
+
+    prepare_stats_dir(args.workers)
+    print(f"Starting {args.app} on {args.host}:{args.port} with {args.workers} worker(s), "
+          f"loop={event_loop()}, http={http_protocol()}", flush=True)
+    uvicorn.run(
+        args.app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=event_loop(),
+        http=http_protocol(),
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
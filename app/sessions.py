@@ -0,0 +1,216 @@
+"""
+Interview sessions: the job and settings of an interview, held server-side.
+
+An interview is a sequence of evaluations against one job description and
+one set of settings. POST /sessions takes them once; each
+POST /sessions/{id}/answers then sends only the question and the answer.
+The session holds what every one of those evaluations shares:
+
+- the job description, compacted (app.tokens) once instead of on every
+  answer;
+- the provider side of it, prepared at creation (Engine.prepare): the
+  pooled client for the session's key is opened and, for long Gemini
+  prefixes, the cachedContents handle is created before the first answer
+  instead of during it;
+- a running summary (RunningSummary), updated as each evaluation arrives:
+  score and criterion averages, recurring strengths and weaknesses, and
+  the per-question scores. GET /sessions/{id} returns it without re-scoring
+  anything.
+
+Sessions live in the worker's memory, so a multi-worker deployment needs
+sticky routing by session id. Memory stays bounded: at most SESSION_MAX
+sessions (least recently used evicted first), idle ones dropped after
+SESSION_IDLE_TTL seconds, at most SESSION_MAX_ANSWERS answers per session,
+and the summary keeps a bounded number of distinct points.
+"""
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.ensemble import CRITERIA, point_words, same_point
+from app.schemas import (EvaluationRequest, EvaluationResponse, SessionAnswer, SessionAnswerScore, SessionInfo,
+                         SessionRequest, SessionSummary)
+from app.tokens import COMPACT_MIN_TOKENS, COMPACTION_ENABLED, compact_job_description, estimate_tokens
+
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_MAX_ANSWERS = int(os.getenv("SESSION_MAX_ANSWERS", "100"))
+# Distinct strengths / weaknesses tracked per session; the rarest go first
+SESSION_MAX_POINTS = int(os.getenv("SESSION_MAX_POINTS", "50"))
+SESSION_TOP_POINTS = 5
+SESSION_QUESTION_CHARS = 200
+
+
+class PointCounter:
+    """How many answers each distinct point was made about, near-duplicates merged"""
+
+    def __init__(self, max_points: int = SESSION_MAX_POINTS):
+        self.max_points = max_points
+        self._points: List[List[Any]] = []  # [text, its words, answers]
+
+    def add(self, entries: List[str]):
+        counted = set()
+        for entry in entries:
+            words = point_words(entry)
+            for i, point in enumerate(self._points):
+                if same_point(words, point[1]):
+                    if i not in counted:
+                        point[2] += 1
+                        counted.add(i)
+                    break
+            else:
+                counted.add(len(self._points))
+                self._points.append([entry, words, 1])
+        if len(self._points) > self.max_points:
+            # Stable sort: among equally rare points the oldest are dropped
+            self._points.sort(key=lambda point: -point[2])
+            del self._points[self.max_points:]
+
+    def recurring(self, limit: int = SESSION_TOP_POINTS) -> List[str]:
+        points = sorted((point for point in self._points if point[2] > 1), key=lambda point: -point[2])
+        return [point[0] for point in points[:limit]]
+
+
+class RunningSummary:
+    """Session summary updated per evaluation in O(1) (plus the bounded point lists)"""
+
+    def __init__(self):
+        self.answers = 0
+        self.failed = 0
+        self.score_sum = 0
+        self.score_squares = 0
+        self.min_score: Optional[int] = None
+        self.max_score: Optional[int] = None
+        self.criteria_sums = {name: 0 for name in CRITERIA}
+        self.criteria_counts = {name: 0 for name in CRITERIA}
+        self.strengths = PointCounter()
+        self.weaknesses = PointCounter()
+        self.scores: List[SessionAnswerScore] = []
+
+    def add(self, index: int, question: str, evaluation: EvaluationResponse):
+        score = evaluation.score
+        self.answers += 1
+        self.score_sum += score
+        self.score_squares += score * score
+        self.min_score = score if self.min_score is None else min(self.min_score, score)
+        self.max_score = score if self.max_score is None else max(self.max_score, score)
+        for name in CRITERIA:
+            value = getattr(evaluation.criteria_breakdown, name)
+            if value is not None:
+                self.criteria_sums[name] += value
+                self.criteria_counts[name] += 1
+        self.strengths.add(evaluation.strengths)
+        self.weaknesses.add(evaluation.weaknesses)
+        self.scores.append(SessionAnswerScore(index=index, question=question[:SESSION_QUESTION_CHARS], score=score))
+
+    def summary(self) -> SessionSummary:
+        average = self.score_sum / self.answers if self.answers else None
+        stdev = math.sqrt(max(0.0, self.score_squares / self.answers - average * average)) if self.answers else 0.0
+        return SessionSummary(
+            answers=self.answers,
+            failed=self.failed,
+            average_score=round(average, 2) if average is not None else None,
+            min_score=self.min_score,
+            max_score=self.max_score,
+            score_stdev=round(stdev, 2),
+            criteria_averages={name: round(self.criteria_sums[name] / count, 2)
+                               for name, count in self.criteria_counts.items() if count},
+            recurring_strengths=self.strengths.recurring(),
+            recurring_weaknesses=self.weaknesses.recurring(),
+            scores=sorted(self.scores, key=lambda entry: entry.index),
+        )
+
+
+class Session:
+    def __init__(self, session_id: str, settings: SessionRequest, model: str, max_answers: int):
+        self.id = session_id
+        self.settings = settings
+        self.model = model
+        self.max_answers = max_answers
+        self.job_description = settings.job_description
+        if self.job_description and COMPACTION_ENABLED and estimate_tokens(self.job_description) > COMPACT_MIN_TOKENS:
+            # Once per session instead of on every answer
+            self.job_description, _ = compact_job_description(self.job_description)
+        self.created_at = self.last_used_at = time.time()
+        self.next_index = 0
+        self.running = RunningSummary()
+
+    def reserve(self) -> Optional[int]:
+        """Index for the next answer, or None once the session is full"""
+        if self.next_index >= self.max_answers:
+            return None
+        self.next_index += 1
+        return self.next_index - 1
+
+    def request_for(self, answer: SessionAnswer) -> EvaluationRequest:
+        return EvaluationRequest(
+            question=answer.question,
+            answer=answer.answer,
+            job_description=self.job_description,
+            model=self.settings.model,  # None lets the engine pick (default or PRESCORE_MODEL)
+            api_key=self.settings.api_key,
+            routing=self.settings.routing,
+            samples=self.settings.samples,
+        )
+
+    def info(self, idle_ttl: float) -> SessionInfo:
+        return SessionInfo(id=self.id, model=self.model, created_at=self.created_at,
+                           last_used_at=self.last_used_at, expires_at=self.last_used_at + idle_ttl,
+                           summary=self.running.summary())
+
+
+class SessionStore:
+    """In-memory sessions in LRU order; idle and surplus sessions are dropped on access"""
+
+    def __init__(self, max_sessions: int = SESSION_MAX, idle_ttl: float = SESSION_IDLE_TTL,
+                 max_answers: int = SESSION_MAX_ANSWERS):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_answers = max_answers
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def create(self, settings: SessionRequest, model: str) -> Session:
+        session = Session(uuid.uuid4().hex, settings, model, self.max_answers)
+        self._sessions[session.id] = session
+        self.created += 1
+        self._evict()
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        self._evict()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_used_at = time.time()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def _evict(self):
+        now = time.time()
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used_at >= self.idle_ttl:
+                self.expired += 1
+            elif len(self._sessions) > self.max_sessions:
+                self.evicted += 1
+            else:
+                break
+            del self._sessions[session.id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._sessions),
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "max_sessions": self.max_sessions,
+            "idle_ttl_seconds": self.idle_ttl,
+        }
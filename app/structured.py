@@ -0,0 +1,267 @@
+"""
+Structured (JSON) output: provider-native JSON modes and a tolerant parser.
+
+Providers are asked for JSON natively where they support it: Gemini
+through responseMimeType/responseSchema, Claude through a forced tool call
+whose input is the evaluation. STRUCTURED_OUTPUT=prompt falls back to
+asking for JSON in the prompt only.
+
+Clean output, exactly one JSON object, is validated straight from the text
+by validate_json(). Anything else goes through extract_json(). The common
+case there, an object with a code fence, prose or commentary around it, is
+decoded by a single json raw_decode() call from the first "{". Only if that
+fails is the text repaired: trailing commas, raw newlines inside strings, and output cut off
+at max_tokens (unterminated string, unclosed arrays/objects, dangling key).
+"""
+import json
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type, TypeVar, Union
+
+from pydantic import BaseModel, ValidationError
+
+NATIVE_JSON = os.getenv("STRUCTURED_OUTPUT", "native").lower() != "prompt"
+
+# JSON Schema of EvaluationResponse, in the subset every provider accepts
+# (no $ref, no type unions, no additionalProperties)
+EVALUATION_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer"},
+        "criteria_breakdown": {
+            "type": "object",
+            "properties": {
+                "relevance": {"type": "integer"},
+                "clarity": {"type": "integer"},
+                "depth": {"type": "integer"},
+                "impact": {"type": "integer"},
+                "job_alignment": {"type": "integer"},
+            },
+            "required": ["relevance", "clarity", "depth", "impact"],
+        },
+        "summary": {"type": "string"},
+        "strengths": {"type": "array", "items": {"type": "string"}},
+        "weaknesses": {"type": "array", "items": {"type": "string"}},
+        "improvement_suggestions": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["score", "criteria_breakdown", "summary", "strengths", "weaknesses", "improvement_suggestions"],
+}
+
+CLAUDE_TOOL_NAME = "record_evaluation"
+
+# Missing list fields (e.g. cut off by max_tokens) are treated as empty
+LIST_FIELDS = ("strengths", "weaknesses", "improvement_suggestions")
+
+Model = TypeVar("Model", bound=BaseModel)
+
+
+class StructuredOutputError(ValueError):
+    """The completion contains no usable JSON object"""
+
+
+class ExtractedJSON(NamedTuple):
+    value: Any
+    repairs: Tuple[str, ...]  # defects fixed to get there, empty for clean output
+
+
+def gemini_schema(schema: Dict[str, Any] = EVALUATION_SCHEMA) -> Dict[str, Any]:
+    """The schema in Gemini's responseSchema dialect (upper-case type names)"""
+    converted = {}
+    for key, value in schema.items():
+        if key == "type":
+            converted[key] = value.upper()
+        elif key == "properties":
+            converted[key] = {name: gemini_schema(prop) for name, prop in value.items()}
+        elif key == "items":
+            converted[key] = gemini_schema(value)
+        else:
+            converted[key] = value
+    return converted
+
+
+def gemini_generation_config() -> Dict[str, Any]:
+    if not NATIVE_JSON:
+        return {}
+    return {"responseMimeType": "application/json", "responseSchema": gemini_schema()}
+
+
+def claude_tool_options() -> Dict[str, Any]:
+    """Messages API fields forcing the evaluation to come back as tool input"""
+    if not NATIVE_JSON:
+        return {}
+    return {
+        "tools": [{
+            "name": CLAUDE_TOOL_NAME,
+            "description": "Record the evaluation of the candidate's answer.",
+            "input_schema": EVALUATION_SCHEMA,
+        }],
+        "tool_choice": {"type": "tool", "name": CLAUDE_TOOL_NAME},
+    }
+
+
+def litellm_response_format() -> Dict[str, Any]:
+    """litellm maps this to Gemini's JSON mode and to a forced tool call for Claude"""
+    if not NATIVE_JSON:
+        return {}
+    return {"response_format": {
+        "type": "json_schema",
+        "json_schema": {"name": "evaluation", "schema": EVALUATION_SCHEMA},
+    }}
+
+
+_decoder = json.JSONDecoder()
+_OBJECT_START = re.compile(r'\{\s*"')
+_ARRAY_START = re.compile(r'\[\s*\{')
+_CLOSERS = {"{": "}", "[": "]"}
+_ESCAPED_CONTROL = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def extract_json(text: str) -> ExtractedJSON:
+    """The outermost JSON object in a completion, repaired if necessary"""
+    # The first brace that opens an object with a key; prose rarely has one
+    match = _OBJECT_START.search(text)
+    start = match.start() if match else text.find("{")
+    if start < 0:
+        raise StructuredOutputError("no JSON object in the output")
+    try:
+        value, _ = _decoder.raw_decode(text, start)
+    except ValueError:
+        return _repair(text, start)
+    if not isinstance(value, dict):
+        raise StructuredOutputError("expected a JSON object")
+    return ExtractedJSON(value, ())
+
+
+def extract_json_array(text: str) -> ExtractedJSON:
+    """The outermost JSON array of objects in a completion (packed replies), repaired if necessary"""
+    match = _ARRAY_START.search(text)
+    start = match.start() if match else text.find("[")
+    if start < 0:
+        raise StructuredOutputError("no JSON array in the output")
+    try:
+        value, _ = _decoder.raw_decode(text, start)
+    except ValueError:
+        return _repair(text, start, list)
+    if not isinstance(value, list):
+        raise StructuredOutputError("expected a JSON array")
+    return ExtractedJSON(value, ())
+
+
+def _repair(text: str, start: int, expected: type = dict) -> ExtractedJSON:
+    out: List[str] = []
+    stack: List[str] = []
+    repairs: List[str] = []
+    # Last point where everything emitted so far is complete: (length, open containers)
+    safe = (0, ())
+    in_string = escape = False
+
+    for c in text[start:]:
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+            elif c in _ESCAPED_CONTROL:
+                c = _ESCAPED_CONTROL[c]
+                if "control_char" not in repairs:
+                    repairs.append("control_char")
+            out.append(c)
+            continue
+        if c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append(c)
+            out.append(c)
+            safe = (len(out), tuple(stack))
+            continue
+        elif c in "}]":
+            if not stack or _CLOSERS[stack[-1]] != c:
+                break  # unbalanced: keep what was complete
+            _drop_trailing_comma(out, repairs)
+            stack.pop()
+            out.append(c)
+            if not stack:
+                break
+            safe = (len(out), tuple(stack))
+            continue
+        elif c == ",":
+            safe = (len(out), tuple(stack))
+        out.append(c)
+
+    if not stack:
+        return _loads("".join(out), repairs, expected)
+
+    # Cut off mid-output: close what is open, or else back up to the last complete value
+    repairs.append("truncated")
+    tail = out[:-1] if escape else out[:]
+    last = "".join(tail).rstrip()[-1:]
+    candidates = []
+    # A bare number/literal at the very end may be incomplete ("2" of "25"): drop it
+    if in_string or not (last.isalnum() or last in "-+."):
+        if in_string:
+            tail.append('"')
+        _drop_trailing_comma(tail, [])
+        candidates.append("".join(tail) + _closing(stack))
+    length, open_at_safe = safe
+    if length:
+        head = out[:length]
+        _drop_trailing_comma(head, [])
+        candidates.append("".join(head) + _closing(open_at_safe))
+    error = StructuredOutputError("output ends before the first complete value")
+    for candidate in candidates:
+        try:
+            return _loads(candidate, repairs, expected)
+        except StructuredOutputError as e:
+            error = e
+    raise error
+
+
+def _drop_trailing_comma(out: List[str], repairs: List[str]):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+        if "trailing_comma" not in repairs:
+            repairs.append("trailing_comma")
+
+
+def _closing(stack: Sequence[str]) -> str:
+    return "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+def _loads(candidate: str, repairs: List[str], expected: type = dict) -> ExtractedJSON:
+    try:
+        value = json.loads(candidate)
+    except ValueError as e:
+        raise StructuredOutputError(str(e))
+    if not isinstance(value, expected):
+        raise StructuredOutputError("expected a JSON " + ("object" if expected is dict else "array"))
+    return ExtractedJSON(value, tuple(repairs))
+
+
+def validate_json(text: Union[str, bytes], model: Type[Model]) -> Optional[Model]:
+    """`model` validated straight from clean JSON text in one pass, or None
+
+    Native JSON modes usually return exactly the object, so pydantic-core
+    parses and validates it without building an intermediate dict. Anything
+    else (fences, prose, defects, missing list fields) returns None and goes
+    through extract_json() and to_model().
+    """
+    if text.lstrip()[:1] not in ("{", b"{"):
+        return None
+    try:
+        return model.model_validate_json(text)
+    except ValidationError:
+        return None
+
+
+def to_model(value: Any, model: Type[Model]) -> Model:
+    """Validate an extracted object (or a provider's tool input) into `model`"""
+    if not isinstance(value, dict):
+        raise StructuredOutputError("expected a JSON object")
+    missing = [field for field in LIST_FIELDS if field not in value and field in model.model_fields]
+    if missing:
+        value = dict(value, **{field: [] for field in missing})
+    return model.model_validate(value)
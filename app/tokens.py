@@ -0,0 +1,227 @@
+"""
+Token estimation, prompt compaction and output token budgets.
+
+estimate_tokens() is a local approximation of BPE token counts (cl100k /
+Gemini style): no tokenizer download, one regex pass in C. Short English
+words are one token, long words and digit runs are split, and punctuation
+and non-Latin characters count individually. It is meant for budgeting,
+not billing; benchmarks/bench_compaction.py measures its error against
+cl100k when tiktoken is installed.
+
+compact() runs before the LLM call and only touches oversized inputs:
+- Job descriptions over COMPACT_MIN_TOKENS lose repeated lines and
+  boilerplate (equal-opportunity statements, benefits, how to apply).
+  Above JOB_DESCRIPTION_MAX_TOKENS, the sentences stating requirements
+  are kept.
+- Answers over ANSWER_MAX_TOKENS keep the sentences that best address the
+  question and carry evidence (numbers, outcomes). Each gap is marked
+  with "[...]".
+
+OutputTokenBudget sets max_tokens from the completion sizes recently
+observed per model instead of a fixed 1024. That also shrinks what the
+rate-limit scheduler reserves per call.
+"""
+import math
+import os
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+COMPACTION_ENABLED = os.getenv("COMPACTION", "1").lower() not in ("0", "false", "no")
+COMPACT_MIN_TOKENS = int(os.getenv("COMPACT_MIN_TOKENS", "200"))
+ANSWER_MAX_TOKENS = int(os.getenv("ANSWER_MAX_TOKENS", "1200"))
+JOB_DESCRIPTION_MAX_TOKENS = int(os.getenv("JOB_DESCRIPTION_MAX_TOKENS", "600"))
+
+OUTPUT_TOKENS_MIN = int(os.getenv("OUTPUT_TOKENS_MIN", "512"))
+OUTPUT_TOKENS_MAX = int(os.getenv("OUTPUT_TOKENS_MAX", "1024"))
+OUTPUT_TOKENS_HEADROOM = float(os.getenv("OUTPUT_TOKENS_HEADROOM", "1.25"))
+OUTPUT_TOKENS_MIN_SAMPLES = 20
+
+GAP = "[...]"
+
+# Latin words split every 8 letters, digit runs every 3; every other non-space
+# character (punctuation, CJK, accented letters) is a token of its own
+_PIECES = re.compile(r"[A-Za-z]{1,8}|\d{1,3}|\S")
+_WORDS = re.compile(r"[a-z0-9][a-z0-9+#.-]*[a-z0-9+#]|[a-z0-9]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])|\n+")
+_EVIDENCE = re.compile(r"\d|%|\$")
+
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can could did do does for from had has have how i if in into is it its "
+    "me my of on or our so that the their them they this to was we were what when where which who why will "
+    "with would you your about also just more most very than then there these those".split())
+
+# Outcome words that make a sentence worth keeping in an interview answer
+ACTION_WORDS = frozenset(
+    "led built designed implemented delivered reduced increased improved launched managed migrated "
+    "achieved saved created owned mentored resolved automated scaled shipped grew cut".split())
+
+# Job description cues for requirements worth keeping
+REQUIREMENT_WORDS = frozenset(
+    "required requirements must experience skills proficient proficiency knowledge years responsibilities "
+    "responsible qualifications preferred degree familiarity expertise ability".split())
+
+BOILERPLATE = re.compile("|".join([
+    r"equal (employment )?opportunit",
+    r"without regard to",
+    r"reasonable accommodation",
+    r"(race|religion|gender identity|sexual orientation|national origin|veteran status|disability)\b.*,",
+    r"\bbenefits?\b.*\b(include|package|offer)",
+    r"\b(401\(?k\)?|health insurance|dental|paid time off|pto|parental leave|stock options)\b",
+    r"\bhow to apply\b|\bapply (now|today|here)\b|\bclick apply\b|\bsubmit your (resume|cv|application)\b",
+    r"\bprivacy (notice|policy)\b|\bapplicant privacy\b",
+    r"\be-?verify\b|\bbackground check\b",
+    r"#li-|\brecruitment agencies\b|\bunsolicited resumes\b",
+]), re.IGNORECASE)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    return len(_PIECES.findall(text)) if text else 0
+
+
+class Compacted(NamedTuple):
+    answer: str
+    job_description: Optional[str]
+    tokens_before: int
+    tokens_after: int
+    steps: Tuple[str, ...]  # what was applied, e.g. ("jd_dedupe", "answer_extract")
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def _terms(text: str) -> Set[str]:
+    return {word for word in _WORDS.findall(text.lower()) if word not in STOPWORDS}
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def select_sentences(sentences: List[str], query: Set[str], budget: int, cues: frozenset = ACTION_WORDS) -> str:
+    """Extractive summary: the highest-value sentences that fit `budget`, in original order"""
+    costs = [estimate_tokens(sentence) for sentence in sentences]
+    if sum(costs) <= budget:
+        return " ".join(sentences)
+    terms = [_terms(sentence) for sentence in sentences]
+    # Terms found in many sentences carry less signal (inverse sentence frequency)
+    frequency: Dict[str, int] = {}
+    for sentence_terms in terms:
+        for term in sentence_terms:
+            frequency[term] = frequency.get(term, 0) + 1
+    total = len(sentences)
+
+    def score(i: int) -> float:
+        overlap = sum(math.log(1 + total / frequency[t]) for t in terms[i] & query)
+        value = overlap / math.sqrt(1 + len(terms[i]))
+        if _EVIDENCE.search(sentences[i]):
+            value += 1.0
+        value += 0.5 * len(terms[i] & cues)
+        if i == 0:
+            value += 1.0  # the opening usually frames the answer
+        elif i == total - 1:
+            value += 0.3
+        return value
+
+    chosen: List[int] = []
+    used = 0
+    for i in sorted(range(total), key=score, reverse=True):
+        if used + costs[i] > budget:
+            continue
+        # Skip near-duplicates of sentences already kept
+        if any(terms[i] and len(terms[i] & terms[j]) / len(terms[i] | terms[j]) > 0.8 for j in chosen):
+            continue
+        chosen.append(i)
+        used += costs[i]
+    chosen.sort()
+    parts: List[str] = []
+    previous = -1
+    for i in chosen:
+        if i != previous + 1:
+            parts.append(GAP)
+        parts.append(sentences[i])
+        previous = i
+    if previous != total - 1:
+        parts.append(GAP)
+    return " ".join(parts)
+
+
+@lru_cache(maxsize=256)
+def compact_job_description(job_description: str) -> Tuple[str, Tuple[str, ...]]:
+    """Job description without repeats and boilerplate, then trimmed to its requirements
+
+    Depends on the job description alone, so every question about the same
+    job gets the same text and the provider's prompt cache keeps working.
+    """
+    kept: List[str] = []
+    seen: Set[str] = set()
+    steps: List[str] = []
+    for line in job_description.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        key = " ".join(re.sub(r"^[\W_]+", "", line.lower()).split())
+        if key in seen:
+            if "jd_dedupe" not in steps:
+                steps.append("jd_dedupe")
+            continue
+        seen.add(key)
+        if BOILERPLATE.search(line):
+            if "jd_boilerplate" not in steps:
+                steps.append("jd_boilerplate")
+            continue
+        kept.append(line)
+    text = "\n".join(kept)
+    if estimate_tokens(text) > JOB_DESCRIPTION_MAX_TOKENS:
+        sentences = [sentence for line in kept for sentence in split_sentences(line)]
+        text = select_sentences(sentences, set(), JOB_DESCRIPTION_MAX_TOKENS, REQUIREMENT_WORDS)
+        steps.append("jd_extract")
+    return text, tuple(steps)
+
+
+def compact(question: str, answer: str, job_description: Optional[str]) -> Compacted:
+    """Shrink an oversized answer / job description before it is sent to the LLM"""
+    answer_tokens = estimate_tokens(answer)
+    jd_tokens = estimate_tokens(job_description)
+    before = answer_tokens + jd_tokens
+    if not COMPACTION_ENABLED or (answer_tokens <= ANSWER_MAX_TOKENS and jd_tokens <= COMPACT_MIN_TOKENS):
+        return Compacted(answer, job_description, before, before, ())
+
+    steps: Tuple[str, ...] = ()
+    if job_description and jd_tokens > COMPACT_MIN_TOKENS:
+        job_description, steps = compact_job_description(job_description)
+    if answer_tokens > ANSWER_MAX_TOKENS:
+        answer = select_sentences(split_sentences(answer), _terms(question), ANSWER_MAX_TOKENS)
+        steps += ("answer_extract",)
+    after = estimate_tokens(answer) + estimate_tokens(job_description)
+    return Compacted(answer, job_description, before, after, steps)
+
+
+class OutputTokenBudget:
+    """max_tokens per model from recent completion sizes: p99 * headroom, clamped"""
+
+    def __init__(self, minimum: int = OUTPUT_TOKENS_MIN, maximum: int = OUTPUT_TOKENS_MAX,
+                 headroom: float = OUTPUT_TOKENS_HEADROOM, window: int = 200):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.headroom = headroom
+        self.window = window
+        self._samples: Dict[str, Deque[int]] = {}
+
+    def observe(self, model: str, output_tokens: int):
+        if output_tokens > 0:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(output_tokens)
+
+    def max_tokens(self, model: str) -> int:
+        samples = self._samples.get(model)
+        if not samples or len(samples) < OUTPUT_TOKENS_MIN_SAMPLES:
+            return self.maximum  # not enough data yet: stay safe
+        ordered = sorted(samples)
+        p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+        # A completion that hit the limit pushes the budget back up to the maximum
+        return max(self.minimum, min(self.maximum, int(p99 * self.headroom)))
+
+    def stats(self) -> Dict[str, int]:
+        return {model: self.max_tokens(model) for model in self._samples}
@@ -0,0 +1,171 @@
+"""
+Shared HTTP transport for the raw provider calls.
+
+Keeps one long-lived httpx.AsyncClient per (provider, API key) so every
+evaluation reuses pooled (and, when h2 is installed, HTTP/2) connections
+instead of paying a new TCP+TLS handshake. Each client carries its key as a
+default auth header, so a request can only ever be sent with the
+credentials of the client it was issued on. Clients live in module globals,
+so they also survive between warm Lambda invocations; the least recently
+used ones are retired once HTTP_MAX_KEY_CLIENTS is exceeded or they have
+been idle for HTTP_CLIENT_IDLE_TTL seconds.
+"""
+import asyncio
+import hashlib
+import importlib.util
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+PROVIDER_BASE_URLS = {
+    "gemini": os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com"),
+    "anthropic": os.getenv("ANTHROPIC_API_BASE", "https://api.anthropic.com"),
+}
+PROVIDER_KEY_ENV = {"gemini": "GEMINI_API_KEY", "anthropic": "ANTHROPIC_API_KEY"}
+ANTHROPIC_VERSION = "2023-06-01"
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _http2_enabled() -> bool:
+    # HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")
+    if os.getenv("HTTP2", "1").lower() in ("0", "false", "no"):
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=_env_int("HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=_env_int("HTTP_MAX_KEEPALIVE", 20),
+        keepalive_expiry=_env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+
+def build_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=_env_float("HTTP_CONNECT_TIMEOUT", 5.0),
+        read=_env_float("HTTP_READ_TIMEOUT", 60.0),
+        write=_env_float("HTTP_WRITE_TIMEOUT", 10.0),
+        pool=_env_float("HTTP_POOL_TIMEOUT", 5.0),
+    )
+
+
+MAX_KEY_CLIENTS = _env_int("HTTP_MAX_KEY_CLIENTS", 64)
+CLIENT_IDLE_TTL = _env_float("HTTP_CLIENT_IDLE_TTL", 300.0)
+
+ClientKey = Tuple[str, str]  # (provider, key fingerprint)
+_clients: "OrderedDict[ClientKey, httpx.AsyncClient]" = OrderedDict()
+_client_loops: Dict[ClientKey, Optional[asyncio.AbstractEventLoop]] = {}
+_last_used: Dict[ClientKey, float] = {}
+_evicted = 0
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def auth_headers(provider: str, api_key: Optional[str]) -> Dict[str, str]:
+    if provider == "anthropic":
+        headers = {"anthropic-version": ANTHROPIC_VERSION}
+        if api_key:
+            headers["x-api-key"] = api_key
+        return headers
+    return {"x-goog-api-key": api_key} if api_key else {}
+
+
+def _build_client(provider: str, api_key: Optional[str]) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=PROVIDER_BASE_URLS[provider],
+        headers=auth_headers(provider, api_key),
+        http2=_http2_enabled(),
+        limits=build_limits(),
+        timeout=build_timeout(),
+    )
+
+
+def get_client(provider: str, api_key: Optional[str] = None) -> httpx.AsyncClient:
+    """Return the pooled client for (provider, api_key), creating it on first use"""
+    key = (provider, key_fingerprint(api_key))
+    loop = _running_loop()
+    client = _clients.get(key)
+    # Pooled connections are bound to the loop that opened them; rebuild the
+    # client if the runtime handed us a new loop (e.g. asyncio.run per call).
+    if client is None or client.is_closed or _client_loops.get(key) not in (None, loop):
+        client = _build_client(provider, api_key)
+        _clients[key] = client
+        _client_loops[key] = loop
+    elif _client_loops.get(key) is None:
+        _client_loops[key] = loop
+    _clients.move_to_end(key)
+    _last_used[key] = time.monotonic()
+    _evict_idle(loop)
+    return client
+
+
+def _evict_idle(loop: Optional[asyncio.AbstractEventLoop]):
+    global _evicted
+    now = time.monotonic()
+    while len(_clients) > 1:
+        key = next(iter(_clients))
+        if len(_clients) <= MAX_KEY_CLIENTS and now - _last_used[key] < CLIENT_IDLE_TTL:
+            break
+        client = _clients.pop(key)
+        del _last_used[key]
+        _client_loops.pop(key, None)
+        _evicted += 1
+        if loop is not None and not client.is_closed:
+            # A request issued just before eviction may still be using it;
+            # close only once any such request must have timed out
+            grace = (client.timeout.read or 60.0) + 5
+            loop.call_later(grace, lambda c=client: loop.create_task(c.aclose()))
+
+
+def prewarm():
+    """Create the clients for the configured keys (and their SSL contexts) ahead of the first request"""
+    for provider, env_name in PROVIDER_KEY_ENV.items():
+        get_client(provider, os.getenv(env_name))
+
+
+async def startup():
+    """Open a client for every provider (FastAPI lifespan startup)"""
+    prewarm()
+
+
+async def shutdown():
+    """Close all provider clients (FastAPI lifespan shutdown)"""
+    clients = list(_clients.values())
+    _clients.clear()
+    _client_loops.clear()
+    _last_used.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def stats() -> Dict[str, int]:
+    return {"clients": len(_clients), "evicted": _evicted}
+
+
+def key_fingerprint(api_key: Optional[str]) -> str:
+    """Short, non-reversible identifier for an API key ("default" when unset)"""
+    if not api_key:
+        return "default"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def provider_for_model(model: str) -> str:
+    return "anthropic" if "claude" in model.lower() else "gemini"
@@ -0,0 +1,72 @@
+"""
+Token usage accounting per model, including provider prompt-cache hits.
+
+Each helper normalizes one provider's usage block to:
+    {"input_tokens", "output_tokens", "cached_tokens", "cache_write_tokens"}
+"""
+from typing import Any, Dict
+
+from app.metrics import record_usage
+
+
+def _int(value: Any) -> int:
+    return int(value) if isinstance(value, (int, float)) else 0
+
+
+def usage_from_anthropic(data: Dict) -> Dict[str, int]:
+    usage = data.get("usage") or {}
+    cached = _int(usage.get("cache_read_input_tokens"))
+    written = _int(usage.get("cache_creation_input_tokens"))
+    return {
+        # Anthropic reports uncached input separately from cache reads/writes
+        "input_tokens": _int(usage.get("input_tokens")) + cached + written,
+        "output_tokens": _int(usage.get("output_tokens")),
+        "cached_tokens": cached,
+        "cache_write_tokens": written,
+    }
+
+
+def usage_from_gemini(data: Dict) -> Dict[str, int]:
+    usage = data.get("usageMetadata") or {}
+    return {
+        "input_tokens": _int(usage.get("promptTokenCount")),
+        "output_tokens": _int(usage.get("candidatesTokenCount")),
+        "cached_tokens": _int(usage.get("cachedContentTokenCount")),
+        "cache_write_tokens": 0,
+    }
+
+
+def usage_from_litellm(completion: Any) -> Dict[str, int]:
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cache_write_tokens": 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = _int(getattr(details, "cached_tokens", None)) or _int(getattr(usage, "cache_read_input_tokens", None))
+    return {
+        "input_tokens": _int(getattr(usage, "prompt_tokens", None)),
+        "output_tokens": _int(getattr(usage, "completion_tokens", None)),
+        "cached_tokens": cached,
+        "cache_write_tokens": _int(getattr(usage, "cache_creation_input_tokens", None)),
+    }
+
+
+class UsageStats:
+    FIELDS = ("input_tokens", "output_tokens", "cached_tokens", "cache_write_tokens")
+
+    def __init__(self):
+        self._models: Dict[str, Dict[str, int]] = {}
+
+    def record(self, model: str, usage: Dict[str, int]):
+        totals = self._models.setdefault(model, dict.fromkeys(("requests",) + self.FIELDS, 0))
+        totals["requests"] += 1
+        for field in self.FIELDS:
+            totals[field] += usage.get(field, 0)
+        record_usage(model, usage)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for model, totals in self._models.items():
+            entry: Dict[str, Any] = dict(totals)
+            entry["cached_ratio"] = round(totals["cached_tokens"] / totals["input_tokens"], 4) if totals["input_tokens"] else 0.0
+            report[model] = entry
+        return report
@@ -0,0 +1,152 @@
+"""
+Stats aggregation across server worker processes.
+
+Workers share nothing, so each one periodically writes its /stats snapshot
+to WORKER_STATS_DIR/<pid>.json (set by app.server when it starts more than
+one worker). Any worker can then answer for the whole server by merging the
+snapshots of the workers that are still alive: counters are summed, while
+latencies, ratios and limits take the largest value seen.
+
+Prometheus metrics are published the same way, to metrics-<pid>-<boot>.json,
+and summed by /metrics. Those files are kept when a worker exits, so the
+server's counters never go backwards while it runs; app.server clears the
+directory at startup.
+"""
+import asyncio
+import glob
+import json
+import os
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.metrics import Registry
+
+STATS_DIR = os.getenv("WORKER_STATS_DIR")
+STATS_INTERVAL = float(os.getenv("WORKER_STATS_INTERVAL", "5"))
+
+# Keys whose values do not add up across workers
+NON_ADDITIVE_SUFFIXES = ("_ms", "_s", "ratio", "scale", "max_entries", "ttl_seconds")
+# Tells this process's metrics file apart from an exited worker's that had the same pid
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def _path(directory: str, pid: int) -> str:
+    return os.path.join(directory, str(pid) + ".json")
+
+
+def write_snapshot(directory: str, snapshot: Dict[str, Any]):
+    path = _path(directory, os.getpid())
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def write_metrics(directory: str, registry: Registry):
+    path = os.path.join(directory, f"metrics-{os.getpid()}-{BOOT_ID}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def read_metrics(directory: str) -> List[Dict[str, list]]:
+    """Metrics snapshots of every worker this server has run, exited ones included"""
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def remove_snapshot(directory: str):
+    try:
+        os.remove(_path(directory, os.getpid()))
+    except FileNotFoundError:
+        pass
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshots(directory: str) -> Dict[int, Dict[str, Any]]:
+    snapshots = {}
+    for name in os.listdir(directory):
+        if not name.endswith(".json") or not name[:-5].isdigit():
+            continue
+        pid = int(name[:-5])
+        if not _alive(pid):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                snapshots[pid] = json.load(f)
+        except (OSError, ValueError):
+            continue  # being replaced right now
+    return snapshots
+
+
+def merge(values: List[Any], key: str = "") -> Any:
+    """Combine the same field from several workers' snapshots"""
+    present = [v for v in values if v is not None]
+    if not present:
+        return None
+    first = present[0]
+    if isinstance(first, bool):
+        return any(present)
+    if isinstance(first, (int, float)):
+        numbers = [v for v in present if isinstance(v, (int, float))]
+        return max(numbers) if key.endswith(NON_ADDITIVE_SUFFIXES) else sum(numbers)
+    if isinstance(first, dict):
+        keys = []
+        for value in present:
+            keys += [k for k in value if k not in keys]
+        return {k: merge([v.get(k) for v in present if isinstance(v, dict)], k) for k in keys}
+    return first
+
+
+async def publish(snapshot: Callable[[], Awaitable[Dict[str, Any]]], directory: str,
+                  interval: float = STATS_INTERVAL, registry: Optional[Registry] = None):
+    """Write this worker's snapshot (and metrics) every `interval` seconds until cancelled"""
+    try:
+        while True:
+            write_snapshot(directory, await snapshot())
+            if registry is not None:
+                write_metrics(directory, registry)
+            await asyncio.sleep(interval)
+    finally:
+        remove_snapshot(directory)
+        if registry is not None:
+            write_metrics(directory, registry)  # its final counts stay in the totals
+
+
+async def aggregate(snapshot: Callable[[], Awaitable[Dict[str, Any]]],
+                    directory: Optional[str] = STATS_DIR) -> Dict[str, Any]:
+    """Merged stats of every live worker (just this one when single-process)"""
+    current = await snapshot()
+    if not directory:
+        return {"workers": 1, "pids": [os.getpid()], "totals": current}
+    write_snapshot(directory, current)
+    snapshots = read_snapshots(directory)
+    return {
+        "workers": len(snapshots),
+        "pids": sorted(snapshots),
+        "totals": merge(list(snapshots.values())),
+    }
+
+
+def aggregate_metrics(registry: Registry, directory: Optional[str] = STATS_DIR) -> str:
+    """Prometheus text of the metrics summed over every worker (just this one when single-process)"""
+    if not directory:
+        return registry.render()
+    write_metrics(directory, registry)
+    return registry.merged(read_metrics(directory)).render()
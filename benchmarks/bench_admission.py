@@ -0,0 +1,148 @@
+"""
+Load test: a burst against a slow provider, with and without admission control.
+
+Starts the mock provider (--latency-ms per call) and then, once with
+ADMISSION=0 and once with ADMISSION=1, app.lambda_main under uvicorn
+pointed at it. For --duration seconds an open-loop client sends
+--bulk-rps bulk requests (X-Priority: bulk) and --interactive-rps
+interactive ones, each with a ~2 KB job description. Together they arrive
+faster than the provider can answer them.
+
+Per run it reports, per lane, the latency of successful requests
+(p50/p99), the 503 rejections and how fast they came back, and other
+errors. For the server it reports resident memory and open file
+descriptors (sockets), sampled every 0.5 s: at the start, at the peak and
+at the end of the burst. Without admission control every request is
+accepted and waits for the provider connection pool, so memory and sockets
+grow with the burst and interactive requests queue behind bulk ones. With
+it both stay flat and interactive latency stays near one provider call.
+
+Usage:
+    python -m benchmarks.bench_admission --duration 20 --latency-ms 4000 --bulk-rps 60 --interactive-rps 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import Counter
+
+import httpx
+
+from benchmarks import common
+from benchmarks.bench_workers import start, wait_healthy
+
+MOCK_PORT = 9180
+APP_PORT = 9181
+JD_LINE = "Own the ingestion service end to end: Kafka, Postgres, on-call and incident reviews.\n"
+
+
+def proc_usage(pid: int):
+    """(resident MB, open file descriptors) of a process, from /proc"""
+    with open(f"/proc/{pid}/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    return round(rss_kb / 1024, 1), len(os.listdir(f"/proc/{pid}/fd"))
+
+
+async def burst(url: str, pid: int, args):
+    results = {lane: {"ok": [], "rejected": [], "errors": Counter()} for lane in ("interactive", "bulk")}
+    samples = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=url, timeout=args.client_timeout, limits=limits) as client:
+        loop = asyncio.get_running_loop()
+
+        async def send(lane: str, n: int):
+            start = loop.time()
+            try:
+                response = await client.post("/evaluate", headers={"X-Priority": lane}, json={
+                    "question": f"Question {lane} {n}",
+                    "answer": "I owned the on-call rotation and halved the incident count.",
+                    "job_description": JD_LINE * 24 + str(n),
+                    "model": "gemini-2.5-flash",
+                })
+                elapsed = loop.time() - start
+                if response.status_code == 200:
+                    results[lane]["ok"].append(elapsed)
+                elif response.status_code == 503:
+                    results[lane]["rejected"].append(elapsed)
+                else:
+                    results[lane]["errors"][str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                results[lane]["errors"][type(e).__name__] += 1
+
+        async def arrivals(lane: str, rps: float):
+            tasks = []
+            for n in range(int(rps * args.duration)):
+                tasks.append(asyncio.ensure_future(send(lane, n)))
+                await asyncio.sleep(1 / rps)
+            await asyncio.gather(*tasks)
+
+        async def sample():
+            while True:
+                samples.append(proc_usage(pid))
+                await asyncio.sleep(0.5)
+
+        sampler = asyncio.ensure_future(sample())
+        await asyncio.gather(arrivals("bulk", args.bulk_rps), arrivals("interactive", args.interactive_rps))
+        sampler.cancel()
+
+    report = {}
+    for lane, result in results.items():
+        ok, rejected = result["ok"], result["rejected"]
+        report[lane] = {
+            "ok": len(ok),
+            "ok_p50_ms": round(common.percentile(ok, 50) * 1000),
+            "ok_p99_ms": round(common.percentile(ok, 99) * 1000),
+            "rejected_503": len(rejected),
+            "rejected_p99_ms": round(common.percentile(rejected, 99) * 1000),
+            "errors": dict(result["errors"]),
+        }
+    report["server"] = {
+        "rss_mb": {"start": samples[0][0], "peak": max(s[0] for s in samples), "end": samples[-1][0]},
+        "open_fds": {"start": samples[0][1], "peak": max(s[1] for s in samples), "end": samples[-1][1]},
+    }
+    return report
+
+
+def main(args):
+    mock = start(["benchmarks.mock_provider", "--port", str(MOCK_PORT), "--latency-ms", str(args.latency_ms)])
+    report = {}
+    try:
+        wait_healthy(f"http://127.0.0.1:{MOCK_PORT}")
+        for admission in ("0", "1"):
+            env = dict(os.environ, **{
+                "GEMINI_API_BASE": f"http://127.0.0.1:{MOCK_PORT}",
+                "GEMINI_API_KEY": "mock-gemini",
+                "EVAL_CACHE_SIZE": "0",
+                "JOBS_ENABLED": "0",
+                "ADMISSION": admission,
+                "ADMISSION_MAX_INFLIGHT": str(args.max_inflight),
+                "ADMISSION_MAX_QUEUE": str(args.max_queue),
+            })
+            server = start(["uvicorn", "app.lambda_main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+                           env=env)
+            try:
+                url = f"http://127.0.0.1:{APP_PORT}"
+                wait_healthy(url)
+                name = "admission" if admission == "1" else "no_admission"
+                report[name] = asyncio.run(burst(url, server.pid, args))
+                print(name, "done", file=sys.stderr)
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        mock.terminate()
+        mock.wait()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--latency-ms", type=float, default=4000)
+    parser.add_argument("--bulk-rps", type=float, default=60)
+    parser.add_argument("--interactive-rps", type=float, default=5)
+    parser.add_argument("--max-inflight", type=int, default=64)
+    parser.add_argument("--max-queue", type=int, default=128)
+    parser.add_argument("--client-timeout", type=float, default=120)
+    main(parser.parse_args())
@@ -0,0 +1,138 @@
+"""
+Benchmark: "model": "auto" against fixed models.
+
+The mock provider gives each AUTO_MODELS candidate its own latency:
+a base plus a cost per 1k prompt tokens (--model-latency). With the default
+the cheapest model is fast on short prompts but slows down most with input
+size, and the most expensive one barely does, so the right choice depends
+on how long the job description is.
+
+The same mixed workload (no job description, ~1.5k and ~5k token job
+descriptions, in turn) runs through app.lambda_main against each fixed
+model and then against "auto", first with --slo-ms and then with
+--tight-slo-ms. Job descriptions are sent uncompacted (COMPACTION=0) and
+without Gemini context caching so their length reaches the provider. Per
+run and input size it reports p50/p95 latency, the share of requests within
+the SLO and the models used; per run the total token cost at the router's
+prices. "router" is what the last run measured, as /models shows it. The
+first AUTO_MIN_SAMPLES calls of each model are exploration and land in the
+tail of short runs.
+
+Usage:
+    python -m benchmarks.bench_autoroute --requests 300 --slo-ms 1200 --tight-slo-ms 600
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+from collections import Counter
+
+import httpx
+
+PORT = 9170
+MODELS = ["gemini/gemini-2.0-flash-lite", "gemini/gemini-2.0-flash", "gemini/gemini-2.5-flash"]
+# base ms : ms per 1k prompt tokens
+MODEL_LATENCY = "gemini-2.0-flash-lite=250:600,gemini-2.0-flash=350:200,gemini-2.5-flash=700:40"
+JD_LINE = "Own the {n} ingestion service: Kafka, Postgres, on-call, incident reviews and mentoring."
+SIZES = {"short": 0, "medium": 60, "long": 220}  # job description lines (~24 tokens each)
+
+
+def job_description(lines: int, n: int):
+    return "\n".join(JD_LINE.format(n=f"{n}-{i}") for i in range(lines)) or None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))], 1)
+
+
+async def run(app, model: str, requests: int, concurrency: int, slo_ms: float):
+    counter = itertools.count()
+    latencies = {size: [] for size in SIZES}
+    used = {size: Counter() for size in SIZES}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=120) as client:
+        async def worker():
+            while True:
+                n = next(counter)
+                if n >= requests:
+                    return
+                size = list(SIZES)[n % len(SIZES)]
+                loop = asyncio.get_running_loop()
+                start = loop.time()
+                response = await client.post("/evaluate", json={
+                    "question": f"Question {model} {n}",
+                    "answer": "I owned the on-call rotation and halved the incident count.",
+                    "job_description": job_description(SIZES[size], n),
+                    "model": model,
+                })
+                response.raise_for_status()
+                latencies[size].append((loop.time() - start) * 1000)
+                used[size][response.headers.get("X-Model", model)] += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    report = {}
+    for size, values in latencies.items():
+        report[size] = {
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "within_slo": round(sum(value <= slo_ms for value in values) / len(values), 3),
+            "models": dict(used[size]),
+        }
+    return report
+
+
+def cost(engine, before: dict) -> float:
+    """USD spent since the `before` usage snapshot, at the router's prices"""
+    total = 0.0
+    for model, totals in engine.usage_stats.stats().items():
+        price = engine.auto_router.price(model)
+        previous = before.get(model, {})
+        if price:
+            total += ((totals["input_tokens"] - previous.get("input_tokens", 0)) * price[0] +
+                      (totals["output_tokens"] - previous.get("output_tokens", 0)) * price[1]) / 1e6
+    return round(total, 6)
+
+
+def main(args):
+    os.environ.update({
+        "GEMINI_API_BASE": f"http://127.0.0.1:{args.port}",
+        "GEMINI_API_KEY": "mock-gemini",
+        "EVAL_CACHE_SIZE": "0",  # every request must reach the provider
+        "COMPACTION": "0",
+        "GEMINI_CACHE_MIN_TOKENS": "1000000",  # no cachedContents: the whole prompt is sent every time
+        "AUTO_MODELS": ",".join(MODELS),
+    })
+    from benchmarks import mock_provider
+    from app import lambda_main
+    from app.autoroute import AutoRouter
+
+    mock_provider.app.state.model_latency = mock_provider.parse_model_latency(args.model_latency)
+    mock_provider.start_in_thread(args.port)
+    engine = lambda_main.engine
+    report = {}
+    runs = [(model, args.slo_ms) for model in MODELS] + [("auto", args.slo_ms), ("auto", args.tight_slo_ms)]
+    for model, slo_ms in runs:
+        # A fresh router per run: measurements start from nothing each time
+        engine.auto_router = AutoRouter(candidates=MODELS, slo_ms=slo_ms)
+        before = engine.usage_stats.stats()
+        name = model if model != "auto" else f"auto (slo {slo_ms:g} ms)"
+        report[name] = asyncio.run(run(lambda_main.app, model, args.requests, args.concurrency, slo_ms))
+        report[name]["cost_usd"] = cost(engine, before)
+    stats = engine.auto_router.stats()
+    report["router"] = {model: {key: entry[key] for key in ("samples", "p95_ms", "seconds_per_1k_input_tokens",
+                                                            "decisions")}
+                        for model, entry in stats["models"].items()}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--slo-ms", type=float, default=1200)
+    parser.add_argument("--tight-slo-ms", type=float, default=600)
+    parser.add_argument("--model-latency", default=MODEL_LATENCY, help='"model=ms:ms_per_1k,..." for the mock')
+    parser.add_argument("--port", type=int, default=PORT)
+    main(parser.parse_args())
@@ -0,0 +1,187 @@
+"""
+Benchmark: token estimation and prompt compaction (app.tokens).
+
+1. Estimator: throughput of estimate_tokens() next to the old len/4
+   heuristic, and its error against tiktoken's cl100k_base when tiktoken is
+   installed (it is only used here, never at runtime).
+2. Compaction: input tokens before/after and time spent for a pasted
+   résumé-style answer and a long job description full of boilerplate.
+3. End to end: app.lambda_main in-process against the mock provider with
+   a per-token latency cost (--ms-per-1k-tokens), COMPACTION off vs on. It
+   reports latency, the X-Input-Tokens / X-Input-Tokens-Saved headers and
+   the X-Max-Tokens the output budget settles on.
+
+Usage:
+    python -m benchmarks.bench_compaction --requests 40 --ms-per-1k-tokens 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+from benchmarks.common import load_test_cases
+
+PORT = 9140
+
+FILLER = ("team project system process people company work things time experience role stakeholders "
+          "meetings planning colleagues product customers tools approach").split()
+
+
+def filler(rng: random.Random) -> str:
+    return "I " + " ".join(rng.choice(FILLER) for _ in range(rng.randint(8, 18))) + "."
+
+
+# A pasted résumé-length answer: a few strong sentences among a lot of filler
+_rng = random.Random(0)
+ANSWER = " ".join([
+    "In my last role I led the migration of our payments platform from a monolith to services on Kubernetes.",
+    *[filler(_rng) for _ in range(60)],
+    "We cut deployment time from 2 hours to 15 minutes and reduced p95 checkout latency by 40%.",
+    *[filler(_rng) for _ in range(60)],
+    "I built the on-call process, wrote runbooks and mentored four junior engineers through promotion.",
+    *[filler(_rng) for _ in range(60)],
+    "Skills: Python, Go, PostgreSQL, Redis, Kafka, AWS, Terraform, Docker, Kubernetes, Grafana.",
+])
+
+JOB_DESCRIPTION = "\n".join([
+    "Senior Backend Engineer - Payments",
+    "About us: we are a fast-growing fintech company serving millions of customers worldwide.",
+    "Responsibilities:",
+    "- Design, build and operate distributed services in Python and Go.",
+    "- Own reliability and latency of customer-facing payment APIs.",
+    "- Mentor engineers and lead projects end to end.",
+    "Requirements:",
+    "- 5+ years of backend experience with SQL and NoSQL databases.",
+    "- Strong knowledge of AWS, Kubernetes, CI/CD and observability.",
+    "Benefits include health insurance, dental and vision, 401(k) matching and paid time off.",
+    "We offer parental leave, stock options and a home office budget.",
+    "We are an equal opportunity employer and value diversity at our company.",
+    "All qualified applicants will receive consideration without regard to race, color, religion, sex, "
+    "sexual orientation, gender identity, national origin, disability, or veteran status.",
+    "We provide reasonable accommodation to individuals with disabilities during the application process.",
+    "How to apply: submit your resume and a short cover letter through our careers page.",
+    "By applying you agree to our applicant privacy notice.",
+    "Recruitment agencies: we do not accept unsolicited resumes.",
+] * 6)
+
+QUESTION = "Tell me about a time you improved the reliability or performance of a production system."
+
+
+def bench_estimator(repeat: int) -> dict:
+    from app.tokens import estimate_tokens
+
+    texts = [ANSWER, JOB_DESCRIPTION, QUESTION]
+    chars = sum(len(t) for t in texts) * repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            estimate_tokens(text)
+    regex_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            (len(text) + 3) // 4
+    len_s = time.perf_counter() - start
+    result = {
+        "estimate_tokens_mchars_per_s": round(chars / regex_s / 1e6, 1),
+        "len_div_4_mchars_per_s": round(chars / len_s / 1e6, 1),
+    }
+    try:
+        import tiktoken
+    except ImportError:
+        result["tiktoken"] = "not installed: accuracy not measured"
+        return result
+    encoding = tiktoken.get_encoding("cl100k_base")
+    samples = [ANSWER, JOB_DESCRIPTION] + [case["answer"] for case in load_test_cases()]
+    errors = {"estimate_tokens": [], "len_div_4": []}
+    for text in samples:
+        actual = len(encoding.encode(text))
+        errors["estimate_tokens"].append(abs(estimate_tokens(text) - actual) / actual)
+        errors["len_div_4"].append(abs((len(text) + 3) // 4 - actual) / actual)
+    result["mean_abs_error_vs_cl100k"] = {name: round(statistics.mean(e), 3) for name, e in errors.items()}
+    return result
+
+
+def bench_compact(repeat: int) -> dict:
+    from app import tokens
+
+    tokens.compact_job_description.cache_clear()
+    start = time.perf_counter()
+    compacted = tokens.compact(QUESTION, ANSWER, JOB_DESCRIPTION)
+    cold_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(repeat):
+        tokens.compact(QUESTION, ANSWER, JOB_DESCRIPTION)
+    warm_ms = (time.perf_counter() - start) * 1000 / repeat
+    return {
+        "answer_tokens": [tokens.estimate_tokens(ANSWER), tokens.estimate_tokens(compacted.answer)],
+        "job_description_tokens": [tokens.estimate_tokens(JOB_DESCRIPTION),
+                                   tokens.estimate_tokens(compacted.job_description)],
+        "tokens_saved": compacted.tokens_saved,
+        "steps": compacted.steps,
+        "compact_ms_cold": round(cold_ms, 2),
+        "compact_ms_warm": round(warm_ms, 2),  # job description compaction is memoized
+    }
+
+
+async def bench_end_to_end(args) -> dict:
+    import httpx
+
+    from app import lambda_main, tokens
+    from benchmarks import mock_provider
+
+    mock_provider.start_in_thread(PORT, latency_ms=args.latency_ms, ms_per_1k_tokens=args.ms_per_1k_tokens)
+    results = {}
+    async with lambda_main.lifespan(lambda_main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=lambda_main.app), base_url="http://app",
+                                     timeout=60) as client:
+            for enabled in (False, True):
+                tokens.COMPACTION_ENABLED = enabled
+                latencies, input_tokens, saved, max_tokens = [], [], [], []
+                for i in range(args.requests):
+                    payload = {"question": f"{QUESTION} (#{i})", "answer": ANSWER,
+                               "job_description": JOB_DESCRIPTION, "model": args.model}
+                    start = time.perf_counter()
+                    response = await client.post("/evaluate", json=payload)
+                    latencies.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                    input_tokens.append(int(response.headers["x-input-tokens"]))
+                    saved.append(int(response.headers["x-input-tokens-saved"]))
+                    max_tokens.append(int(response.headers["x-max-tokens"]))
+                results["compaction_on" if enabled else "compaction_off"] = {
+                    "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+                    "p50_ms": round(statistics.median(latencies) * 1000, 1),
+                    "input_tokens": round(statistics.mean(input_tokens)),
+                    "input_tokens_saved": round(statistics.mean(saved)),
+                    "max_tokens_first_last": [max_tokens[0], max_tokens[-1]],
+                }
+    off, on = results["compaction_off"], results["compaction_on"]
+    results["latency_reduction_pct"] = round(100 * (1 - on["mean_ms"] / off["mean_ms"]), 1)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=300)
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    args = parser.parse_args()
+    # Configuration is read at import, so set it before the app is loaded
+    os.environ.update(
+        GEMINI_API_BASE=f"http://127.0.0.1:{PORT}",
+        ANTHROPIC_API_BASE=f"http://127.0.0.1:{PORT}",
+        GEMINI_API_KEY="mock-gemini",
+        ANTHROPIC_API_KEY="mock-anthropic",
+        PROMPT_CACHE="0",
+        EVAL_CACHE_SIZE="0",
+    )
+    print(json.dumps({
+        "estimator": bench_estimator(args.repeat),
+        "compaction": bench_compact(args.repeat),
+        "end_to_end": asyncio.run(bench_end_to_end(args)),
+    }, indent=2))
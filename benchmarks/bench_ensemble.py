@@ -0,0 +1,99 @@
+"""
+Benchmark: latency and cost against score stability for ensembles.
+
+The mock provider scores the same answer 78 +- --score-jitter points
+(gaussian) and answers after a lognormal latency. The same closed-loop load
+runs through app.lambda_main with "samples": 1, and with k samples:
+without early stopping (every sample awaited), with early stopping
+(ENSEMBLE_TOLERANCE / ENSEMBLE_MIN_AGREE), and with early stopping plus a
+--stagger-ms (ENSEMBLE_STAGGER_MS). Per setting it reports p50/p95 latency, provider
+calls per request and the spread of the returned scores: the standard
+deviation and the mean absolute error from 78.
+
+Usage:
+    python -m benchmarks.bench_ensemble --requests 200 --score-jitter 6 --tolerance 5 --stagger-ms 150
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+
+import httpx
+
+from benchmarks import common
+
+PORT = 9150
+TRUE_SCORE = 78  # mock_provider.CANNED_EVALUATION
+
+
+async def run(app, samples: int, requests: int, concurrency: int):
+    counter = itertools.count()
+    scores = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=120) as client:
+        async def call():
+            response = await client.post("/evaluate", json={
+                "question": f"Question {samples} {next(counter)}",
+                "answer": "I owned the on-call rotation and halved the incident count.",
+                "model": "gemini-2.5-flash",
+                "samples": samples,
+            })
+            response.raise_for_status()
+            scores.append(response.json()["score"])
+
+        summary = await common.run_closed_loop(call, requests, concurrency)
+    summary["score_stdev"] = round(statistics.pstdev(scores), 2)
+    summary["score_mae"] = round(statistics.mean(abs(score - TRUE_SCORE) for score in scores), 2)
+    return summary
+
+
+def main(args):
+    os.environ.update({
+        "GEMINI_API_BASE": f"http://127.0.0.1:{args.port}",
+        "GEMINI_API_KEY": "mock-gemini",
+        "EVAL_CACHE_SIZE": "0",  # every request must reach the provider
+    })
+    from benchmarks import mock_provider
+    from app import lambda_main
+    from app.ensemble import Ensemble
+
+    mock = mock_provider.app.state
+    mock_provider.start_in_thread(args.port, args.latency_ms)
+    mock.latency_dist, mock.latency_sigma = "lognormal", args.latency_sigma
+    mock.score_jitter = args.score_jitter
+
+    settings = [("single", 1, None)]
+    for k in args.samples:
+        settings.append((f"k{k}_all", k, Ensemble(max_samples=k, tolerance=args.tolerance, min_agree=k)))
+        settings.append((f"k{k}_early_stop", k, Ensemble(max_samples=k, tolerance=args.tolerance,
+                                                          min_agree=args.min_agree)))
+        settings.append((f"k{k}_staggered", k, Ensemble(max_samples=k, tolerance=args.tolerance,
+                                                         min_agree=args.min_agree, stagger_ms=args.stagger_ms)))
+    report = {}
+    for name, k, ensemble in settings:
+        if ensemble is not None:
+            lambda_main.engine.ensemble = ensemble
+        before = mock.requests
+        summary = asyncio.run(run(lambda_main.app, k, args.requests, args.concurrency))
+        summary["calls_per_request"] = round((mock.requests - before) / args.requests, 2)
+        if ensemble is not None:
+            summary["stopped_early"] = ensemble.stats()["stopped_early"]
+        report[name] = summary
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--samples", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--tolerance", type=float, default=5, help="points; see ENSEMBLE_TOLERANCE")
+    parser.add_argument("--min-agree", type=int, default=2, help="see ENSEMBLE_MIN_AGREE")
+    parser.add_argument("--stagger-ms", type=float, default=150, help="see ENSEMBLE_STAGGER_MS")
+    parser.add_argument("--latency-ms", type=float, default=50, help="median provider latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--score-jitter", type=float, default=6, help="stdev of the mock's score, in points")
+    parser.add_argument("--port", type=int, default=PORT)
+    main(parser.parse_args())
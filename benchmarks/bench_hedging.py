@@ -0,0 +1,81 @@
+"""
+Benchmark: tail latency with and without hedged routing.
+
+The mock provider answers in --latency-ms, except for a --slow-rate fraction
+of calls that take --slow-ms longer. The same closed-loop load runs through
+app.lambda_main with routing "single" and "hedged" and reports p50/p95/p99,
+plus how many extra calls the hedges cost.
+
+Usage:
+    python -m benchmarks.bench_hedging --requests 400 --slow-rate 0.05 --slow-ms 2000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+
+import httpx
+
+from benchmarks import common
+
+PORT = 9106
+
+
+async def run(app, routing: str, requests: int, concurrency: int):
+    counter = itertools.count()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=120) as client:
+        async def call():
+            i = next(counter)
+            response = await client.post("/evaluate", json={
+                "question": f"Question {routing} {i}",
+                "answer": "I owned the on-call rotation and halved the incident count.",
+                "model": "gemini-2.5-flash",
+                "routing": routing,
+            })
+            response.raise_for_status()
+
+        # Warm-up so the latency window has enough samples to set the hedge delay
+        for _ in range(30):
+            await call()
+        return await common.run_closed_loop(call, requests, concurrency)
+
+
+def main(args):
+    os.environ.update({
+        "GEMINI_API_BASE": f"http://127.0.0.1:{args.port}",
+        "GEMINI_API_KEY": "mock-gemini",
+    })
+    from benchmarks import mock_provider
+    from app import lambda_main
+    from app.hedging import HedgingRouter
+
+    mock = mock_provider.app.state
+    mock_provider.start_in_thread(args.port, args.latency_ms)
+    mock.slow_rate, mock.slow_ms = args.slow_rate, args.slow_ms
+
+    report = {}
+    for routing in ("single", "hedged"):
+        lambda_main.engine.router = HedgingRouter(budget=args.budget)
+        before = mock.requests
+        summary = asyncio.run(run(lambda_main.app, routing, args.requests, args.concurrency))
+        stats = lambda_main.engine.router.stats()
+        summary["provider_calls"] = mock.requests - before
+        summary["hedged"] = stats["hedged"]
+        summary["fallback_wins"] = stats["fallback_wins"]
+        summary["over_budget"] = stats["over_budget"]
+        report[routing] = summary
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=2000)
+    parser.add_argument("--budget", type=float, default=0.1, help="hedges earned per request")
+    parser.add_argument("--port", type=int, default=PORT)
+    main(parser.parse_args())
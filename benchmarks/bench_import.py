@@ -0,0 +1,112 @@
+"""
+Import-time and cold-start guard for the Lambda handlers.
+
+For each module it reports:
+- the `python -X importtime` total and the heaviest imports,
+- a measured cold start: fresh interpreter -> import -> first handler
+  invocation (GET /health through Mangum),
+- whether any provider SDK was imported eagerly.
+
+Exits non-zero when a limit is exceeded, so CI catches regressions.
+
+Usage:
+    python -m benchmarks.bench_import --max-import-ms 1500 --max-cold-start-ms 2000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("litellm", "tiktoken", "openai")
+
+COLD_START_SCRIPT = r"""
+import json, sys, time
+start = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+event = {{
+    "version": "2.0", "routeKey": "$default", "rawPath": "/health", "rawQueryString": "",
+    "headers": {{"host": "localhost"}}, "isBase64Encoded": False,
+    "requestContext": {{
+        "http": {{"method": "GET", "path": "/health", "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "bench"}},
+        "stage": "$default", "requestId": "bench", "routeKey": "$default", "accountId": "0", "apiId": "bench",
+        "domainName": "localhost", "domainPrefix": "localhost", "time": "", "timeEpoch": 0,
+    }},
+}}
+response = target.handler(event, None)
+done = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "first_invoke_ms": (done - imported) * 1000,
+    "status": response["statusCode"],
+    "eager_heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def import_profile(module: str, top: int):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if parts[0].isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    total_us = next((us for us, name in rows if name == module), sum(us for us, name in rows if not name.startswith(" ")))
+    heaviest = sorted(((us, name.strip()) for us, name in rows), reverse=True)[:top]
+    return total_us / 1000, [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in heaviest]
+
+
+def cold_start(module: str, runs: int):
+    samples = []
+    env = dict(os.environ, PREWARM="0")
+    for _ in range(runs):
+        script = COLD_START_SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+        result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True)
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    best = min(samples, key=lambda s: s["import_ms"] + s["first_invoke_ms"])
+    return {
+        "import_ms": round(best["import_ms"], 1),
+        "first_invoke_ms": round(best["first_invoke_ms"], 1),
+        "cold_start_ms": round(best["import_ms"] + best["first_invoke_ms"], 1),
+        "status": best["status"],
+        "eager_heavy_modules": best["eager_heavy_modules"],
+    }
+
+
+def main(args):
+    report, failures = {}, []
+    for module in args.modules:
+        importtime_ms, heaviest = import_profile(module, args.top)
+        measured = cold_start(module, args.runs)
+        report[module] = {"importtime_total_ms": round(importtime_ms, 1), "cold_start": measured, "heaviest": heaviest}
+
+        if measured["eager_heavy_modules"]:
+            failures.append(f"{module}: imports {measured['eager_heavy_modules']} eagerly")
+        if measured["status"] != 200:
+            failures.append(f"{module}: /health returned {measured['status']}")
+        if args.max_import_ms and measured["import_ms"] > args.max_import_ms:
+            failures.append(f"{module}: import took {measured['import_ms']} ms (limit {args.max_import_ms})")
+        if args.max_cold_start_ms and measured["cold_start_ms"] > args.max_cold_start_ms:
+            failures.append(f"{module}: cold start took {measured['cold_start_ms']} ms (limit {args.max_cold_start_ms})")
+
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["app.main", "app.lambda_main"])
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per module (best is reported)")
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports to list")
+    parser.add_argument("--max-import-ms", type=float, default=0)
+    parser.add_argument("--max-cold-start-ms", type=float, default=0)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""
+Benchmark: overhead of the metrics/stage-timing instrumentation.
+
+1. Micro: cost of one `with stage(...)` block, one histogram observation and
+   rendering /metrics.
+2. End to end: closed-loop /evaluate load through app.lambda_main against a
+   zero-latency mock provider, in two fresh processes with METRICS=1 and
+   METRICS=0, so the difference is the whole per-request instrumentation cost.
+
+Usage:
+    python -m benchmarks.bench_metrics --requests 2000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 9111
+
+
+def micro():
+    from app import metrics
+
+    def timed_stage():
+        with metrics.stage("bench"):
+            pass
+
+    histogram = metrics.Histogram("bench_seconds", "bench", ("model",))
+    n = 200000
+    report = {
+        "stage_ns": round(timeit.timeit(timed_stage, number=n) / n * 1e9, 1),
+        "histogram_observe_ns": round(timeit.timeit(lambda: histogram.observe(0.123, "m"), number=n) / n * 1e9, 1),
+    }
+    report["render_ms"] = round(timeit.timeit(metrics.REGISTRY.render, number=100) / 100 * 1000, 3)
+    return report
+
+
+def child(args):
+    """Run the load in this process (metrics on/off decided by the env at import)"""
+    import httpx
+
+    from app import lambda_main
+    from benchmarks import common, mock_provider
+
+    mock_provider.start_in_thread(args.port)
+    counter = itertools.count()
+
+    async def run():
+        transport = httpx.ASGITransport(app=lambda_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            async def call():
+                response = await client.post("/evaluate", json={"question": f"q{next(counter)}", "answer": "a"})
+                response.raise_for_status()
+
+            for _ in range(50):
+                await call()
+            return await common.run_closed_loop(call, args.requests, args.concurrency)
+
+    print(json.dumps(asyncio.run(run())))
+
+
+def end_to_end(args):
+    results = {}
+    for enabled in ("1", "0"):
+        env = dict(os.environ, METRICS=enabled,
+                   GEMINI_API_BASE=f"http://127.0.0.1:{args.port}", GEMINI_API_KEY="mock", MODEL="gemini-2.5-flash")
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_metrics", "--child", "--requests", str(args.requests),
+             "--concurrency", str(args.concurrency), "--port", str(args.port)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        results["metrics_on" if enabled == "1" else "metrics_off"] = json.loads(output.strip().splitlines()[-1])
+    on, off = results["metrics_on"], results["metrics_off"]
+    results["rps_overhead_pct"] = round((off["rps"] - on["rps"]) / off["rps"] * 100, 2) if off["rps"] else 0.0
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+    else:
+        print(json.dumps({"micro": micro(), "end_to_end": end_to_end(args)}, indent=2))
@@ -0,0 +1,88 @@
+"""
+Benchmark: whole-interview scoring with and without multi-answer packing.
+
+Always prints the estimated input tokens and LLM call count for the
+TEST_CASES questions sharing one job description. With --url it also times
+/evaluate/batch (pack=false vs pack=true) against a running server, e.g. one
+pointed at the mock provider:
+
+    python -m benchmarks.mock_provider --port 9000 --latency-ms 300 --ms-per-1k-tokens 200
+    GEMINI_API_BASE=http://127.0.0.1:9000 GEMINI_API_KEY=mock uvicorn app.main:app
+    python -m benchmarks.bench_packing --url http://127.0.0.1:8000
+"""
+import argparse
+import json
+import time
+import uuid
+
+import httpx
+
+from app import packing
+from app.prompts import SYSTEM_PROMPT, build_job_context, build_prompt
+from app.schemas import EvaluationRequest
+from test_api import TEST_CASES
+
+JOB_DESCRIPTION = " ".join([
+    "We are hiring a Senior Software Engineer to join our platform team.",
+    "You will design, build and operate distributed services in Python and Go,",
+    "mentor engineers, partner with product and data teams, and own reliability",
+    "for customer-facing APIs that serve millions of requests per day.",
+    "Requirements: 5+ years of backend experience, strong knowledge of cloud",
+    "infrastructure (AWS preferred), CI/CD, observability, SQL and NoSQL databases,",
+    "and a track record of leading projects end to end.",
+    "Nice to have: experience with event-driven architectures, Kubernetes,",
+    "machine learning platforms and hiring/interviewing.",
+] * 4)
+
+
+def token_report(items):
+    unpacked = sum(
+        packing.estimate_tokens(SYSTEM_PROMPT + build_job_context(item.job_description))
+        + packing.estimate_tokens(build_prompt(item))
+        for item in items
+    )
+    prefix = packing.estimate_tokens(SYSTEM_PROMPT + packing.PACKED_INSTRUCTIONS)
+    prefix += packing.estimate_tokens(JOB_DESCRIPTION)
+    item_tokens = [packing.estimate_tokens(i.question) + packing.estimate_tokens(i.answer) + 8 for i in items]
+    packs = packing.plan_packs(prefix, item_tokens)
+    packed = sum(
+        packing.estimate_tokens(packing.build_packed_prompt([(items[i].question, items[i].answer) for i in pack]))
+        + packing.estimate_tokens(SYSTEM_PROMPT + packing.PACKED_INSTRUCTIONS + build_job_context(JOB_DESCRIPTION))
+        for pack in packs
+    )
+    return {
+        "items": len(items),
+        "unpacked": {"llm_calls": len(items), "input_tokens": unpacked},
+        "packed": {"llm_calls": len(packs), "input_tokens": packed},
+        "input_token_reduction": round(unpacked / packed, 2),
+    }
+
+
+def time_batches(url, payload_items):
+    results = {}
+    with httpx.Client(base_url=url, timeout=300) as client:
+        for pack in (False, True):
+            # Unique suffix so the server's result cache cannot answer
+            nonce = uuid.uuid4().hex[:8]
+            items = [dict(item, answer=item["answer"] + " (" + nonce + ")") for item in payload_items]
+            start = time.perf_counter()
+            response = client.post("/evaluate/batch", json={"items": items, "pack": pack})
+            response.raise_for_status()
+            errors = sum(1 for r in response.json()["results"] if r["error"])
+            results["packed" if pack else "unpacked"] = {
+                "wall_ms": round((time.perf_counter() - start) * 1000, 1),
+                "errors": errors,
+            }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="running API to time /evaluate/batch against")
+    args = parser.parse_args()
+
+    payload_items = [dict(case, job_description=JOB_DESCRIPTION) for case in TEST_CASES]
+    report = {"tokens": token_report([EvaluationRequest(**item) for item in payload_items])}
+    if args.url:
+        report["timing"] = time_batches(args.url, payload_items)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,133 @@
+"""
+Benchmark: structured-output parsing, legacy vs app.structured.
+
+Builds a corpus of completions with the defects seen in recorded provider
+output (code fences with and without the closing fence, prose before or
+after the object, trailing commas, raw newlines inside strings, and output
+cut off at max_tokens) and reports, per defect, how many completions each
+parser turns into a valid EvaluationResponse, plus parse throughput.
+
+The legacy parser is the previous implementation: strip a leading code
+fence, then json.loads.
+
+Usage:
+    python -m benchmarks.bench_parsing --evaluations 200
+"""
+import argparse
+import json
+import random
+import time
+
+from pydantic import ValidationError
+
+from app.schemas import CriteriaBreakdown, EvaluationResponse
+from app.structured import StructuredOutputError, extract_json, to_model, validate_json
+
+WORDS = ("clear structure quantified impact ownership latency migration team stakeholder "
+         "tradeoffs metrics design incident rollout customer database caching detail example").split()
+
+
+def sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 14))).capitalize() + "."
+
+
+def evaluation(rng: random.Random) -> dict:
+    breakdown = {"relevance": rng.randint(5, 25), "clarity": rng.randint(5, 20), "depth": rng.randint(5, 25),
+                 "impact": rng.randint(3, 15), "job_alignment": rng.choice([None, rng.randint(3, 15)])}
+    return {
+        "score": sum(v for v in breakdown.values() if v),
+        "criteria_breakdown": breakdown,
+        "summary": " ".join(sentence(rng) for _ in range(rng.randint(1, 3))),
+        "strengths": [sentence(rng) for _ in range(rng.randint(1, 4))],
+        "weaknesses": [sentence(rng) for _ in range(rng.randint(1, 4))],
+        "improvement_suggestions": [sentence(rng) for _ in range(rng.randint(1, 4))],
+    }
+
+
+def defects(rng: random.Random, value: dict) -> dict:
+    """One rendering of `value` per defect category"""
+    pretty = json.dumps(value, indent=2)
+    compact = json.dumps(value)
+    summary = json.dumps(value["summary"])
+    return {
+        "clean": compact,
+        "fenced": "```json\n" + pretty + "\n```",
+        "unclosed_fence": "```json\n" + pretty + "\n",
+        "leading_prose": "Here is the evaluation of the candidate's answer:\n\n" + pretty,
+        "trailing_commentary": pretty + "\n\nNote: the score reflects the {job description} provided.",
+        "trailing_commas": pretty.replace("\n  ]", ",\n  ]").replace("\n  }", ",\n  }"),
+        "raw_newline": compact.replace(summary, summary.replace(". ", ".\n")),
+        # Cut off at max_tokens, somewhere in the lists at the end
+        "truncated": pretty[:int(len(pretty) * rng.uniform(0.75, 0.99))],
+        "truncated_anywhere": pretty[:int(len(pretty) * rng.uniform(0.2, 0.99))],
+    }
+
+
+def legacy_parse(result_text: str) -> EvaluationResponse:
+    result_text = result_text.strip()
+    if result_text.startswith("```"):
+        lines = result_text.split("\n")
+        result_text = "\n".join(lines[1:-1] if lines[-1] == "```" else lines[1:])
+    result = json.loads(result_text)
+    return EvaluationResponse(
+        score=result["score"],
+        criteria_breakdown=CriteriaBreakdown(**result["criteria_breakdown"]),
+        summary=result["summary"],
+        strengths=result.get("strengths", []),
+        weaknesses=result.get("weaknesses", []),
+        improvement_suggestions=result.get("improvement_suggestions", []),
+    )
+
+
+def structured_parse(result_text: str) -> EvaluationResponse:
+    return validate_json(result_text, EvaluationResponse) or to_model(extract_json(result_text).value,
+                                                                      EvaluationResponse)
+
+
+PARSERS = {"legacy": legacy_parse, "structured": structured_parse}
+
+
+def succeeds(parse, text: str) -> bool:
+    try:
+        parse(text)
+        return True
+    except (ValueError, KeyError, TypeError, ValidationError, StructuredOutputError):
+        return False
+
+
+def throughput(parse, texts, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            succeeds(parse, text)
+    return round(repeat * len(texts) / (time.perf_counter() - start))
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    corpus = {}
+    for _ in range(args.evaluations):
+        for category, text in defects(rng, evaluation(rng)).items():
+            corpus.setdefault(category, []).append(text)
+
+    report = {"evaluations": args.evaluations, "success_rate": {}, "parses_per_s": {}}
+    for category, texts in corpus.items():
+        report["success_rate"][category] = {
+            name: round(sum(succeeds(parse, text) for text in texts) / len(texts), 3)
+            for name, parse in PARSERS.items()
+        }
+    everything = [text for texts in corpus.values() for text in texts]
+    for name, parse in PARSERS.items():
+        report["parses_per_s"][name] = {
+            "clean": throughput(parse, corpus["clean"], args.repeat),
+            "all": throughput(parse, everything, max(1, args.repeat // 4)),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--evaluations", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,104 @@
+"""
+Benchmark: local prescoring against LLM scores.
+
+Labels are real LLM scores: recordings made by benchmarks/record_responses.py
+(line i is TEST_CASES[i % len(TEST_CASES)]) and/or result files written by
+test_api.py (RESULTS_FILE, one {"question", "answer", "job_description",
+"result"} per line). For every labeled answer app.prescore decides whether
+it is confidently weak; per threshold setting the report gives:
+
+- calls_avoided: share of answers decided locally (no LLM call);
+- agreement: share of those the LLM put in the same band (0-39 very weak,
+  40-59 weak, 60-74 average, 75-89 good, 90-100 excellent);
+- mae: mean absolute difference between local and LLM scores on them;
+- missed: answers the LLM scored very weak that went to the LLM anyway.
+
+The recorded set is small (the ten TEST_CASES); pass more result files
+for a meaningful agreement rate before tightening or loosening thresholds.
+
+Usage:
+    python -m benchmarks.bench_prescore --recordings benchmarks/recordings/sample.jsonl --results results.jsonl
+"""
+import argparse
+import json
+import os
+import time
+from typing import List, Tuple
+
+from app.prescore import PRESCORE_MAX_SCORE, PRESCORE_MAX_WORDS, prescore
+from app.structured import extract_json
+from benchmarks.common import ROOT, load_test_cases
+
+BANDS = (40, 60, 75, 90)
+
+
+def band(score: int) -> int:
+    return sum(score >= edge for edge in BANDS)
+
+
+def load_labels(recordings: List[str], results: List[str]) -> List[Tuple[dict, int]]:
+    cases = load_test_cases()
+    labels = []
+    for path in recordings:
+        with open(path) as f:
+            lines = [line for line in f if line.strip()]
+        for i, line in enumerate(lines):
+            completion = json.loads(line)["completion"]
+            labels.append((cases[i % len(cases)], extract_json(completion).value["score"]))
+    for path in results:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    labels.append((entry, entry["result"]["score"]))
+    return labels
+
+
+def evaluate_thresholds(labels, max_words: int, max_score: int) -> dict:
+    decided, agreed, errors, missed = 0, 0, [], 0
+    for case, llm_score in labels:
+        result = prescore(case["question"], case["answer"], case.get("job_description"), max_words, max_score)
+        if result.confident:
+            decided += 1
+            local_score = result.features.estimated_score
+            agreed += band(local_score) == band(llm_score)
+            errors.append(abs(local_score - llm_score))
+        elif llm_score < BANDS[0]:
+            missed += 1
+    return {
+        "max_words": max_words,
+        "max_score": max_score,
+        "calls_avoided": round(decided / len(labels), 3),
+        "agreement": round(agreed / decided, 3) if decided else None,
+        "mae": round(sum(errors) / len(errors), 1) if errors else None,
+        "missed": missed,
+    }
+
+
+def per_answer_us(labels, repeat: int = 200) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for case, _ in labels:
+            prescore(case["question"], case["answer"], case.get("job_description"))
+    return round((time.perf_counter() - start) / (repeat * len(labels)) * 1e6, 1)
+
+
+def main(args):
+    labels = load_labels(args.recordings, args.results)
+    report = {
+        "labeled": len(labels),
+        "very_weak_by_llm": sum(score < BANDS[0] for _, score in labels),
+        "prescore_us": per_answer_us(labels),
+        "configured": evaluate_thresholds(labels, PRESCORE_MAX_WORDS, PRESCORE_MAX_SCORE),
+        "sweep": [evaluate_thresholds(labels, words, score)
+                  for words in (15, 25, 40) for score in (25, 35, 45)],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordings", nargs="*",
+                        default=[os.path.join(ROOT, "benchmarks", "recordings", "sample.jsonl")])
+    parser.add_argument("--results", nargs="*", default=[], help="RESULTS_FILE outputs of test_api.py")
+    main(parser.parse_args())
@@ -0,0 +1,220 @@
+"""
+Benchmark: precision/recall of the semantic cache (app.semantic) by threshold.
+
+For each stock question, several genuinely different answers are cached.
+Each cached answer then yields variants used as lookups:
+
+- Paraphrases that deserve the same evaluation (positives): reformatting,
+  filler words, contractions, typos, swapped synonyms.
+- Changes that deserve a new evaluation (negatives): a paraphrase of
+  another candidate's answer (never cached), a changed number, an added
+  negation, a dropped sentence, an appended claim.
+
+Precision is the share of hits that returned the evaluation of the answer
+the variant came from, for positives only; any hit on a negative is a
+false hit. Recall is the share of positives answered. Choose
+SEMANTIC_THRESHOLD where precision is 1.0.
+
+Also reports lookup latency against --entries cached answers in one scope,
+NumPy vs pure Python.
+
+Usage:
+    python -m benchmarks.bench_semantic --variants 20
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from app import semantic
+from app.semantic import SemanticCache, embed, words
+from benchmarks.common import load_test_cases, percentile
+
+PROMPT_VERSION = "bench"
+MODEL = "gemini/gemini-2.5-flash"
+
+STOCK_ANSWERS = {
+    "Tell me about yourself": [
+        "I am a backend engineer with 6 years of experience building payment systems in Java and Go. "
+        "Most recently I led a team of 4 that rebuilt our settlement pipeline.",
+        "I studied computer science and joined a startup as the first engineer. I built the product from "
+        "scratch and hired the first engineering team.",
+        "I am a data analyst who moved into machine learning. I enjoy turning messy data into models "
+        "that the business actually uses.",
+    ],
+    "What is your greatest weakness?": [
+        "I sometimes take on too much work because I want to help everyone. I've learned to manage this "
+        "by using project management tools and setting clear boundaries about my capacity.",
+        "Public speaking used to make me nervous. I joined a speaking club and now present at our "
+        "monthly engineering review.",
+        "I can be a perfectionist and spend too long polishing details. I now agree on a definition of "
+        "done with my team before starting.",
+        "I am a perfectionist.",
+    ],
+    "Why do you want to work here?": [
+        "I like your company.",
+        "Your mission to make healthcare affordable matters to me personally, and your engineering blog "
+        "shows a team that cares about quality.",
+        "I have used your product for years and want to help build the features I keep wishing it had.",
+    ],
+}
+
+SYNONYMS = {
+    "built": "developed", "led": "headed", "team": "group", "enjoy": "love", "help": "assist",
+    "clear": "firm", "work": "tasks", "product": "platform", "manage": "handle", "personally": "deeply",
+    "make": "render", "company": "organization", "nervous": "anxious", "details": "small details",
+}
+FILLERS = ["um", "basically", "actually", "you know", "honestly", "so"]
+CONTRACTIONS = [("I am", "I'm"), ("I have", "I've"), ("I've", "I have"), ("I'm", "I am"), ("do not", "don't")]
+CLAIMS = [
+    "I also won an award for it.",
+    "I was promoted twice in that period.",
+    "It failed in the end.",
+]
+
+
+def sentences(text: str):
+    return re.split(r"(?<=[.!?])\s+", text.strip())
+
+
+def positive(rng: random.Random, answer: str) -> str:
+    kind = rng.choice(["format", "filler", "contraction", "typo", "synonym"])
+    if kind == "format":
+        return "  " + answer.lower().replace(". ", ".\n\n").replace(",", "") + " "
+    words = answer.split()
+    if kind == "filler":
+        for _ in range(rng.randint(1, 2)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(FILLERS) + ",")
+        return " ".join(words)
+    if kind == "contraction":
+        for a, b in CONTRACTIONS:
+            if a in answer:
+                return answer.replace(a, b, 1)
+    if kind == "typo" or len(words) < 4:
+        i = rng.randrange(len(words))
+        word = words[i]
+        if len(word) > 3:
+            j = rng.randrange(1, len(word) - 2)
+            words[i] = word[:j] + word[j + 1] + word[j] + word[j + 2:]
+        return " ".join(words)
+    swapped = [SYNONYMS.get(w, w) for w in words]
+    return " ".join(swapped) if swapped != words else answer + " "
+
+
+def negative(rng: random.Random, answer: str, others) -> str:
+    parts = sentences(answer)
+    kinds = ["negation", "claim"]
+    if others:
+        kinds.append("other")
+    if re.search(r"\d", answer):
+        kinds.append("number")
+    if len(parts) > 1:
+        kinds.append("drop")
+    kind = rng.choice(kinds)
+    if kind == "other":
+        return positive(rng, rng.choice(others))
+    if kind == "number":
+        return re.sub(r"\d+", lambda m: str(int(m.group()) + rng.randint(1, 9)), answer, count=1)
+    if kind == "negation":
+        return re.sub(r"\b(I|we) (am|have|was|can)\b", r"\1 \2 not", answer, count=1) \
+            if re.search(r"\b(I|we) (am|have|was|can)\b", answer) else "I did not. " + answer
+    if kind == "drop":
+        del parts[rng.randrange(len(parts))]
+        return " ".join(parts)
+    return answer + " " + rng.choice(CLAIMS)
+
+
+def build_cases(variants: int, seed: int):
+    """Cached answers per question, and (question, variant, expected cached answer or None) lookups"""
+    rng = random.Random(seed)
+    stock = {question: list(answers) for question, answers in STOCK_ANSWERS.items()}
+    for case in load_test_cases():
+        if case["answer"] not in stock.get(case["question"], []):
+            stock.setdefault(case["question"], []).append(case["answer"])
+    cached = {}
+    cases = []
+    for question, answers in stock.items():
+        # The last answer to a question is never cached: other candidates' answers to compare with
+        held_out = answers[-1:] if len(answers) > 1 else []
+        cached[question] = answers[:len(answers) - len(held_out)]
+        for answer in cached[question]:
+            for _ in range(variants):
+                cases.append((question, positive(rng, answer), answer))
+                cases.append((question, negative(rng, answer, held_out), None))
+    return cached, cases
+
+
+def evaluate_thresholds(cached, cases, thresholds, max_edits: int):
+    rows = []
+    for threshold in thresholds:
+        cache = SemanticCache(threshold=threshold, max_edits=max_edits, enabled=True)
+        for question, answers in cached.items():
+            for answer in answers:
+                cache.add(answer, question, answer, None, MODEL, PROMPT_VERSION, {"answer": answer})
+        true_hits = false_hits = positives = 0
+        for question, variant, expected in cases:
+            hit = cache.lookup(question, variant, None, MODEL, PROMPT_VERSION)
+            positives += expected is not None
+            if hit is None:
+                continue
+            if expected is not None and hit.value["answer"] == expected:
+                true_hits += 1
+            else:
+                false_hits += 1
+        rows.append({
+            "threshold": threshold,
+            "precision": round(true_hits / (true_hits + false_hits), 4) if true_hits + false_hits else 1.0,
+            "recall": round(true_hits / positives, 4) if positives else 0.0,
+            "false_hits": false_hits,
+            "rejections": cache.rejections,
+        })
+    return rows
+
+
+def bench_lookup(entries: int, lookups: int, seed: int):
+    rng = random.Random(seed)
+    vocabulary = " ".join(a for answers in STOCK_ANSWERS.values() for a in answers).split()
+    answers = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(30, 80))) for _ in range(entries)]
+    result = {"embed_us": None}
+    start = time.perf_counter()
+    for answer in answers[:lookups]:
+        embed(words(answer))
+    result["embed_us"] = round((time.perf_counter() - start) / min(lookups, entries) * 1e6, 1)
+    numpy = semantic.np
+    backends = [("numpy", numpy), ("python", None)] if numpy is not None else [("python", None)]
+    for name, module in backends:
+        semantic.np = module
+        cache = SemanticCache(threshold=0.99, max_entries=entries, enabled=True)
+        for i, answer in enumerate(answers):
+            cache.add(str(i), "q", answer, None, MODEL, PROMPT_VERSION, {})
+        for answer in answers[:lookups]:
+            cache.lookup("q", answer, None, MODEL, PROMPT_VERSION)  # packs the NumPy arrays
+        latencies = []
+        for answer in answers[:lookups]:
+            start = time.perf_counter()
+            cache.lookup("q", answer + " um", None, MODEL, PROMPT_VERSION)
+            latencies.append(time.perf_counter() - start)
+        result[name + "_lookup_p50_ms"] = round(percentile(latencies, 50) * 1000, 3)
+        result[name + "_lookup_p99_ms"] = round(percentile(latencies, 99) * 1000, 3)
+    semantic.np = numpy
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", type=int, default=20, help="positive and negative variants per answer")
+    parser.add_argument("--entries", type=int, default=1000, help="cached answers in one scope, for latency")
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--max-edits", type=int, default=semantic.SEMANTIC_MAX_EDITS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    cached, cases = build_cases(args.variants, args.seed)
+    thresholds = [0.7, 0.75, 0.8, 0.85, 0.88, 0.9, 0.92, 0.94, 0.96, 0.98]
+    print(json.dumps({
+        "cases": len(cases),
+        "default_threshold": semantic.SEMANTIC_THRESHOLD,
+        "max_edits": args.max_edits,
+        "thresholds": evaluate_thresholds(cached, cases, thresholds, args.max_edits),
+        "latency": bench_lookup(args.entries, args.lookups, args.seed),
+    }, indent=2))
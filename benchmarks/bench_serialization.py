@@ -0,0 +1,142 @@
+"""
+Benchmark: parse -> validate -> serialize of evaluation responses.
+
+Per completion, what /evaluate spends on CPU after the LLM answers:
+
+- "response_model": the previous path. extract_json() + to_model(), then
+  FastAPI's response_model handling (validate again, jsonable_encoder) and
+  JSONResponse (stdlib json).
+- "fast": validate_json() straight from the text (extract_json() only for
+  unclean output), then JSONBytesResponse (app.responses): serialized once.
+
+The response of /evaluate/batch with --batch results, and the encoders on
+their own (stdlib json, orjson, pydantic-core) so the choices in
+app.responses can be rechecked.
+
+Usage:
+    python -m benchmarks.bench_serialization --evaluations 200 --batch 500
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import responses
+from app.responses import JSONBytesResponse
+from app.schemas import BatchEvaluationResponse, BatchItemResult, EvaluationResponse
+from app.structured import extract_json, to_model, validate_json
+from benchmarks.bench_parsing import evaluation
+
+EVALUATION_FIELD = create_response_field(name="Response_evaluate", type_=EvaluationResponse)
+BATCH_FIELD = create_response_field(name="Response_batch", type_=BatchEvaluationResponse)
+
+
+def parse_legacy(text: str) -> EvaluationResponse:
+    return to_model(extract_json(text).value, EvaluationResponse)
+
+
+def parse_fast(text: str) -> EvaluationResponse:
+    return validate_json(text, EvaluationResponse) or parse_legacy(text)
+
+
+async def respond_legacy(field, content) -> bytes:
+    # What FastAPI does with a returned model when the route has a response_model
+    encoded = await serialize_response(field=field, response_content=content, is_coroutine=True)
+    return JSONResponse(encoded).body
+
+
+async def respond_fast(field, content) -> bytes:
+    return JSONBytesResponse(content).body
+
+
+def per_item_us(fn, items, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return round((time.perf_counter() - start) / (repeat * len(items)) * 1e6, 2)
+
+
+async def respond_all(respond, field, contents, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for content in contents:
+            await respond(field, content)
+    return (time.perf_counter() - start) / (repeat * len(contents)) * 1e6
+
+
+def bench_single(texts, repeat: int, loop) -> dict:
+    report = {}
+    for name, parse, respond in (("response_model", parse_legacy, respond_legacy),
+                                 ("fast", parse_fast, respond_fast)):
+        parse_us = per_item_us(parse, texts, repeat)
+        models = [parse(text) for text in texts]
+        respond_us = loop.run_until_complete(respond_all(respond, EVALUATION_FIELD, models, repeat))
+        report[name] = {
+            "parse_us": parse_us,
+            "respond_us": round(respond_us, 2),
+            "total_us": round(parse_us + respond_us, 2),
+        }
+    report["speedup"] = round(report["response_model"]["total_us"] / report["fast"]["total_us"], 2)
+    return report
+
+
+def bench_batch(texts, size: int, repeat: int, loop) -> dict:
+    """Serializing one batch response of `size` already parsed results"""
+    chunk = (texts * (size // len(texts) + 1))[:size]
+    batch = BatchEvaluationResponse(results=[BatchItemResult(index=i, result=parse_fast(text))
+                                             for i, text in enumerate(chunk)])
+    report = {"results": size}
+    for name, respond in (("response_model", respond_legacy), ("fast", respond_fast)):
+        report[name + "_ms"] = round(loop.run_until_complete(respond_all(respond, BATCH_FIELD, [batch], repeat))
+                                     / 1000, 2)
+    report["speedup"] = round(report["response_model_ms"] / report["fast_ms"], 2)
+    return report
+
+
+def bench_encoders(values, repeat: int) -> dict:
+    models = [EvaluationResponse.model_validate(value) for value in values]
+    report = {
+        "dict_stdlib_json_us": per_item_us(
+            lambda v: json.dumps(v, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), values, repeat),
+        "model_dump_json_us": per_item_us(lambda m: m.model_dump_json().encode("utf-8"), models, repeat),
+    }
+    if responses.orjson is not None:
+        report["dict_orjson_us"] = per_item_us(responses.orjson.dumps, values, repeat)
+        report["model_dump_orjson_us"] = per_item_us(lambda m: responses.orjson.dumps(m.model_dump()), models,
+                                                     repeat)
+    else:
+        report["orjson"] = "not installed"
+    return report
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    values = [evaluation(rng) for _ in range(args.evaluations)]
+    clean = [json.dumps(value) for value in values]
+    fenced = ["```json\n" + json.dumps(value, indent=2) + "\n```" for value in values]
+    loop = asyncio.new_event_loop()
+    try:
+        report = {
+            "single_clean": bench_single(clean, args.repeat, loop),
+            "single_fenced": bench_single(fenced, args.repeat, loop),
+            "batch": bench_batch(clean, args.batch, max(1, args.repeat // 4), loop),
+            "encoders": bench_encoders(values, args.repeat),
+        }
+    finally:
+        loop.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--evaluations", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=500, help="results per batch response")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
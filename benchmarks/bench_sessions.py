@@ -0,0 +1,125 @@
+"""
+Benchmark: interview sessions against stateless /evaluate calls.
+
+Part 1 runs --interviews interviews of --questions answers each through
+app.lambda_main against the mock provider, every interview with its own
+long job description (above GEMINI_CACHE_MIN_TOKENS, so Gemini context
+caching applies):
+
+- "stateless": one /evaluate per answer, resending the job description;
+- "session": POST /sessions once, then /sessions/{id}/answers.
+
+It reports the bytes clients send per interview and the latency of the
+first and of the later answers. Sessions create the context cache when the
+interview starts, so the first answer does not wait for it.
+
+Part 2 fills a SessionStore capped at --max-sessions with 5x that many
+sessions of --questions evaluations each and reports the traced memory as
+it goes: it must level off at the cap.
+
+Usage:
+    python -m benchmarks.bench_sessions --interviews 50 --questions 8 --max-sessions 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+import httpx
+
+PORT = 9160
+JD_LINE = ("Team {n}: own the {n} billing pipeline end to end, from Kafka ingestion to the Postgres ledger; "
+           "lead incident reviews and mentor engineers on distributed systems design.")
+
+
+def job_description(n: int) -> str:
+    # ~5k tokens, distinct per interview
+    return "\n".join(JD_LINE.format(n=f"{n}-{i}") for i in range(400))
+
+
+async def run_interviews(app, mode: str, interviews: int, questions: int):
+    sent = []
+    first, later = [], []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=120) as client:
+        async def post(path, body):
+            content = json.dumps(body).encode()
+            sent[-1] += len(content)
+            start = time.perf_counter()
+            response = await client.post(path, content=content, headers={"content-type": "application/json"})
+            response.raise_for_status()
+            return response, time.perf_counter() - start
+
+        async def interview(n: int):
+            sent.append(0)
+            settings = {"job_description": job_description(f"{mode}{n}"), "model": "gemini-2.5-flash"}
+            if mode == "session":
+                response, _ = await post("/sessions", settings)
+                path = f"/sessions/{response.json()['id']}/answers"
+            for q in range(questions):
+                body = {"question": f"Question {q}", "answer": f"In interview {n} I shipped it and cut costs 30%."}
+                if mode == "stateless":
+                    _, elapsed = await post("/evaluate", dict(settings, **body))
+                else:
+                    _, elapsed = await post(path, body)
+                (first if q == 0 else later).append(elapsed * 1000)
+
+        for n in range(interviews):
+            await interview(n)
+    return {
+        "client_bytes_per_interview": int(statistics.mean(sent)),
+        "first_answer_ms": round(statistics.mean(first), 2),
+        "later_answers_ms": round(statistics.mean(later), 2) if later else None,
+    }
+
+
+def bench_memory(max_sessions: int, questions: int) -> dict:
+    from app.schemas import EvaluationResponse, SessionRequest
+    from app.sessions import SessionStore
+    from benchmarks.mock_provider import CANNED_EVALUATION
+
+    evaluation = EvaluationResponse(**CANNED_EVALUATION)
+    store = SessionStore(max_sessions=max_sessions)
+    report = {}
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    total = max_sessions * 5
+    for n in range(1, total + 1):
+        session = store.create(SessionRequest(job_description=job_description(n)[:2000]), "gemini-2.5-flash")
+        for q in range(questions):
+            session.running.add(session.reserve(), f"Question {q}", evaluation)
+        if n % max_sessions == 0:
+            report[f"{n}_sessions_mb"] = round((tracemalloc.get_traced_memory()[0] - base) / 1e6, 2)
+    tracemalloc.stop()
+    report["stats"] = store.stats()
+    return report
+
+
+def main(args):
+    os.environ.update({
+        "GEMINI_API_BASE": f"http://127.0.0.1:{args.port}",
+        "GEMINI_API_KEY": "mock-gemini",
+        "EVAL_CACHE_SIZE": "0",
+    })
+    from benchmarks import mock_provider
+    from app import lambda_main
+
+    mock_provider.start_in_thread(args.port, args.latency_ms)
+    report = {}
+    for mode in ("stateless", "session"):
+        report[mode] = asyncio.run(run_interviews(lambda_main.app, mode, args.interviews, args.questions))
+    report["memory"] = bench_memory(args.max_sessions, args.questions)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interviews", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=8)
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--port", type=int, default=PORT)
+    main(parser.parse_args())
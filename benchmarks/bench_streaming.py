@@ -0,0 +1,90 @@
+"""
+Benchmark: time-to-first-useful-byte for /evaluate vs /evaluate/stream.
+
+Serves app.lambda_main against the mock provider (which streams its
+completion over the configured latency) and reports, per provider, the time
+until the score is known and until the full result is available.
+
+Usage:
+    python -m benchmarks.bench_streaming --latency-ms 3000 --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks import common
+
+MOCK_PORT = 9103
+APP_PORT = 9104
+PAYLOAD = {
+    "question": "Describe a challenging project you worked on",
+    "answer": "I led the migration of our monolith to microservices; deployment time fell from 2 hours to 15 minutes.",
+    "job_description": "Software Architect",
+}
+
+
+def time_blocking(client, model):
+    start = time.perf_counter()
+    response = client.post("/evaluate", json=dict(PAYLOAD, model=model))
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return {"score_ms": elapsed * 1000, "complete_ms": elapsed * 1000}
+
+
+def time_streaming(client, model):
+    start = time.perf_counter()
+    marks = {}
+    with client.stream("POST", "/evaluate/stream", json=dict(PAYLOAD, model=model)) as response:
+        event = None
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                now = (time.perf_counter() - start) * 1000
+                data = json.loads(line[6:])
+                if event == "field" and data["field"] == "score":
+                    marks["score_ms"] = now
+                elif event == "item":
+                    marks.setdefault("first_item_ms", now)
+                elif event == "result":
+                    marks["complete_ms"] = now
+                elif event == "error":
+                    raise RuntimeError(data["detail"])
+    return marks
+
+
+def main(args):
+    os.environ.update({
+        "GEMINI_API_BASE": f"http://127.0.0.1:{args.mock_port}",
+        "ANTHROPIC_API_BASE": f"http://127.0.0.1:{args.mock_port}",
+        "GEMINI_API_KEY": "mock",
+        "ANTHROPIC_API_KEY": "mock",
+    })
+    from benchmarks import mock_provider
+    from app import lambda_main
+
+    mock_provider.start_in_thread(args.mock_port, args.latency_ms)
+    common.serve_in_thread(lambda_main.app, args.app_port)
+
+    report = {}
+    with httpx.Client(base_url=f"http://127.0.0.1:{args.app_port}", timeout=120) as client:
+        for model in ("gemini-2.5-flash", "claude-3-5-sonnet-20241022"):
+            for name, run in (("blocking", time_blocking), ("streaming", time_streaming)):
+                samples = [run(client, model) for _ in range(args.runs)]
+                report.setdefault(model, {})[name] = {
+                    key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]
+                }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=3000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--mock-port", type=int, default=MOCK_PORT)
+    parser.add_argument("--app-port", type=int, default=APP_PORT)
+    main(parser.parse_args())
@@ -0,0 +1,62 @@
+"""
+Benchmark: fresh httpx client per call vs the shared pooled transport.
+
+Starts the mock provider locally and drives Gemini-shaped requests through
+both patterns, printing requests/sec and latency percentiles. On loopback
+there is no TLS, so real-world savings (TCP + TLS to Google/Anthropic) are
+larger than what this shows.
+
+Usage:
+    python -m benchmarks.bench_transport --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+
+import httpx
+
+from benchmarks import common, mock_provider
+
+PATH = "/v1beta/models/gemini-2.5-flash:generateContent?key=bench"
+PAYLOAD = {
+    "contents": [{"parts": [{"text": "Evaluate: Tell me about yourself"}]}],
+    "generationConfig": {"temperature": 0.1, "maxOutputTokens": 1024},
+}
+
+
+async def main(args):
+    mock_provider.start_in_thread(args.port, args.latency_ms)
+    base_url = f"http://127.0.0.1:{args.port}"
+    os.environ["GEMINI_API_BASE"] = base_url
+
+    from app import transport
+    transport.PROVIDER_BASE_URLS["gemini"] = base_url
+
+    async def fresh_client_call():
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            response = await client.post(base_url + PATH, json=PAYLOAD)
+            response.raise_for_status()
+            response.json()
+
+    async def pooled_call():
+        response = await transport.get_client("gemini").post(PATH, json=PAYLOAD)
+        response.raise_for_status()
+        response.json()
+
+    results = {}
+    for name, call in (("fresh_client", fresh_client_call), ("pooled", pooled_call)):
+        await call()  # warm up
+        results[name] = await common.run_closed_loop(call, args.requests, args.concurrency)
+    await transport.shutdown()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=9100)
+    asyncio.run(main(parser.parse_args()))
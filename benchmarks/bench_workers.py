@@ -0,0 +1,170 @@
+"""
+Load test: throughput of `python -m app.server` by worker count.
+
+Starts the mock provider and then, for each worker count, the production
+server pointed at it. Several client processes drive closed-loop load for
+--duration seconds, and the script reports total requests/s and latency.
+Afterwards it checks graceful shutdown: a request still in flight when the
+server gets SIGTERM must complete with 200.
+
+Serves app.main when litellm is installed, app.lambda_main otherwise.
+
+Usage:
+    python -m benchmarks.bench_workers --workers 1 2 4 --clients 4 --duration 10
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from benchmarks import common
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_PORT = 9108
+DRAIN_MOCK_PORT = 9109
+APP_PORT = 9110
+
+
+def start(args, env=None):
+    return subprocess.Popen([sys.executable, "-m"] + args, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_healthy(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url + "/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(url + " did not become healthy")
+
+
+def client_process(url: str, duration: float, concurrency: int, seed: int, queue):
+    async def run():
+        latencies = []
+        deadline = time.perf_counter() + duration
+        async with httpx.AsyncClient(base_url=url, timeout=60,
+                                     limits=httpx.Limits(max_connections=concurrency)) as client:
+            async def worker(w):
+                i = 0
+                while time.perf_counter() < deadline:
+                    i += 1
+                    start_time = time.perf_counter()
+                    response = await client.post("/evaluate", json={
+                        "question": f"Question {seed}-{w}-{i}",
+                        "answer": "I designed the caching layer and cut p95 latency by half.",
+                        "job_description": "Backend Engineer",
+                    })
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start_time)
+
+            await asyncio.gather(*(worker(w) for w in range(concurrency)))
+        return latencies
+
+    queue.put(asyncio.run(run()))
+
+
+def measure(url: str, clients: int, duration: float, concurrency: int):
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=client_process, args=(url, duration, concurrency, n, queue))
+                 for n in range(clients)]
+    start_time = time.perf_counter()
+    for process in processes:
+        process.start()
+    latencies = []
+    for _ in processes:
+        latencies += queue.get()
+    for process in processes:
+        process.join()
+    return common.summarize(latencies, time.perf_counter() - start_time)
+
+
+def drain_check(app_module: str, env: dict):
+    """SIGTERM while a slow request is in flight; the request must still succeed"""
+    mock = start(["benchmarks.mock_provider", "--port", str(DRAIN_MOCK_PORT), "--latency-ms", "1500"])
+    env = dict(env, GEMINI_API_BASE=f"http://127.0.0.1:{DRAIN_MOCK_PORT}",
+               ANTHROPIC_API_BASE=f"http://127.0.0.1:{DRAIN_MOCK_PORT}")
+    server = start(["app.server", "--app", app_module, "--workers", "2", "--port", str(APP_PORT),
+                    "--graceful-timeout", "10"], env)
+    url = f"http://127.0.0.1:{APP_PORT}"
+    try:
+        wait_healthy(f"http://127.0.0.1:{DRAIN_MOCK_PORT}")
+        wait_healthy(url)
+        result = {}
+
+        def slow_request():
+            try:
+                response = httpx.post(url + "/evaluate", json={"question": "drain", "answer": "check"}, timeout=30)
+                result["status"] = response.status_code
+            except httpx.HTTPError as e:
+                result["status"] = repr(e)
+
+        thread = threading.Thread(target=slow_request)
+        thread.start()
+        time.sleep(0.5)
+        server.send_signal(signal.SIGTERM)
+        thread.join()
+        server.wait(timeout=30)
+        return {"in_flight_status": result.get("status"), "server_exit_code": server.returncode}
+    finally:
+        for process in (server, mock):
+            if process.poll() is None:
+                process.kill()
+
+
+def main(args):
+    app_module = args.app or ("app.main:app" if importlib.util.find_spec("litellm") else "app.lambda_main:app")
+    env = dict(os.environ,
+               GEMINI_API_BASE=f"http://127.0.0.1:{MOCK_PORT}",
+               ANTHROPIC_API_BASE=f"http://127.0.0.1:{MOCK_PORT}",
+               GEMINI_API_KEY="mock-gemini",
+               ANTHROPIC_API_KEY="mock-anthropic",
+               MODEL="gemini-2.5-flash",
+               EVAL_CACHE_SIZE="0",
+               LOG_LEVEL="warning")
+    mock = start(["benchmarks.mock_provider", "--port", str(MOCK_PORT), "--latency-ms", str(args.latency_ms)])
+    report = {"app": app_module, "cpus": os.cpu_count(), "throughput": {}}
+    try:
+        wait_healthy(f"http://127.0.0.1:{MOCK_PORT}")
+        for workers in args.workers:
+            server = start(["app.server", "--app", app_module, "--workers", str(workers),
+                            "--port", str(APP_PORT)], env)
+            url = f"http://127.0.0.1:{APP_PORT}"
+            try:
+                wait_healthy(url)
+                summary = measure(url, args.clients, args.duration, args.concurrency)
+                response = httpx.get(url + "/stats/workers", timeout=5)
+                if response.status_code == 200:
+                    summary["workers_reporting"] = response.json()["workers"]
+                report["throughput"][str(workers)] = summary
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=60)
+        report["graceful_shutdown"] = drain_check(app_module, env)
+    finally:
+        mock.kill()
+    print(json.dumps(report, indent=2))
+    return 0 if report["graceful_shutdown"]["in_flight_status"] == 200 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", help="ASGI app to serve (default: app.main:app if litellm is installed)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="in-flight requests per client process")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50, help="mock provider latency")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""
+Verify prompt-cache request shapes and measure cached-token savings.
+
+Runs several evaluations that share one job description through
+app.lambda_main (raw HTTP) and, when litellm is installed, app.main against
+the mock provider. The mock rejects malformed bodies and simulates provider
+caching, so the usage stats show how much of the input was served from cache.
+
+Usage:
+    python -m benchmarks.check_prompt_cache
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+
+PORT = 9102
+
+
+def run_app(module_name, models, job_description):
+    import importlib
+    from fastapi.testclient import TestClient
+
+    module = importlib.import_module(module_name)
+    with TestClient(module.app) as client:
+        for model in models:
+            for question in ("Tell me about yourself", "Why this role?", "Describe a hard bug you fixed"):
+                response = client.post("/evaluate", json={
+                    "question": question,
+                    "answer": "I led a team of four engineers and cut p99 latency by 40%.",
+                    "job_description": job_description,
+                    "model": model,
+                })
+                if response.status_code != 200:
+                    raise SystemExit(f"{module_name} {model}: {response.status_code} {response.text}")
+        return client.get("/stats").json()
+
+
+def check_shapes(recorded):
+    problems = []
+    for provider, body in recorded:
+        if provider == "anthropic":
+            system = body.get("system")
+            if not isinstance(system, list) or "cache_control" not in system[-1]:
+                problems.append("anthropic: system prompt is not a cache-marked block")
+            content = body["messages"][0]["content"]
+            if not isinstance(content, list) or "cache_control" not in content[0]:
+                problems.append("anthropic: job description is not a cache-marked leading block")
+        else:
+            if "cachedContent" not in body and "systemInstruction" not in body:
+                problems.append("gemini: system prompt sent neither as systemInstruction nor cachedContent")
+    return problems
+
+
+def main(args):
+    from benchmarks import mock_provider
+
+    os.environ.update({
+        "GEMINI_API_BASE": f"http://127.0.0.1:{args.port}",
+        "ANTHROPIC_API_BASE": f"http://127.0.0.1:{args.port}",
+        "GEMINI_API_KEY": "mock-gemini",
+        "ANTHROPIC_API_KEY": "mock-anthropic",
+        "GEMINI_CACHE_MIN_TOKENS": str(args.gemini_min_tokens),
+        "EVAL_CACHE_SIZE": "0",
+    })
+    mock_provider.start_in_thread(args.port)
+    job_description = "Senior Backend Engineer. " + "Own distributed services, mentor engineers, drive reliability. " * 60
+
+    report = {}
+    modules = ["app.lambda_main"]
+    if importlib.util.find_spec("litellm"):
+        modules.append("app.main")
+    else:
+        report["app.main"] = "skipped (litellm not installed)"
+
+    problems = []
+    for module_name in modules:
+        mock_provider.app.state.recorded.clear()
+        mock_provider.app.state.seen_prefixes.clear()
+        stats = run_app(module_name, ["gemini/gemini-2.5-flash", "claude-3-5-sonnet-20241022"], job_description)
+        report[module_name] = {"usage": stats.get("usage"), "gemini_context_cache": stats.get("gemini_context_cache")}
+        if module_name == "app.lambda_main":
+            problems += check_shapes(list(mock_provider.app.state.recorded))
+
+    report["shape_problems"] = problems
+    print(json.dumps(report, indent=2))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--gemini-min-tokens", type=int, default=512,
+                        help="explicit Gemini cache threshold used for the check")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,97 @@
+"""
+Check the retry scheduler against a mock provider that injects 429s.
+
+Sends a burst of concurrent evaluations through app.lambda_main while the
+mock throttles a fraction of calls, once with retries disabled and once with
+the default scheduler, and reports success rates, retries and queue waits.
+Finally it forces every call to fail and checks that the client gets a 429
+with Retry-After rather than a 500.
+
+Usage:
+    python -m benchmarks.check_rate_limits --requests 200 --error-rate 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+
+PORT = 9105
+
+
+async def burst(app, requests: int, concurrency: int):
+    statuses = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=120) as client:
+        async def one(i):
+            async with semaphore:
+                response = await client.post("/evaluate", json={
+                    "question": f"Question {i}",
+                    "answer": "I shipped the feature two weeks early and cut support tickets by 30%.",
+                    "model": "gemini-2.5-flash" if i % 2 else "claude-3-5-sonnet-20241022",
+                })
+                statuses.append(response.status_code)
+
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    return {"ok": statuses.count(200), "throttled": statuses.count(429), "failed": sum(s >= 500 for s in statuses)}
+
+
+async def exhausted(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=120) as client:
+        response = await client.post("/evaluate", json={"question": "q", "answer": "a", "model": "gemini-2.5-flash"})
+    return response.status_code, response.headers.get("retry-after")
+
+
+def main(args):
+    os.environ.update({
+        "GEMINI_API_BASE": f"http://127.0.0.1:{args.port}",
+        "ANTHROPIC_API_BASE": f"http://127.0.0.1:{args.port}",
+        "GEMINI_API_KEY": "mock-gemini",
+        "ANTHROPIC_API_KEY": "mock-anthropic",
+    })
+    from benchmarks import mock_provider
+    from app import lambda_main
+    from app.ratelimit import RateLimitScheduler
+
+    mock = mock_provider.app.state
+    mock_provider.start_in_thread(args.port, args.latency_ms, error_rate=args.error_rate)
+    mock.retry_after = str(args.retry_after)
+
+    report = {}
+    for name, scheduler in (("no_retries", RateLimitScheduler(max_attempts=1)),
+                            ("scheduler", RateLimitScheduler.from_env())):
+        lambda_main.engine.scheduler = scheduler
+        mock.injected_errors = 0
+        outcome = asyncio.run(burst(lambda_main.app, args.requests, args.concurrency))
+        report[name] = dict(outcome, injected_429s=mock.injected_errors, scheduler=scheduler.stats())
+
+    # Every attempt throttled: the client should see 429 + Retry-After
+    mock.error_rate, mock.fail_next = 0, 100
+    status, retry_after = asyncio.run(exhausted(lambda_main.app))
+    mock.fail_next = 0
+    report["exhausted"] = {"status": status, "retry_after": retry_after}
+
+    problems = []
+    if report["scheduler"]["ok"] <= report["no_retries"]["ok"] and report["no_retries"]["ok"] < args.requests:
+        problems.append("retries did not recover any throttled request")
+    if status != 429 or retry_after is None:
+        problems.append("exhausted retries were not surfaced as 429 with Retry-After")
+    report["problems"] = problems
+    print(json.dumps(report, indent=2))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After sent with injected 429s")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=PORT)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,69 @@
+"""Small helpers shared by the benchmark scripts"""
+import ast
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def run_closed_loop(call: Callable[[], Awaitable[None]], requests: int, concurrency: int) -> Dict[str, float]:
+    """Issue `requests` calls with at most `concurrency` in flight and summarize latency"""
+    latencies: List[float] = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def serve_in_thread(app, port: int):
+    """Run an ASGI app on 127.0.0.1:<port> in a daemon thread and wait until it is up"""
+    import uvicorn
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("server on port " + str(port) + " did not start")
+        time.sleep(0.01)
+    return server
+
+
+def load_test_cases() -> List[Dict[str, Any]]:
+    """TEST_CASES from test_api.py, read without importing it (it needs `requests`)"""
+    with open(os.path.join(ROOT, "test_api.py")) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "TEST_CASES" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise RuntimeError("TEST_CASES not found in test_api.py")
@@ -0,0 +1,242 @@
+"""
+Offline load test: app.main (litellm backend) and app.lambda_main (http
+backend) at a target QPS.
+
+Starts the mock provider replaying recorded completions (see
+benchmarks/record_responses.py) with their recorded latency distribution,
+then serves each app with `python -m app.server` pointed at it. Requests
+built from test_api.py's TEST_CASES are sent open-loop: on a fixed
+(or Poisson) schedule at --qps, whether or not earlier ones have finished,
+and latency is measured from the scheduled send time so a stalled server
+cannot hide its queueing delay.
+
+One JSON line per app is appended to --output, with throughput, p50/p95/p99
+latency, error rate and the server's peak memory. --max-p95-ms and
+--max-error-rate turn regressions into a non-zero exit code for CI.
+
+Usage:
+    python -m benchmarks.loadgen --app both --qps 20 --duration 30 --output bench-results.jsonl
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import ROOT, load_test_cases, percentile
+from benchmarks.bench_workers import start, wait_healthy
+
+MOCK_PORT = 9120
+APP_PORT = 9121
+APPS = {"main": "app.main:app", "lambda": "app.lambda_main:app"}
+DEFAULT_RECORDINGS = os.path.join("benchmarks", "recordings", "sample.jsonl")
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of `pid` and its children (worker processes), Linux only"""
+    parents: Dict[int, int] = {}
+    rss: Dict[int, int] = {}
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/statm") as f:
+                rss[int(entry)] = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    if pid not in rss:
+        return None
+    tree, frontier = {pid}, [pid]
+    while frontier:
+        parent = frontier.pop()
+        children = [child for child, ppid in parents.items() if ppid == parent and child not in tree]
+        tree.update(children)
+        frontier += children
+    return round(sum(rss.get(p, 0) for p in tree) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+
+
+async def sample_memory(pid: int, samples: List[float], interval: float = 0.5):
+    while True:
+        value = rss_mb(pid)
+        if value is not None:
+            samples.append(value)
+        await asyncio.sleep(interval)
+
+
+async def drive(url: str, qps: float, duration: float, arrival: str, seed: int, timeout: float) -> dict:
+    """Open-loop load: send on schedule, wait for everything, summarize"""
+    cases = load_test_cases()
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    loop = asyncio.get_running_loop()
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout,
+                                 limits=httpx.Limits(max_connections=None, max_keepalive_connections=100)) as client:
+        async def send(n: int, scheduled: float):
+            # Unique questions, so no evaluation cache hits or coalescing
+            payload = dict(cases[n % len(cases)])
+            payload["question"] += f" (#{n})"
+            try:
+                response = await client.post("/evaluate", json=payload)
+                outcome = "ok" if response.status_code == 200 else str(response.status_code)
+            except httpx.TimeoutException:
+                outcome = "timeout"
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            if outcome == "ok":
+                latencies.append(loop.time() - scheduled)
+            else:
+                errors[outcome] = errors.get(outcome, 0) + 1
+
+        tasks = []
+        start_time = loop.time()
+        offset = 0.0
+        while True:
+            offset += rng.expovariate(qps) if arrival == "poisson" else 1 / qps
+            if offset >= duration:
+                break
+            scheduled = start_time + offset
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(send(len(tasks), scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - start_time
+
+    sent = len(tasks)
+    return {
+        "requests": sent,
+        "ok": len(latencies),
+        "errors": errors,
+        "error_rate": round(sum(errors.values()) / sent, 4) if sent else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0) * 1000, 1),
+    }
+
+
+async def measure(url: str, pid: int, args) -> dict:
+    samples: List[float] = []
+    sampler = asyncio.ensure_future(sample_memory(pid, samples))
+    try:
+        # Warm up connections, provider clients and the lazy SDK import
+        async with httpx.AsyncClient(base_url=url, timeout=args.timeout) as client:
+            for case in load_test_cases()[:3]:
+                await client.post("/evaluate", json=case)
+        rss_start = rss_mb(pid)
+        result = await drive(url, args.qps, args.duration, args.arrival, args.seed, args.timeout)
+    finally:
+        sampler.cancel()
+    result["rss_start_mb"] = rss_start
+    result["rss_peak_mb"] = max(samples, default=None)
+    result["rss_end_mb"] = rss_mb(pid)
+    return result
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return os.getenv("GITHUB_SHA")
+
+
+def check(entry: dict, args) -> List[str]:
+    failures = []
+    if args.max_p95_ms is not None and entry["p95_ms"] > args.max_p95_ms:
+        failures.append(f"{entry['app']}: p95 {entry['p95_ms']} ms > {args.max_p95_ms} ms")
+    if args.max_error_rate is not None and entry["error_rate"] > args.max_error_rate:
+        failures.append(f"{entry['app']}: error rate {entry['error_rate']} > {args.max_error_rate}")
+    return failures
+
+
+def main(args) -> int:
+    names = list(APPS) if args.app == "both" else [args.app]
+    if "main" in names and not importlib.util.find_spec("litellm"):
+        print("litellm is not installed: skipping app.main", file=sys.stderr)
+        names.remove("main")
+
+    mock = start(["benchmarks.mock_provider", "--port", str(MOCK_PORT), "--recordings", args.recordings,
+                  "--latency-dist", args.latency_dist, "--latency-ms", str(args.latency_ms),
+                  "--latency-scale", str(args.latency_scale), "--error-rate", str(args.error_rate),
+                  "--seed", str(args.seed)])
+    env = dict(os.environ,
+               GEMINI_API_BASE=f"http://127.0.0.1:{MOCK_PORT}",
+               ANTHROPIC_API_BASE=f"http://127.0.0.1:{MOCK_PORT}",
+               GEMINI_API_KEY="mock-gemini",
+               ANTHROPIC_API_KEY="mock-anthropic",
+               MODEL=args.model,
+               EVAL_CACHE_SIZE="0",
+               LOG_LEVEL="warning")
+    failures = []
+    try:
+        wait_healthy(f"http://127.0.0.1:{MOCK_PORT}")
+        for name in names:
+            server = start(["app.server", "--app", APPS[name], "--workers", str(args.workers),
+                            "--port", str(APP_PORT)], env)
+            url = f"http://127.0.0.1:{APP_PORT}"
+            try:
+                wait_healthy(url)
+                result = asyncio.run(measure(url, server.pid, args))
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+            entry = {
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "revision": git_revision(),
+                "app": name,
+                "model": args.model,
+                "workers": args.workers,
+                "qps": args.qps,
+                "duration_s": args.duration,
+                "arrival": args.arrival,
+                "mock": {"recordings": args.recordings, "latency_dist": args.latency_dist,
+                         "latency_scale": args.latency_scale, "error_rate": args.error_rate},
+                "python": platform.python_version(),
+                **result,
+            }
+            # Appended, never rewritten: the file is a history of runs
+            with open(args.output, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            print(json.dumps(entry))
+            failures += check(entry, args)
+    finally:
+        mock.kill()
+    for failure in failures:
+        print("REGRESSION " + failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=["main", "lambda", "both"], default="both")
+    parser.add_argument("--qps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load per app")
+    parser.add_argument("--arrival", choices=["uniform", "poisson"], default="poisson")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--model", default="gemini/gemini-2.5-flash")
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS)
+    parser.add_argument("--latency-dist", choices=["constant", "lognormal", "replay"], default="replay")
+    parser.add_argument("--latency-ms", type=float, default=1000, help="for constant/lognormal latency")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier on replayed latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="injected provider 429s")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench-results.jsonl")
+    parser.add_argument("--max-p95-ms", type=float)
+    parser.add_argument("--max-error-rate", type=float)
+    sys.exit(main(parser.parse_args()))
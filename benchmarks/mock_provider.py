@@ -0,0 +1,481 @@
+"""
+Local mock of the Gemini and Anthropic HTTP APIs for offline benchmarks.
+
+Serves canned evaluation JSON on the same paths the app calls, after an
+artificial delay, so the app can be pointed at it with
+GEMINI_API_BASE / ANTHROPIC_API_BASE. Request bodies are validated against
+the provider shapes the app relies on (400 on mismatch), and prompt caching
+is simulated so usage blocks report cached tokens like the real APIs.
+With --recordings it replays recorded completions (see
+benchmarks/record_responses.py), chosen by a hash of the prompt, with
+their recorded latencies or a constant/lognormal latency distribution.
+Native JSON modes are honoured: a forced Claude tool call is answered with
+a tool_use block (input_json_delta when streaming), and Gemini's
+responseSchema is checked.
+Provider throttling can be injected (MOCK_ERROR_RATE / app.state.fail_next)
+to exercise the retry scheduler, a latency tail (MOCK_SLOW_RATE /
+MOCK_SLOW_MS) to exercise hedging, and run-to-run score noise
+(MOCK_SCORE_JITTER) to exercise ensembles.
+
+Usage:
+    python -m benchmarks.mock_provider --port 9000 --latency-ms 50
+    python -m benchmarks.mock_provider --recordings benchmarks/recordings/sample.jsonl --latency-dist replay
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import uuid
+import zlib
+from collections import deque
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.common import serve_in_thread
+
+LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "0"))
+# Extra latency proportional to prompt + completion size, to model real providers
+MS_PER_1K_TOKENS = float(os.getenv("MOCK_MS_PER_1K_TOKENS", "0"))
+# "constant" (latency-ms), "lognormal" (median latency-ms, spread latency-sigma)
+# or "replay" (each recording's own latency_ms, times latency-scale)
+LATENCY_DIST = os.getenv("MOCK_LATENCY_DIST", "constant")
+LATENCY_SIGMA = float(os.getenv("MOCK_LATENCY_SIGMA", "0.5"))
+LATENCY_SCALE = float(os.getenv("MOCK_LATENCY_SCALE", "1"))
+# JSONL of recorded completions to replay instead of the canned evaluation
+RECORDINGS = os.getenv("MOCK_RECORDINGS", "")
+# Fraction of generate calls answered with MOCK_ERROR_STATUS (429 by default)
+ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+ERROR_STATUS = int(os.getenv("MOCK_ERROR_STATUS", "429"))
+RETRY_AFTER = os.getenv("MOCK_RETRY_AFTER", "")
+# Latency tail: this fraction of calls takes MOCK_SLOW_MS extra
+SLOW_RATE = float(os.getenv("MOCK_SLOW_RATE", "0"))
+SLOW_MS = float(os.getenv("MOCK_SLOW_MS", "0"))
+# Per-model overrides of latency-ms and ms-per-1k-tokens: "model=ms:ms_per_1k,..."
+MODEL_LATENCY = os.getenv("MOCK_MODEL_LATENCY", "")
+# Standard deviation, in points, of gaussian noise on the canned score and criteria
+SCORE_JITTER = float(os.getenv("MOCK_SCORE_JITTER", "0"))
+
+CANNED_EVALUATION = {
+    "score": 78,
+    "criteria_breakdown": {"relevance": 22, "clarity": 16, "depth": 18, "impact": 11, "job_alignment": 11},
+    "summary": "Relevant answer with concrete results; could go deeper on personal contribution.",
+    "strengths": ["Quantified impact", "Clear structure"],
+    "weaknesses": ["Limited detail on own role"],
+    "improvement_suggestions": ["Use the STAR format to highlight personal ownership"],
+}
+
+app = FastAPI(title="Mock LLM Provider")
+app.state.latency_ms = LATENCY_MS
+app.state.ms_per_1k_tokens = MS_PER_1K_TOKENS
+app.state.requests = 0
+app.state.recorded = deque(maxlen=100)  # last request bodies, for shape checks
+app.state.seen_prefixes = set()  # simulated provider prompt cache
+app.state.gemini_caches = {}
+app.state.error_rate = ERROR_RATE
+app.state.error_status = ERROR_STATUS
+app.state.retry_after = RETRY_AFTER  # seconds, sent as Retry-After when set
+app.state.fail_next = 0  # fail exactly this many upcoming calls
+app.state.injected_errors = 0
+app.state.slow_rate = SLOW_RATE
+app.state.slow_ms = SLOW_MS
+app.state.score_jitter = SCORE_JITTER
+app.state.random = random.Random(0)
+app.state.echo_key = False  # put the caller's API key into the summary
+app.state.latency_dist = LATENCY_DIST
+app.state.latency_sigma = LATENCY_SIGMA
+app.state.latency_scale = LATENCY_SCALE
+app.state.recordings = []
+app.state.recorded_latency = {}  # completion text -> recorded latency_ms
+
+
+def parse_model_latency(spec: str) -> dict:
+    """ "gemini-2.5-flash=400:300,..." -> {"gemini-2.5-flash": (400.0, 300.0), ...}"""
+    latencies = {}
+    for pair in spec.split(","):
+        if "=" in pair:
+            model, values = pair.split("=", 1)
+            ms, _, per_1k = values.partition(":")
+            latencies[model.strip().rpartition("/")[2]] = (float(ms), float(per_1k or 0))
+    return latencies
+
+
+app.state.model_latency = parse_model_latency(MODEL_LATENCY)
+
+
+def load_recordings(path: str):
+    """Replay the completions in a JSONL file ({"completion": ..., "latency_ms": ...} per line)"""
+    recordings = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                recordings.append(json.loads(line))
+    app.state.recordings = [r["completion"] for r in recordings]
+    app.state.recorded_latency = {}
+    for r in recordings:
+        # Keyed by the text actually sent, which is the bare object in JSON modes
+        for text in (r["completion"], _as_json(r["completion"])):
+            app.state.recorded_latency.setdefault(text, r.get("latency_ms", 0.0))
+
+
+def _jittered(evaluation: dict) -> dict:
+    """The evaluation as another sample of the same model might score it"""
+    noise = app.state.random.gauss
+    jitter = app.state.score_jitter
+    criteria = {name: max(0, round(value + noise(0, jitter / 2)))
+                for name, value in evaluation["criteria_breakdown"].items()}
+    score = min(100, max(0, round(evaluation["score"] + noise(0, jitter))))
+    return dict(evaluation, score=score, criteria_breakdown=criteria)
+
+
+def _completion_for(body: dict, api_key: str = "") -> str:
+    """Canned evaluation, or a JSON array of them for packed (batch mode) prompts"""
+    evaluation = CANNED_EVALUATION
+    if app.state.score_jitter:
+        evaluation = _jittered(evaluation)
+    if app.state.echo_key:
+        # Lets a caller verify which credentials its request was sent with
+        evaluation = dict(evaluation, summary="key:" + api_key)
+    prompt = json.dumps(body)
+    if "Batch mode" in prompt:
+        items = len(re.findall(r"Item \d+:", prompt))
+        return json.dumps([dict(evaluation, item=n) for n in range(1, items + 1)])
+    if app.state.recordings and not app.state.echo_key:
+        # The same prompt always gets the same recording
+        return app.state.recordings[zlib.crc32(prompt.encode()) % len(app.state.recordings)]
+    return json.dumps(evaluation)
+
+
+def _as_json(completion: str) -> str:
+    """What a native JSON mode returns: just the object, without fences or prose"""
+    try:
+        value, _ = json.JSONDecoder().raw_decode(completion, completion.find("{"))
+    except ValueError:
+        value = CANNED_EVALUATION  # a recording the JSON mode would not have produced
+    return json.dumps(value)
+
+
+def _delay_ms(body: dict, completion: str, model: str = "") -> float:
+    delay_ms, ms_per_1k_tokens = app.state.model_latency.get(
+        model.rpartition("/")[2], (app.state.latency_ms, app.state.ms_per_1k_tokens))
+    if app.state.latency_dist == "lognormal":
+        delay_ms *= math.exp(app.state.latency_sigma * app.state.random.gauss(0, 1))
+    elif app.state.latency_dist == "replay":
+        delay_ms = app.state.recorded_latency.get(completion, delay_ms) * app.state.latency_scale
+    if ms_per_1k_tokens:
+        tokens = (len(json.dumps(body)) + len(completion)) / 4
+        delay_ms += ms_per_1k_tokens * tokens / 1000
+    if app.state.slow_rate and app.state.random.random() < app.state.slow_rate:
+        delay_ms += app.state.slow_ms
+    return delay_ms
+
+
+async def _simulate_latency(body: dict, completion: str, model: str = ""):
+    app.state.requests += 1
+    delay_ms = _delay_ms(body, completion, model)
+    if delay_ms:
+        await asyncio.sleep(delay_ms / 1000)
+
+
+async def _stream_chunks(body: dict, completion: str, chunk_chars: int = 16):
+    """Yield completion pieces: ~10% of the delay before the first token, the rest spread out"""
+    app.state.requests += 1
+    delay_s = _delay_ms(body, completion) / 1000
+    pieces = [completion[i:i + chunk_chars] for i in range(0, len(completion), chunk_chars)]
+    await asyncio.sleep(delay_s * 0.1)
+    for piece in pieces:
+        yield piece
+        await asyncio.sleep(delay_s * 0.9 / len(pieces))
+
+
+def _tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def _error(status: int, message: str) -> JSONResponse:
+    return JSONResponse(status_code=status, content={"error": {"code": status, "message": message}})
+
+
+def _injected_error():
+    """A throttling/overload response when fault injection says so, else None"""
+    if app.state.fail_next > 0:
+        app.state.fail_next -= 1
+    elif not app.state.error_rate or app.state.random.random() >= app.state.error_rate:
+        return None
+    app.state.injected_errors += 1
+    response = _error(app.state.error_status, "injected: rate limit exceeded")
+    if app.state.retry_after:
+        response.headers["retry-after"] = str(app.state.retry_after)
+    return response
+
+
+def _check_parts(parts) -> str:
+    """Validate a Gemini parts list and return its concatenated text"""
+    if not isinstance(parts, list) or not parts:
+        raise ValueError("parts must be a non-empty list")
+    for part in parts:
+        if not isinstance(part, dict) or not isinstance(part.get("text"), str):
+            raise ValueError("every part needs a text field")
+    return "".join(part["text"] for part in parts)
+
+
+def _check_gemini_json_mode(config: dict):
+    if "responseSchema" in config and config.get("responseMimeType") != "application/json":
+        raise ValueError("responseSchema requires responseMimeType application/json")
+
+    def check(schema):
+        if schema.get("type") not in ("OBJECT", "ARRAY", "STRING", "INTEGER", "NUMBER", "BOOLEAN"):
+            raise ValueError("invalid schema type: " + str(schema.get("type")))
+        for prop in schema.get("properties", {}).values():
+            check(prop)
+        if "items" in schema:
+            check(schema["items"])
+
+    if "responseSchema" in config:
+        check(config["responseSchema"])
+
+
+def _check_anthropic_tools(body: dict) -> str:
+    """Validate tools/tool_choice; returns the name of the forced tool, if any"""
+    names = [tool["name"] for tool in body.get("tools", [])]
+    for tool in body.get("tools", []):
+        if tool.get("input_schema", {}).get("type") != "object":
+            raise ValueError("tool input_schema must be an object schema")
+    choice = body.get("tool_choice")
+    if choice is None:
+        return ""
+    if choice.get("type") != "tool" or choice.get("name") not in names:
+        raise ValueError("tool_choice must name one of the tools")
+    return choice["name"]
+
+
+def _check_anthropic_blocks(blocks) -> list:
+    if isinstance(blocks, str):
+        return [{"type": "text", "text": blocks}]
+    if not isinstance(blocks, list):
+        raise ValueError("content must be a string or a list of blocks")
+    for block in blocks:
+        if block.get("type") != "text" or not isinstance(block.get("text"), str):
+            raise ValueError("only text blocks are supported")
+        if "cache_control" in block and block["cache_control"] != {"type": "ephemeral"}:
+            raise ValueError("cache_control must be {'type': 'ephemeral'}")
+    return blocks
+
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy", "requests": app.state.requests}
+
+
+@app.post("/v1beta/cachedContents")
+async def gemini_create_cache(request: Request):
+    body = await request.json()
+    try:
+        if not str(body.get("model", "")).startswith("models/"):
+            raise ValueError("model must look like models/<name>")
+        text = _check_parts(body["systemInstruction"]["parts"]) if "systemInstruction" in body else ""
+        for content in body.get("contents", []):
+            text += _check_parts(content.get("parts"))
+    except (ValueError, KeyError, TypeError) as e:
+        return _error(400, str(e))
+    # Creating a cache is a provider round trip like any other
+    if app.state.latency_ms:
+        await asyncio.sleep(app.state.latency_ms / 1000)
+    name = "cachedContents/" + uuid.uuid4().hex[:12]
+    app.state.gemini_caches[name] = {"model": body["model"], "tokens": _tokens(text)}
+    return {"name": name, "model": body["model"], "usageMetadata": {"totalTokenCount": _tokens(text)}}
+
+
+@app.post("/v1beta/models/{model_action}")
+async def gemini_generate(model_action: str, request: Request):
+    body = await request.json()
+    app.state.recorded.append(("gemini", body))
+    api_key = request.headers.get("x-goog-api-key") or request.query_params.get("key")
+    if not api_key:
+        return _error(403, "missing API key (x-goog-api-key header or key parameter)")
+    injected = _injected_error()
+    if injected is not None:
+        return injected
+    model = "models/" + model_action.split(":")[0]
+    try:
+        if "cachedContent" in body and "systemInstruction" in body:
+            raise ValueError("systemInstruction cannot be combined with cachedContent")
+        if not isinstance(body.get("contents"), list) or not body["contents"]:
+            raise ValueError("contents must be a non-empty list")
+        texts = [_check_parts(content.get("parts")) for content in body["contents"]]
+        system = _check_parts(body["systemInstruction"]["parts"]) if "systemInstruction" in body else ""
+        _check_gemini_json_mode(body.get("generationConfig", {}))
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return _error(400, str(e))
+
+    cached_tokens = 0
+    prompt_tokens = _tokens(system + "".join(texts))
+    if "cachedContent" in body:
+        cache = app.state.gemini_caches.get(body["cachedContent"])
+        if cache is None or cache["model"] != model:
+            return _error(404, "cached content not found for this model")
+        cached_tokens = cache["tokens"]
+        prompt_tokens += cached_tokens
+    else:
+        # Implicit caching: system instruction + first part repeated verbatim
+        first_parts = body["contents"][0]["parts"]
+        prefix = system + (first_parts[0]["text"] if len(first_parts) > 1 else "")
+        if prefix in app.state.seen_prefixes:
+            cached_tokens = _tokens(prefix)
+        app.state.seen_prefixes.add(prefix)
+
+    completion = _completion_for(body, api_key)
+    if body.get("generationConfig", {}).get("responseMimeType") == "application/json":
+        completion = _as_json(completion)
+    usage = {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": _tokens(completion),
+        "cachedContentTokenCount": cached_tokens,
+        "totalTokenCount": prompt_tokens + _tokens(completion),
+    }
+    if model_action.endswith(":streamGenerateContent"):
+        async def events():
+            async for piece in _stream_chunks(body, completion):
+                chunk = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]}
+                yield "data: " + json.dumps(chunk) + "\r\n\r\n"
+            yield "data: " + json.dumps({"candidates": [{"finishReason": "STOP"}], "usageMetadata": usage}) + "\r\n\r\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await _simulate_latency(body, completion, model)
+    return {
+        "candidates": [{"content": {"parts": [{"text": completion}], "role": "model"}}],
+        "usageMetadata": usage,
+    }
+
+
+@app.post("/v1/messages")
+async def anthropic_messages(request: Request):
+    body = await request.json()
+    app.state.recorded.append(("anthropic", body))
+    if not request.headers.get("x-api-key") or not request.headers.get("anthropic-version"):
+        return _error(401, "missing x-api-key or anthropic-version header")
+    injected = _injected_error()
+    if injected is not None:
+        return injected
+    try:
+        blocks = list(_check_anthropic_blocks(body.get("system", [])))
+        for message in body["messages"]:
+            if message.get("role") not in ("user", "assistant"):
+                raise ValueError("messages may only use user/assistant roles")
+            blocks += _check_anthropic_blocks(message["content"])
+        tool_name = _check_anthropic_tools(body)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return _error(400, str(e))
+    breakpoints = [i for i, block in enumerate(blocks) if "cache_control" in block]
+    if len(breakpoints) > 4:
+        return _error(400, "at most 4 cache_control breakpoints are allowed")
+
+    # Everything up to the last breakpoint is the cacheable prefix
+    split = breakpoints[-1] + 1 if breakpoints else 0
+    prefix = "".join(block["text"] for block in blocks[:split])
+    rest = "".join(block["text"] for block in blocks[split:])
+    cache_read = cache_write = 0
+    if prefix:
+        if prefix in app.state.seen_prefixes:
+            cache_read = _tokens(prefix)
+        else:
+            cache_write = _tokens(prefix)
+            app.state.seen_prefixes.add(prefix)
+
+    completion = _completion_for(body, request.headers["x-api-key"])
+    if tool_name:
+        completion = _as_json(completion)
+    usage = {
+        "input_tokens": _tokens(rest),
+        "output_tokens": _tokens(completion),
+        "cache_read_input_tokens": cache_read,
+        "cache_creation_input_tokens": cache_write,
+    }
+    if body.get("stream"):
+        def event(name: str, data: dict) -> str:
+            return "event: " + name + "\ndata: " + json.dumps(dict(data, type=name)) + "\n\n"
+
+        async def events():
+            message = {"id": "msg_mock", "type": "message", "role": "assistant", "model": body.get("model"),
+                       "content": [], "usage": dict(usage, output_tokens=1)}
+            yield event("message_start", {"message": message})
+            if tool_name:
+                block = {"type": "tool_use", "id": "toolu_mock", "name": tool_name, "input": {}}
+            else:
+                block = {"type": "text", "text": ""}
+            yield event("content_block_start", {"index": 0, "content_block": block})
+            async for piece in _stream_chunks(body, completion):
+                if tool_name:
+                    delta = {"type": "input_json_delta", "partial_json": piece}
+                else:
+                    delta = {"type": "text_delta", "text": piece}
+                yield event("content_block_delta", {"index": 0, "delta": delta})
+            yield event("content_block_stop", {"index": 0})
+            yield event("message_delta", {"delta": {"stop_reason": "tool_use" if tool_name else "end_turn"},
+                                          "usage": {"output_tokens": usage["output_tokens"]}})
+            yield event("message_stop", {})
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await _simulate_latency(body, completion, str(body.get("model", "")))
+    return {
+        "id": "msg_mock",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model"),
+        "content": [{"type": "tool_use", "id": "toolu_mock", "name": tool_name, "input": json.loads(completion)}
+                    if tool_name else {"type": "text", "text": completion}],
+        "stop_reason": "tool_use" if tool_name else "end_turn",
+        "usage": usage,
+    }
+
+
+if RECORDINGS:
+    load_recordings(RECORDINGS)
+
+
+def start_in_thread(port: int, latency_ms: float = 0.0, ms_per_1k_tokens: float = 0.0, error_rate: float = None):
+    """Run the mock on 127.0.0.1:<port> in a daemon thread and wait until it is up"""
+    app.state.latency_ms = latency_ms
+    app.state.ms_per_1k_tokens = ms_per_1k_tokens
+    if error_rate is not None:
+        app.state.error_rate = error_rate
+    return serve_in_thread(app, port)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock Gemini/Anthropic provider")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=MS_PER_1K_TOKENS)
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE)
+    parser.add_argument("--retry-after", default=RETRY_AFTER)
+    parser.add_argument("--slow-rate", type=float, default=SLOW_RATE)
+    parser.add_argument("--slow-ms", type=float, default=SLOW_MS)
+    parser.add_argument("--score-jitter", type=float, default=SCORE_JITTER)
+    parser.add_argument("--model-latency", default=MODEL_LATENCY, help='"model=ms:ms_per_1k,..." overrides')
+    parser.add_argument("--latency-dist", choices=["constant", "lognormal", "replay"], default=LATENCY_DIST)
+    parser.add_argument("--latency-sigma", type=float, default=LATENCY_SIGMA)
+    parser.add_argument("--latency-scale", type=float, default=LATENCY_SCALE)
+    parser.add_argument("--recordings", default=RECORDINGS, help="JSONL of recorded completions to replay")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.recordings:
+        load_recordings(args.recordings)
+    app.state.latency_dist = args.latency_dist
+    app.state.latency_sigma = args.latency_sigma
+    app.state.latency_scale = args.latency_scale
+    app.state.random = random.Random(args.seed)
+    app.state.latency_ms = args.latency_ms
+    app.state.ms_per_1k_tokens = args.ms_per_1k_tokens
+    app.state.error_rate = args.error_rate
+    app.state.retry_after = args.retry_after
+    app.state.slow_rate = args.slow_rate
+    app.state.slow_ms = args.slow_ms
+    app.state.score_jitter = args.score_jitter
+    app.state.model_latency = parse_model_latency(args.model_latency)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,79 @@
+"""
+Record real provider completions for the mock provider to replay.
+
+Sends every TEST_CASES entry from test_api.py to the real Gemini or
+Anthropic API, with the same payload the http backend (app.backends) builds, and appends
+one line per completion to a JSONL file:
+
+    {"model": ..., "latency_ms": ..., "completion": ..., "usage": {...}}
+
+Replay them offline with:
+    python -m benchmarks.mock_provider --recordings <file> --latency-dist replay
+
+Usage (needs GEMINI_API_KEY / ANTHROPIC_API_KEY):
+    python -m benchmarks.record_responses --model gemini-2.5-flash --repeat 3 \\
+        --output benchmarks/recordings/gemini-2.5-flash.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from app import transport
+from app.backends import Call, claude_output, claude_payload, gemini_payload
+from app.prompts import SYSTEM_PROMPT, build_job_context, build_prompt
+from app.schemas import EvaluationRequest
+from app.tokens import OUTPUT_TOKENS_MAX
+from benchmarks.common import load_test_cases
+
+
+async def record(request: EvaluationRequest, model: str) -> dict:
+    call = Call(model, None, SYSTEM_PROMPT, build_job_context(request.job_description), build_prompt(request),
+                OUTPUT_TOKENS_MAX)
+    if "claude" in model.lower():
+        client = transport.get_client("anthropic", os.environ["ANTHROPIC_API_KEY"])
+        start = time.perf_counter()
+        response = await client.post("/v1/messages", json=claude_payload(call))
+        latency = time.perf_counter() - start
+        response.raise_for_status()
+        data = response.json()
+        output = claude_output(data)
+        completion = output if isinstance(output, str) else json.dumps(output)
+    else:
+        client = transport.get_client("gemini", os.environ["GEMINI_API_KEY"])
+        model_name = model.replace("gemini/", "")
+        start = time.perf_counter()
+        response = await client.post(f"/v1beta/models/{model_name}:generateContent", json=gemini_payload(call, None))
+        latency = time.perf_counter() - start
+        response.raise_for_status()
+        data = response.json()
+        completion = data["candidates"][0]["content"]["parts"][0]["text"]
+    return {
+        "model": model,
+        "latency_ms": round(latency * 1000, 1),
+        "completion": completion,
+        "usage": data.get("usage") or data.get("usageMetadata"),
+    }
+
+
+async def main(args):
+    cases = load_test_cases()
+    try:
+        with open(args.output, "a") as f:
+            for n in range(args.repeat):
+                for i, case in enumerate(cases):
+                    entry = await record(EvaluationRequest(**case), args.model)
+                    f.write(json.dumps(entry) + "\n")
+                    f.flush()
+                    print(f"[{n + 1}/{args.repeat}] case {i}: {entry['latency_ms']} ms")
+    finally:
+        await transport.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.getenv("MODEL", "gemini-2.5-flash"))
+    parser.add_argument("--repeat", type=int, default=1, help="passes over TEST_CASES")
+    parser.add_argument("--output", required=True)
+    asyncio.run(main(parser.parse_args()))
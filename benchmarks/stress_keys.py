@@ -0,0 +1,100 @@
+"""
+Concurrency stress test for per-request credentials.
+
+Many tenants, each with its own API key, evaluate concurrently through one
+app process. The mock provider echoes the key it received into the summary,
+so every response shows which credentials its request was actually sent
+with; any mix-up fails the run. HTTP_MAX_KEY_CLIENTS is kept below the
+tenant count so the keyed client pool also has to evict and rebuild clients.
+
+Runs against app.lambda_main, and app.main when litellm is installed.
+
+Usage:
+    python -m benchmarks.stress_keys --tenants 50 --requests 1000 --concurrency 100
+"""
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import json
+import os
+import random
+import sys
+
+import httpx
+
+PORT = 9107
+MODELS = ("gemini-2.5-flash", "claude-3-5-sonnet-20241022")
+
+
+async def stress(app, tenants: int, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    rng = random.Random(0)
+    mixups, failures = [], []
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=120) as client:
+        async def one(i):
+            tenant = rng.randrange(tenants)
+            api_key = f"tenant-{tenant}-key"
+            async with semaphore:
+                response = await client.post("/evaluate", json={
+                    "question": f"Question {i}",
+                    "answer": f"Answer from tenant {tenant}",
+                    "model": MODELS[i % len(MODELS)],
+                    "api_key": api_key,
+                })
+            if response.status_code != 200:
+                failures.append(response.text[:200])
+            elif response.json()["summary"] != "key:" + api_key:
+                mixups.append({"sent": api_key, "used": response.json()["summary"]})
+
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    return mixups, failures
+
+
+def main(args):
+    os.environ.update({
+        "GEMINI_API_BASE": f"http://127.0.0.1:{args.port}",
+        "ANTHROPIC_API_BASE": f"http://127.0.0.1:{args.port}",
+        "GEMINI_API_KEY": "server-gemini-key",
+        "ANTHROPIC_API_KEY": "server-anthropic-key",
+        "HTTP_MAX_KEY_CLIENTS": str(args.max_clients),
+        "EVAL_CACHE_SIZE": "0",
+    })
+    from benchmarks import mock_provider
+    from app import transport
+
+    mock_provider.app.state.echo_key = True
+    mock_provider.start_in_thread(args.port, args.latency_ms)
+
+    modules = ["app.lambda_main"]
+    if importlib.util.find_spec("litellm"):
+        modules.append("app.main")
+
+    report, ok = {}, True
+    for module_name in modules:
+        module = importlib.import_module(module_name)
+        mixups, failures = asyncio.run(stress(module.app, args.tenants, args.requests, args.concurrency))
+        report[module_name] = {
+            "requests": args.requests,
+            "mixups": len(mixups),
+            "failures": len(failures),
+            "examples": (mixups + failures)[:5],
+        }
+        if module_name == "app.lambda_main":
+            report[module_name]["http_clients"] = transport.stats()
+        ok = ok and not mixups and not failures
+    print(json.dumps(report, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--max-clients", type=int, default=16, help="keyed client pool size")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=PORT)
+    sys.exit(main(parser.parse_args()))
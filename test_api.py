@@ -53,28 +53,19 @@ def set_output_file(filename=None):
     """Set output file for results"""
     global RESULTS_FILE
     if filename is None:
-        filename = f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        filename = f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
     RESULTS_FILE = filename
     print(f"Results will be saved to: {RESULTS_FILE}")
 
 
 def save_result(result_data):
-    """Save result to file"""
+    """Append result to file as one JSON line (the file is never re-read or rewritten)"""
     if not RESULTS_FILE:
         return
     
     try:
-        # Load existing results or create new
-        try:
-            with open(RESULTS_FILE, 'r') as f:
-                all_results = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            all_results = {"timestamp": datetime.now().isoformat(), "results": []}
-        
-        all_results["results"].append(result_data)
-        
-        with open(RESULTS_FILE, 'w') as f:
-            json.dump(all_results, f, indent=2)
+        with open(RESULTS_FILE, 'a') as f:
+            f.write(json.dumps({"timestamp": datetime.now().isoformat(), **result_data}) + "\n")
     except Exception as e:
         print(f"Error saving result: {e}")
 
@@ -206,6 +197,50 @@ def test_evaluate(test_index=None):
         print(f"\n✓ Results saved to: {RESULTS_FILE}")
 
 
+def test_batch(stream=False):
+    """Evaluate all TEST_CASES in one /evaluate/batch request"""
+    items = []
+    for test_case in TEST_CASES:
+        payload = test_case.copy()
+        if CURRENT_MODEL:
+            payload["model"] = CURRENT_MODEL
+        if CURRENT_API_KEY:
+            payload["api_key"] = CURRENT_API_KEY
+        items.append(payload)
+    
+    print(f"\nEvaluating {len(items)} answers in one batch...")
+    response = requests.post(f"{BASE_URL}/evaluate/batch", json={"items": items, "stream": stream},
+                             timeout=TIMEOUT, stream=stream)
+    if response.status_code != 200:
+        print(f"Error: {response.status_code}")
+        print(response.text[:200])
+        return
+    
+    if stream:
+        results = (json.loads(line) for line in response.iter_lines() if line)
+    else:
+        results = response.json()["results"]
+    
+    for item in results:
+        i = item["index"]
+        if item["error"]:
+            print(f"TEST {i+1}: error - {item['error'][:200]}")
+            continue
+        result = item["result"]
+        print(f"TEST {i+1}: {result['score']}/100 - {TEST_CASES[i]['question']}")
+        save_result({
+            "test_index": i,
+            "question": TEST_CASES[i]['question'],
+            "answer": TEST_CASES[i]['answer'],
+            "job_description": TEST_CASES[i]['job_description'],
+            "model": CURRENT_MODEL or "default",
+            "result": result
+        })
+    
+    if RESULTS_FILE:
+        print(f"\n✓ Results saved to: {RESULTS_FILE}")
+
+
 def test_single(index):
     """Test a single case by index (0-9)"""
     test_evaluate(index)
@@ -224,6 +259,7 @@ def interactive_menu():
         print("5. Set output file")
         print("6. Show current settings")
         print("7. Health check")
+        print("8. Run all tests as one batch")
         print("0. Exit")
         
         choice = input("\nChoice: ").strip()
@@ -252,6 +288,8 @@ def interactive_menu():
             list_options()
         elif choice == "7":
             test_health()
+        elif choice == "8":
+            test_batch()
 
 
 if __name__ == "__main__":
@@ -259,6 +297,8 @@ if __name__ == "__main__":
     
     args = sys.argv[1:]
     test_idx = None
+    batch = False
+    stream = False
     
     # Parse arguments
     i = 0
@@ -279,13 +319,20 @@ if __name__ == "__main__":
                 i += 1
             else:
                 set_output_file()  # Auto-generate filename
+        elif arg == "-b" or arg == "--batch":
+            batch = True
+        elif arg == "--stream":
+            batch = True
+            stream = True
         elif arg.isdigit():
             test_idx = int(arg)
         i += 1
     
     if len(args) > 0 and not (args[0] == "-i" or args[0] == "-l"):
         test_health()
-        if test_idx is not None:
+        if batch:
+            test_batch(stream)
+        elif test_idx is not None:
             test_evaluate(test_idx)
         else:
             test_evaluate()  # Run all tests
@@ -296,6 +343,8 @@ if __name__ == "__main__":
         print("  python test_api.py -l                 - List models/keys")
         print("  python test_api.py 0                  - Run test 0")
         print("  python test_api.py -m claude-4 0      - Use claude-4, run test 0")
-        print("  python test_api.py -o results.json 0  - Save to file, run test 0")
+        print("  python test_api.py -o results.jsonl 0 - Save to file, run test 0")
         print("  python test_api.py -o -m claude-4     - Auto filename, all tests")
+        print("  python test_api.py -b                 - All tests in one batch request")
+        print("  python test_api.py --stream           - Batch, streamed as NDJSON")
         print("\nAvailable models:", ", ".join(MODELS.keys()))